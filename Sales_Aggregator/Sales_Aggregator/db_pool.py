@@ -0,0 +1,44 @@
+"""
+Статистика пулов соединений с базой.
+
+Пул у каждого процесса свой, поэтому статистика относится к процессу,
+который обработал запрос. Чтобы подобрать размер пула под число
+воркеров, смотрят на ``requests_waiting`` и ``avg_wait_ms``: если
+запросы ждут соединение, пула не хватает.
+"""
+
+from typing import Any
+
+from django.db import connections
+
+
+def pool_stats() -> dict[str, dict[str, Any] | None]:
+    """
+    Статистика пула каждого подключения к базе.
+
+    Для подключений без пула значение ``None``. К счётчикам psycopg
+    добавляются средние времена ожидания и использования соединения.
+    """
+    stats: dict[str, dict[str, Any] | None] = {}
+    for alias in connections:
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is None:
+            stats[alias] = None
+            continue
+        counters: dict[str, Any] = pool.get_stats()
+        # Счётчики, которые ещё не увеличивались, psycopg не возвращает.
+        requests: int = counters.get('requests_num', 0)
+        stats[alias] = {
+            **counters,
+            'avg_wait_ms': (
+                round(counters.get('requests_wait_ms', 0) / requests, 2)
+                if requests
+                else 0.0
+            ),
+            'avg_usage_ms': (
+                round(counters.get('usage_ms', 0) / requests, 2)
+                if requests
+                else 0.0
+            ),
+        }
+    return stats
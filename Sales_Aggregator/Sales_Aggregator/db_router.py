@@ -0,0 +1,128 @@
+"""
+Маршрутизация запросов между основной базой и репликами.
+
+Запись всегда идёт в ``default``. Читать с реплики разрешается только
+внутри ``replica_reads``: представлениям лент это включает декоратор
+``read_from_replica``. Остальной код, в том числе админка и команды,
+читает с основной базы и не видит отставания реплик; сессия и
+пользователь загружаются с основной базы до включения реплик.
+
+После записи пользователь на ``REPLICA_STICKY_SECONDS`` закрепляется за
+основной базой (см. ``PrimaryStickinessMiddleware``), чтобы сразу видеть
+свой голос или пост.
+"""
+
+import random
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Concatenate, ParamSpec, TypeVar, cast
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Model
+from django.http import HttpRequest
+
+P = ParamSpec('P')
+R = TypeVar('R')
+
+
+@dataclass
+class WriteTracker:
+    wrote: bool = False
+
+
+_replica_reads: ContextVar[bool] = ContextVar('replica_reads', default=False)
+_pinned: ContextVar[bool] = ContextVar('pinned_to_primary', default=False)
+_writes: ContextVar[WriteTracker | None] = ContextVar(
+    'database_writes', default=None
+)
+
+
+@contextmanager
+def replica_reads() -> Iterator[None]:
+    """Разрешает читать с реплики внутри блока."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def primary_reads() -> Iterator[None]:
+    """Читает с основной базы внутри блока, даже если реплики разрешены."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+@contextmanager
+def track_writes() -> Iterator[WriteTracker]:
+    """Отмечает, была ли внутри блока запись в базу."""
+    tracker = WriteTracker()
+    token = _writes.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _writes.reset(token)
+
+
+def read_from_replica(
+    view: Callable[Concatenate[HttpRequest, P], R],
+) -> Callable[Concatenate[HttpRequest, P], R]:
+    """Декоратор представления, которое может читать с реплики."""
+    if iscoroutinefunction(view):
+        async_view = cast(Callable[..., Awaitable[Any]], view)
+
+        @wraps(view)
+        async def async_wrapper(
+            request: HttpRequest, *args: P.args, **kwargs: P.kwargs
+        ) -> Any:
+            await request.auser()
+            with replica_reads():
+                return await async_view(request, *args, **kwargs)
+
+        return cast(Callable[Concatenate[HttpRequest, P], R], async_wrapper)
+
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args: P.args, **kwargs: P.kwargs) -> R:
+        # Пользователь загружается лениво; читаем его с основной базы,
+        # чтобы вход и выход были видны сразу.
+        _ = request.user.is_authenticated
+        with replica_reads():
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _choose_replica() -> str | None:
+    replicas: list[str] = settings.REPLICA_DATABASES
+    return random.choice(replicas) if replicas else None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model: type[Model], **hints: Any) -> str | None:
+        if not _replica_reads.get() or _pinned.get():
+            return DEFAULT_DB_ALIAS
+        return _choose_replica() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model: type[Model], **hints: Any) -> str:
+        tracker: WriteTracker | None = _writes.get()
+        if tracker is not None:
+            tracker.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1: Model, obj2: Model, **hints: Any) -> bool:
+        # Реплики содержат те же данные, что и основная база.
+        databases: set[str] = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db: str, app_label: str, **hints: Any) -> bool:
+        # Реплики получают схему репликацией с основной базы.
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,183 @@
+import logging
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, nullcontext
+from typing import Any
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpRequest, HttpResponse
+from django.urls import ResolverMatch
+
+from . import request_timing
+from .db_router import WriteTracker, primary_reads, track_writes
+from .query_budget import count_queries
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimingMiddleware:
+    """
+    Замеряет время ответа, время в базе и на отрисовку шаблонов.
+
+    Добавляет их в заголовок ``Server-Timing``, копит гистограммы для
+    ``/metrics/`` и логирует запросы дольше ``REQUEST_TIMING_SLOW_MS`` и
+    SQL-запросы дольше ``REQUEST_TIMING_SLOW_QUERY_MS``. Без
+    ``REQUEST_TIMING`` отключается. Должна стоять первой, чтобы замер
+    охватывал остальные middleware.
+    """
+
+    sync_capable: bool = True
+    async_capable: bool = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]) -> None:
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed
+        request_timing.install()
+        self.slow_request: float = settings.REQUEST_TIMING_SLOW_MS / 1000
+        self.slow_query: float = settings.REQUEST_TIMING_SLOW_QUERY_MS / 1000
+        self.get_response = get_response
+        self.async_mode: bool = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.async_mode:
+            return self.__acall__(request)
+        with request_timing.measure(request, self.slow_query) as timing:
+            response: HttpResponse = self.get_response(request)
+        return self.report(request, response, timing)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        with request_timing.measure(request, self.slow_query) as timing:
+            response: HttpResponse = await self.get_response(request)
+        return self.report(request, response, timing)
+
+    def report(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        timing: request_timing.RequestTiming,
+    ) -> HttpResponse:
+        # У потоковых ответов замер заканчивается на заголовках.
+        total: float = timing.elapsed()
+        # Запросы без представления (404 до маршрутизации) в одной группе,
+        # чтобы случайные адреса не плодили метрики.
+        match: ResolverMatch | None = request.resolver_match
+        timing.view = match.view_name if match else 'unmatched'
+        response['Server-Timing'] = timing.server_timing(total)
+        request_timing.histograms.observe(timing, total)
+        if total >= self.slow_request:
+            logger.warning(
+                '%s %s (%s): медленный ответ %.0f мс, в базе %.0f мс '
+                '(%d SQL-запросов), шаблоны %.0f мс',
+                request.method,
+                request.path,
+                timing.view,
+                total * 1000,
+                timing.db * 1000,
+                timing.queries,
+                timing.render * 1000,
+            )
+        return response
+
+
+class QueryCountMiddleware:
+    """
+    Логирует число SQL-запросов и повторяющиеся запросы каждого запроса.
+
+    Работает только при ``DEBUG``, в остальных случаях отключается.
+    """
+
+    def __init__(
+        self,
+        get_response: Callable[[HttpRequest], HttpResponse],
+    ) -> None:
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        with count_queries() as counter:
+            response: HttpResponse = self.get_response(request)
+
+        logger.info(
+            '%s %s: %d SQL-запросов',
+            request.method,
+            request.path,
+            len(counter),
+        )
+        for sql, count in counter.duplicates().items():
+            logger.warning(
+                '%s %s: запрос выполнен %d раз: %s',
+                request.method,
+                request.path,
+                count,
+                sql,
+            )
+        return response
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Закрепляет пользователя за основной базой после записи.
+
+    Небезопасные запросы целиком читают с основной базы. Если запрос
+    что-то записал, ответ ставит cookie на ``REPLICA_STICKY_SECONDS``;
+    пока она есть, запросы пользователя тоже читают с основной базы и
+    видят его изменения, даже если реплика отстаёт. Без реплик
+    отключается.
+    """
+
+    COOKIE_NAME: str = 'db_primary'
+    SAFE_METHODS: tuple[str, ...] = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    sync_capable: bool = True
+    async_capable: bool = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]) -> None:
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode: bool = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.async_mode:
+            return self.__acall__(request)
+        with self.routing(request) as writes:
+            response: HttpResponse = self.get_response(request)
+        return self.stick(response, writes)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        with self.routing(request) as writes:
+            response: HttpResponse = await self.get_response(request)
+        return self.stick(response, writes)
+
+    @contextmanager
+    def routing(self, request: HttpRequest) -> Iterator[WriteTracker]:
+        pinned: bool = (
+            request.method not in self.SAFE_METHODS
+            or self.COOKIE_NAME in request.COOKIES
+        )
+        with (
+            track_writes() as writes,
+            primary_reads() if pinned else nullcontext(),
+        ):
+            yield writes
+
+    def stick(
+        self,
+        response: HttpResponse,
+        writes: WriteTracker,
+    ) -> HttpResponse:
+        if writes.wrote:
+            response.set_cookie(
+                self.COOKIE_NAME,
+                '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
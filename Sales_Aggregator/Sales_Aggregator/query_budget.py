@@ -0,0 +1,70 @@
+"""
+Подсчёт SQL-запросов для отладки и тестов.
+"""
+
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack, contextmanager
+from typing import Any
+
+from django.db import connections
+
+
+class QueryCounter:
+    """Обёртка выполнения запросов, запоминающая их текст."""
+
+    def __init__(self) -> None:
+        self.queries: list[str] = []
+
+    def __call__(
+        self,
+        execute: Callable[..., Any],
+        sql: str,
+        params: Any,
+        many: bool,
+        context: dict[str, Any],
+    ) -> Any:
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __len__(self) -> int:
+        return len(self.queries)
+
+    def duplicates(self) -> dict[str, int]:
+        """Запросы, выполненные больше одного раза, и число повторов."""
+        return {
+            sql: count
+            for sql, count in Counter(self.queries).items()
+            if count > 1
+        }
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """Считает запросы ко всем базам внутри блока ``with``."""
+    counter = QueryCounter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        yield counter
+
+
+@contextmanager
+def query_budget(max_queries: int) -> Iterator[QueryCounter]:
+    """
+    Проверяет, что блок ``with`` выполнил не больше ``max_queries``.
+
+    В отличие от ``assertNumQueries`` задаёт верхнюю границу, поэтому
+    удобен для проверки, что число запросов не растёт с объёмом данных.
+    """
+    with count_queries() as counter:
+        yield counter
+    if len(counter) > max_queries:
+        executed: str = '\n'.join(
+            f'{number}. {sql}'
+            for number, sql in enumerate(counter.queries, start=1)
+        )
+        raise AssertionError(
+            f'Выполнено {len(counter)} запросов при бюджете '
+            f'{max_queries}:\n{executed}'
+        )
@@ -0,0 +1,244 @@
+"""
+Замеры времени запросов: общее, в базе и на отрисовку шаблонов.
+
+Замер текущего запроса хранится в ``ContextVar``, поэтому его видят и
+запросы к базе из ``sync_to_async`` асинхронных представлений.
+Обёртка выполнения SQL и обёртка отрисовки шаблонов ставятся один раз
+в ``install()``, который вызывает ``RequestTimingMiddleware``; без
+``REQUEST_TIMING`` они не ставятся и ничего не стоят.
+
+Гистограммы времени ответа копятся в памяти процесса, как статистика
+пулов соединений: каждый воркер отдаёт на ``/metrics/`` свои.
+"""
+
+import functools
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from typing import Any
+
+from django.db import connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.backends.signals import connection_created
+from django.http import HttpRequest
+from django.template.backends.django import Template
+
+logger = logging.getLogger(__name__)
+
+# Верхние границы корзин гистограммы в секундах, как у клиентов Prometheus.
+BUCKETS: tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+@dataclass
+class RequestTiming:
+    """Время одного запроса, потраченное на базу и шаблоны."""
+
+    # Метод и путь запроса для лога медленных SQL-запросов.
+    request: str = ''
+    # Имя маршрута, известное после ответа.
+    view: str = ''
+    # Запросы к базе дольше этого попадают в лог, в секундах.
+    slow_query: float = float('inf')
+    started: float = field(default_factory=time.perf_counter)
+    db: float = 0.0
+    queries: int = 0
+    render: float = 0.0
+    # Глубина вложенных отрисовок: время считается только у внешней.
+    rendering: int = 0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total: float) -> str:
+        """Значение заголовка ``Server-Timing``, длительности в мс."""
+        return (
+            f'total;dur={total * 1000:.1f}, '
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries", '
+            f'render;dur={self.render * 1000:.1f}'
+        )
+
+
+current: ContextVar[RequestTiming | None] = ContextVar(
+    'request_timing', default=None
+)
+
+
+@contextmanager
+def measure(
+    request: HttpRequest, slow_query: float
+) -> Iterator[RequestTiming]:
+    """Замер запроса, который обёртки дополняют внутри блока ``with``."""
+    timing = RequestTiming(
+        request=f'{request.method} {request.path}', slow_query=slow_query
+    )
+    token = current.set(timing)
+    try:
+        yield timing
+    finally:
+        current.reset(token)
+
+
+def timed_execute(
+    execute: Callable[..., Any],
+    sql: str,
+    params: Any,
+    many: bool,
+    context: dict[str, Any],
+) -> Any:
+    """Обёртка выполнения SQL, добавляющая время к замеру запроса."""
+    timing: RequestTiming | None = current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started: float = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed: float = time.perf_counter() - started
+        timing.db += elapsed
+        timing.queries += 1
+        if elapsed >= timing.slow_query:
+            logger.warning(
+                'Медленный SQL-запрос (%.0f мс) в %s: %s',
+                elapsed * 1000,
+                timing.request,
+                sql,
+            )
+
+
+def _wrap_connection(connection: BaseDatabaseWrapper, **kwargs: Any) -> None:
+    if timed_execute not in connection.execute_wrappers:
+        # В начало списка: execute_wrapper() снимает свою обёртку с конца.
+        connection.execute_wrappers.insert(0, timed_execute)
+
+
+def _timed_render(render: Callable[..., str]) -> Callable[..., str]:
+    @functools.wraps(render)
+    def wrapper(self: Template, *args: Any, **kwargs: Any) -> str:
+        timing: RequestTiming | None = current.get()
+        if timing is None:
+            return render(self, *args, **kwargs)
+        timing.rendering += 1
+        started: float = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            timing.rendering -= 1
+            if not timing.rendering:
+                timing.render += time.perf_counter() - started
+
+    return wrapper
+
+
+_install_lock = threading.Lock()
+
+
+def install() -> None:
+    """Ставит обёртки SQL и шаблонов. Повторный вызов ничего не делает."""
+    with _install_lock:
+        connection_created.connect(
+            _wrap_connection, dispatch_uid='request_timing'
+        )
+        # Соединения, открытые до включения замеров, сигнал уже прошли.
+        for connection in connections.all(initialized_only=True):
+            _wrap_connection(connection)
+        # functools.wraps оставляет __wrapped__ у уже обёрнутого метода.
+        if not hasattr(Template.render, '__wrapped__'):
+            Template.render = _timed_render(Template.render)
+
+
+@dataclass
+class ViewStats:
+    buckets: list[int] = field(default_factory=lambda: [0] * len(BUCKETS))
+    count: int = 0
+    total: float = 0.0
+    db: float = 0.0
+    queries: int = 0
+    render: float = 0.0
+
+
+class LatencyHistograms:
+    """Гистограммы времени ответа по представлениям."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.views: dict[str, ViewStats] = {}
+
+    def observe(self, timing: RequestTiming, total: float) -> None:
+        with self.lock:
+            stats: ViewStats = self.views.setdefault(timing.view, ViewStats())
+            for index, bound in enumerate(BUCKETS):
+                if total <= bound:
+                    stats.buckets[index] += 1
+            stats.count += 1
+            stats.total += total
+            stats.db += timing.db
+            stats.queries += timing.queries
+            stats.render += timing.render
+
+    def clear(self) -> None:
+        with self.lock:
+            self.views.clear()
+
+    def exposition(self) -> str:
+        """Метрики в текстовом формате Prometheus."""
+        with self.lock:
+            views: list[tuple[str, ViewStats]] = [
+                (_label(view), replace(stats, buckets=list(stats.buckets)))
+                for view, stats in sorted(self.views.items())
+            ]
+        lines: list[str] = [
+            '# HELP http_request_duration_seconds Время ответа.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        for view, stats in views:
+            for bound, count in zip(BUCKETS, stats.buckets, strict=True):
+                lines.append(
+                    'http_request_duration_seconds_bucket'
+                    f'{{view="{view}",le="{bound}"}} {count}'
+                )
+            lines += [
+                'http_request_duration_seconds_bucket'
+                f'{{view="{view}",le="+Inf"}} {stats.count}',
+                f'http_request_duration_seconds_sum{{view="{view}"}} '
+                f'{stats.total}',
+                f'http_request_duration_seconds_count{{view="{view}"}} '
+                f'{stats.count}',
+            ]
+        for name, help_text, attribute in (
+            ('http_request_db_seconds_total', 'Время в базе.', 'db'),
+            ('http_request_db_queries_total', 'Запросы к базе.', 'queries'),
+            (
+                'http_request_render_seconds_total',
+                'Время отрисовки шаблонов.',
+                'render',
+            ),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            lines += [
+                f'{name}{{view="{view}"}} {getattr(stats, attribute)}'
+                for view, stats in views
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+histograms = LatencyHistograms()
@@ -2,6 +2,7 @@
 Django settings for Sales_Aggregator project.
 """
 
+import copy
 import os
 from pathlib import Path
 from typing import Any
@@ -22,11 +23,15 @@ INSTALLED_APPS: list[str] = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'users',
     'discounts',
 ]
 
 MIDDLEWARE: list[str] = [
+    'Sales_Aggregator.middleware.RequestTimingMiddleware',
+    'Sales_Aggregator.middleware.QueryCountMiddleware',
+    'Sales_Aggregator.middleware.PrimaryStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,20 +57,110 @@ TEMPLATES: list[dict[str, Any]] = [
         },
     },
 ]
+if not DEBUG:
+    # Шаблоны разбираются один раз на процесс. Django и так включает
+    # кеширующий загрузчик без своего списка loaders, явный список не
+    # даст ему пропасть, если загрузчики понадобится дополнить.
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        (
+            'django.template.loaders.cached.Loader',
+            [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ],
+        ),
+    ]
 
 WSGI_APPLICATION: str = 'Sales_Aggregator.wsgi.application'
 
-DATABASES = {
+DATABASES: dict[str, dict[str, Any]] = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
         'NAME': os.environ.get('DB_NAME', 'sales_aggregator_db'),
         'USER': os.environ.get('DB_USER', 'sales_user'),
         'PASSWORD': os.environ.get('DB_PASSWORD', 'qwerty123'),
-        'HOST': os.environ.get('DB_HOST', 'db'), 
+        'HOST': os.environ.get('DB_HOST', 'db'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # Соединение проверяется перед использованием, поэтому разрыв
+        # после рестарта базы не превращается в ошибку запроса.
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
 }
 
+# Пул psycopg держит открытые соединения в каждом процессе. Всего
+# процессы открывают до DB_POOL_MAX_SIZE соединений каждый, это число
+# вместе с количеством воркеров не должно превышать max_connections.
+# Без пула соединение можно переиспользовать DB_CONN_MAX_AGE секунд.
+DB_POOL: int = int(os.getenv('DB_POOL', '0'))
+if DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'name': 'default',
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '600')),
+        'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '3600')),
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(
+        os.getenv('DB_CONN_MAX_AGE', '0')
+    )
+
+# Реплики для чтения лент: DB_REPLICA_HOSTS=host1,host2. Имя базы,
+# пользователь и пароль те же, что у основной, порт и имя базы можно
+# переопределить. В тестах реплики зеркалируют основную базу.
+REPLICA_DATABASES: list[str] = []
+for number, host in enumerate(
+    filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1
+):
+    alias: str = f'replica_{number}'
+    replica: dict[str, Any] = copy.deepcopy(DATABASES['default'])
+    replica['HOST'] = host.strip()
+    replica['PORT'] = os.getenv('DB_REPLICA_PORT', replica['PORT'])
+    replica['NAME'] = os.getenv('DB_REPLICA_NAME', replica['NAME'])
+    replica['TEST'] = {'MIRROR': 'default'}
+    if 'pool' in replica['OPTIONS']:
+        replica['OPTIONS']['pool']['name'] = alias
+    DATABASES[alias] = replica
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS: list[str] = ['Sales_Aggregator.db_router.ReplicaRouter']
+# Сколько секунд после записи пользователь читает с основной базы.
+REPLICA_STICKY_SECONDS: int = int(os.getenv('DB_REPLICA_STICKY_SECONDS', '10'))
+
+# Отложенная запись счётчиков голосов для постов, за которые голосуют
+# одновременно, см. discounts.vote_buffer.
+VOTE_COUNTS_BUFFERED: int = int(os.getenv('VOTE_COUNTS_BUFFERED', '0'))
+
+# Замеры времени ответа, заголовок Server-Timing и метрики /metrics/,
+# см. Sales_Aggregator.request_timing. Ответы и SQL-запросы дольше
+# порогов в миллисекундах логируются. /metrics/ отвечает только
+# адресам из METRICS_ALLOWED_IPS.
+REQUEST_TIMING: int = int(os.getenv('REQUEST_TIMING', '0'))
+REQUEST_TIMING_SLOW_MS: int = int(os.getenv('REQUEST_TIMING_SLOW_MS', '500'))
+REQUEST_TIMING_SLOW_QUERY_MS: int = int(
+    os.getenv('REQUEST_TIMING_SLOW_QUERY_MS', '100')
+)
+METRICS_ALLOWED_IPS: list[str] = os.getenv(
+    'METRICS_ALLOWED_IPS', '127.0.0.1,::1'
+).split(',')
+
+# Без REDIS_URL используется кеш в памяти процесса: каждый воркер
+# держит свою копию, и сброс версий лент в одном воркере не виден
+# остальным, поэтому gunicorn с несколькими воркерами требует REDIS_URL.
+CACHES: dict[str, dict[str, Any]] = {
+    'default': (
+        {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+        if os.environ.get('REDIS_URL')
+        else {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    )
+}
+
 AUTH_PASSWORD_VALIDATORS: list[dict[str, str]] = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -97,3 +192,17 @@ LOGOUT_REDIRECT_URL: str = 'home'
 
 MEDIA_URL: str = '/media/'
 MEDIA_ROOT: Path = BASE_DIR / 'media'
+
+LOGGING: dict[str, Any] = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'Sales_Aggregator': {
+            'handlers': ['console'],
+            'level': 'INFO' if DEBUG else 'WARNING',
+        },
+    },
+}
@@ -20,6 +20,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from . import views
+
 """urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('posting.urls')),
@@ -27,6 +29,8 @@ from django.urls import include, path
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('db-pool/', views.db_pool_stats, name='db_pool_stats'),
+    path('metrics/', views.metrics, name='metrics'),
     path('users/', include('users.urls')),
     path('', include('discounts.urls')),
 ]
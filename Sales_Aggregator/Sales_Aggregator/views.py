@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+
+from . import request_timing
+from .db_pool import pool_stats
+
+
+@require_GET
+@staff_member_required
+def db_pool_stats(request: HttpRequest) -> JsonResponse:
+    """Статистика пулов соединений процесса, обработавшего запрос."""
+    return JsonResponse(pool_stats())
+
+
+@require_GET
+def metrics(request: HttpRequest) -> HttpResponse:
+    """
+    Гистограммы времени ответа процесса в текстовом формате Prometheus.
+
+    Отвечает только адресам из ``METRICS_ALLOWED_IPS`` без заголовка
+    ``X-Forwarded-For``: запрос через прокси приходит с его адреса.
+    """
+    if (
+        request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS
+        or 'HTTP_X_FORWARDED_FOR' in request.META
+    ):
+        raise Http404
+    return HttpResponse(
+        request_timing.histograms.exposition(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
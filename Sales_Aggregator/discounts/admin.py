@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.db.models import QuerySet
+from django.http import HttpRequest
 
-from .models import Category, Favorite, Post, Vote
+from .models import Category, Favorite, ImportCheckpoint, Post, Vote
 
 
 @admin.register(Category)
@@ -20,16 +22,45 @@ class PostAdmin(admin.ModelAdmin):
         'rating',
     ]
     list_filter = ['category', 'created_at']
+    list_select_related = ['author', 'category']
     search_fields = ['title', 'description', 'place']
     readonly_fields = ['created_at', 'updated_at']
 
+    def get_search_results(
+        self,
+        request: HttpRequest,
+        queryset: QuerySet[Post],
+        search_term: str,
+    ) -> tuple[QuerySet[Post], bool]:
+        # Вместо icontains по трём полям используется индексированный
+        # полнотекстовый поиск.
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.search(search_term), False
+
 
 @admin.register(Vote)
 class VoteAdmin(admin.ModelAdmin):
     list_display = ['user', 'post', 'vote_type', 'created_at']
     list_filter = ['vote_type', 'created_at']
+    list_select_related = ['user', 'post']
 
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ['user', 'post', 'created_at']
+    list_select_related = ['user', 'post']
+
+
+@admin.register(ImportCheckpoint)
+class ImportCheckpointAdmin(admin.ModelAdmin):
+    list_display = [
+        'source',
+        'records',
+        'imported',
+        'skipped',
+        'finished_at',
+        'updated_at',
+    ]
+    readonly_fields = ['updated_at']
@@ -0,0 +1,169 @@
+"""
+JSON API лент для мобильного клиента, версия 1.
+
+Ленты те же, что на сайте: главная (с фильтром ``category``, сортировкой
+``sort`` и поиском ``q``), «Мои посты» и «Избранное». Клиент выбирает
+поля параметром ``fields`` и листает страницы курсором ``cursor``.
+
+Строки берутся из ``values()`` только с нужными столбцами: без объектов
+моделей и без соединений с категориями и авторами, если их поля не
+запрошены. Ответ отдаётся потоком, строка за строкой.
+"""
+
+from collections.abc import AsyncIterator
+from typing import Any
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+from Sales_Aggregator.db_router import read_from_replica
+
+from . import feed_cache
+from .pagination import PAGE_SIZE, InvalidCursor, KeysetPage, apaginate
+from .views import FEEDS, PRIVATE_FEEDS
+
+# Поле ответа и выражение ``values()``, из которого оно берётся.
+API_FIELDS: dict[str, str] = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'place': 'place',
+    'category_id': 'category_id',
+    'category': 'category__name',
+    'author': 'author__username',
+    'created_at': 'created_at',
+    'upvotes_count': 'upvotes_count',
+    'downvotes_count': 'downvotes_count',
+    'score': 'score',
+    'user_vote': 'user_vote',
+    'is_favorite': 'is_favorite',
+}
+# Поля состояния зрителя считаются подзапросами, поэтому добавляются к
+# выборке, только если их запросили.
+VIEWER_FIELDS: set[str] = {'user_vote', 'is_favorite'}
+MAX_PAGE_SIZE: int = 100
+
+_encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def _requested_fields(request: HttpRequest) -> list[str]:
+    fields: list[str] = [
+        field for field in request.GET.get('fields', '').split(',') if field
+    ]
+    if not fields:
+        return list(API_FIELDS)
+    unknown: list[str] = [field for field in fields if field not in API_FIELDS]
+    if unknown:
+        raise ValueError(
+            f'Неизвестные поля: {", ".join(unknown)}. '
+            f'Доступны: {", ".join(API_FIELDS)}'
+        )
+    return fields
+
+
+def _page_size(request: HttpRequest) -> int:
+    try:
+        size: int = int(request.GET.get('limit', PAGE_SIZE))
+    except ValueError as error:
+        raise ValueError('Некорректный limit') from error
+    if not 1 <= size <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit должен быть от 1 до {MAX_PAGE_SIZE}')
+    return size
+
+
+def _check_category(request: HttpRequest) -> None:
+    category: str = request.GET.get('category', '')
+    if category and not (category.isascii() and category.isdigit()):
+        raise ValueError('category должен быть id категории')
+
+
+def _next_url(request: HttpRequest, next_cursor: str | None) -> str | None:
+    if next_cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = next_cursor
+    return f'{request.path}?{params.urlencode()}'
+
+
+async def stream_page(
+    page: KeysetPage,
+    fields: list[str],
+    next_url: str | None,
+) -> AsyncIterator[str]:
+    """
+    JSON страницы по частям: каждая строка ``values()`` кодируется сразу.
+
+    Весь документ в памяти не собирается.
+    """
+    yield '{"results":['
+    for index, row in enumerate(page.items):
+        item: dict[str, Any] = {
+            field: row[API_FIELDS[field]] for field in fields
+        }
+        yield (',' if index else '') + _encoder.encode(item)
+    yield '],"next_cursor":{},"next_url":{}}}'.format(
+        _encoder.encode(page.next_cursor), _encoder.encode(next_url)
+    )
+
+
+@require_GET
+@read_from_replica
+async def feed(request: HttpRequest, feed: str) -> HttpResponse:
+    """Страница ленты ``feed`` с полями ``fields``."""
+    if feed not in FEEDS:
+        return JsonResponse({'error': 'Лента не найдена'}, status=404)
+    request.user = await request.auser()
+    if feed in PRIVATE_FEEDS and not request.user.is_authenticated:
+        return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+    try:
+        fields: list[str] = _requested_fields(request)
+        size: int = _page_size(request)
+        _check_category(request)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    build, _ = FEEDS[feed]
+    posts, ordering = build(request)
+    if VIEWER_FIELDS.intersection(fields):
+        posts = posts.with_viewer_state(request.user)
+    # Ключи сортировки нужны для курсора, даже если их не запросили.
+    columns: set[str] = {API_FIELDS[field] for field in fields}
+    columns.update(name.lstrip('-') for name in ordering)
+    try:
+        page: KeysetPage = await apaginate(
+            posts.values(*columns),
+            ordering,
+            request.GET.get('cursor'),
+            size,
+        )
+    except InvalidCursor as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    return StreamingHttpResponse(
+        stream_page(page, fields, _next_url(request, page.next_cursor)),
+        content_type='application/json',
+    )
+
+
+@require_GET
+async def categories(request: HttpRequest) -> JsonResponse:
+    """Категории со ссылками на их ленты."""
+    url: str = reverse('api_feed', args=['home'])
+    return JsonResponse(
+        {
+            'results': [
+                {
+                    'id': category.id,
+                    'name': category.name,
+                    'feed_url': f'{url}?category={category.id}',
+                }
+                for category in await feed_cache.cached_categories()
+            ]
+        }
+    )
@@ -0,0 +1,424 @@
+"""
+Замер представлений через тестовый клиент Django.
+
+Каждый сценарий описывает запрос к одному маршруту ``discounts.urls`` или
+``users.urls``. Сценарий выполняется несколько раз, для него считаются
+перцентили времени ответа, число SQL-запросов и пик выделенной памяти.
+"""
+
+import statistics
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import Client
+from django.urls import URLPattern, reverse
+from Sales_Aggregator.query_budget import count_queries
+from users import urls as users_urls
+
+from . import urls as discounts_urls
+from .models import Post
+from .pagination import PAGE_SIZE, encode_cursor
+from .views import HOME_ORDERINGS
+
+BENCHMARK_PASSWORD: str = 'benchmark'
+AJAX: dict[str, str] = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+
+@dataclass
+class BenchmarkContext:
+    """Данные, на которых выполняются сценарии."""
+
+    user: Any
+    post: Post
+    category_id: int
+    home_cursor: str | None
+    home_ids: list[int] = field(default_factory=list)
+    counter: int = 0
+
+    def unique(self, prefix: str) -> str:
+        self.counter += 1
+        return f'{prefix}{self.counter}'
+
+
+PreparedRequest = tuple[str, dict[str, Any]]
+# Готовит запрос сценария: возвращает путь и данные. Вызывается перед
+# каждым повтором и в замер не входит.
+Prepare = Callable[[BenchmarkContext, Client], PreparedRequest]
+
+
+@dataclass
+class Scenario:
+    name: str
+    url_name: str
+    params: dict[str, Any] = field(default_factory=dict)
+    prepare: Prepare | None = None
+    method: str = 'get'
+    login: bool = False
+    ajax: bool = False
+    content_type: str | None = None
+
+    def request(
+        self,
+        context: BenchmarkContext,
+        client: Client,
+    ) -> PreparedRequest:
+        if self.prepare is None:
+            return reverse(self.url_name), self.params
+        return self.prepare(context, client)
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    url_name: str
+    status: int
+    iterations: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    queries: int
+    peak_memory_kib: float
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class BenchmarkReport:
+    results: list[ScenarioResult] = field(default_factory=list)
+    uncovered: list[str] = field(default_factory=list)
+
+
+def _home_next_page(
+    context: BenchmarkContext,
+    client: Client,
+) -> PreparedRequest:
+    params: dict[str, Any] = {}
+    if context.home_cursor:
+        params['cursor'] = context.home_cursor
+    return reverse('feed_page', args=['home']), params
+
+
+def _viewer_state(
+    context: BenchmarkContext,
+    client: Client,
+) -> PreparedRequest:
+    return reverse('viewer_state'), {
+        'ids': ','.join(str(post_id) for post_id in context.home_ids)
+    }
+
+
+def _api_home(context: BenchmarkContext, client: Client) -> PreparedRequest:
+    return reverse('api_feed', args=['home']), {
+        'fields': 'id,title,place,category,created_at,score'
+    }
+
+
+def _api_favorites(
+    context: BenchmarkContext,
+    client: Client,
+) -> PreparedRequest:
+    return reverse('api_feed', args=['favorites']), {}
+
+
+def _vote(context: BenchmarkContext, client: Client) -> PreparedRequest:
+    return reverse('vote_post', args=[context.post.pk, 'up']), {}
+
+
+def _favorite(context: BenchmarkContext, client: Client) -> PreparedRequest:
+    return reverse('toggle_favorite', args=[context.post.pk]), {}
+
+
+def _batch(context: BenchmarkContext, client: Client) -> PreparedRequest:
+    # Чётные и нечётные повторы меняют состояние в разные стороны, чтобы
+    # каждый пакет действительно менял голоса и избранное.
+    context.counter += 1
+    vote: str | None = 'up' if context.counter % 2 else None
+    return reverse('batch_actions'), {
+        'operations': [
+            {'type': 'vote', 'post_id': post_id, 'value': vote}
+            for post_id in context.home_ids[:10]
+        ]
+        + [
+            {
+                'type': 'favorite',
+                'post_id': post_id,
+                'value': bool(context.counter % 2),
+            }
+            for post_id in context.home_ids[10:]
+        ]
+    }
+
+
+def _new_post(context: BenchmarkContext, client: Client) -> PreparedRequest:
+    return reverse('create_post'), {
+        'title': context.unique('Скидка для замера '),
+        'description': 'Покажите студенческий билет.',
+        'place': 'Кофейня',
+        'category': context.category_id,
+    }
+
+
+def _delete_post(
+    context: BenchmarkContext,
+    client: Client,
+) -> PreparedRequest:
+    post: Post = Post.objects.create(
+        title='Скидка для удаления',
+        description='Удаляется при замере.',
+        place='Кофейня',
+        category_id=context.category_id,
+        author=context.user,
+    )
+    return reverse('delete_post', args=[post.pk]), {}
+
+
+def _register(context: BenchmarkContext, client: Client) -> PreparedRequest:
+    client.logout()
+    password: str = 'Skidki-Benchmark-1'
+    return reverse('users:register'), {
+        'username': context.unique('benchmark_user_'),
+        'password1': password,
+        'password2': password,
+    }
+
+
+def _login(context: BenchmarkContext, client: Client) -> PreparedRequest:
+    client.logout()
+    return reverse('users:login'), {
+        'username': context.user.username,
+        'password': BENCHMARK_PASSWORD,
+    }
+
+
+def _logout(context: BenchmarkContext, client: Client) -> PreparedRequest:
+    client.force_login(context.user)
+    return reverse('users:logout'), {}
+
+
+SCENARIOS: list[Scenario] = [
+    Scenario('главная, гость', 'home'),
+    Scenario('главная', 'home', login=True),
+    Scenario('главная, по рейтингу', 'home', {'sort': 'rating'}),
+    Scenario('главная, популярные', 'home', {'sort': 'hot'}),
+    Scenario('главная, поиск', 'home', {'q': 'скидка кофе'}),
+    Scenario(
+        'следующая страница',
+        'feed_page',
+        prepare=_home_next_page,
+        login=True,
+    ),
+    Scenario(
+        'состояние зрителя',
+        'viewer_state',
+        prepare=_viewer_state,
+        login=True,
+        ajax=True,
+    ),
+    Scenario('поиск JSON', 'search_posts', {'q': 'скидка'}),
+    Scenario('подсказки мест', 'place_suggestions', {'q': 'коф'}),
+    Scenario('API главная', 'api_feed', prepare=_api_home),
+    Scenario(
+        'API избранное',
+        'api_feed',
+        prepare=_api_favorites,
+        login=True,
+    ),
+    Scenario('API категории', 'api_categories'),
+    Scenario('форма поста', 'create_post', login=True),
+    Scenario(
+        'создание поста',
+        'create_post',
+        prepare=_new_post,
+        method='post',
+        login=True,
+    ),
+    Scenario(
+        'голос',
+        'vote_post',
+        prepare=_vote,
+        method='post',
+        login=True,
+        ajax=True,
+    ),
+    Scenario(
+        'избранное',
+        'toggle_favorite',
+        prepare=_favorite,
+        method='post',
+        login=True,
+        ajax=True,
+    ),
+    Scenario(
+        'пакет оценок и избранного',
+        'batch_actions',
+        prepare=_batch,
+        method='post',
+        login=True,
+        content_type='application/json',
+    ),
+    Scenario('мои посты', 'user_posts', login=True),
+    Scenario('избранные посты', 'favorites', login=True),
+    Scenario(
+        'удаление поста',
+        'delete_post',
+        prepare=_delete_post,
+        method='post',
+        login=True,
+        ajax=True,
+    ),
+    Scenario('форма регистрации', 'users:register'),
+    Scenario(
+        'регистрация',
+        'users:register',
+        prepare=_register,
+        method='post',
+    ),
+    Scenario('форма входа', 'users:login'),
+    Scenario('вход', 'users:login', prepare=_login, method='post'),
+    Scenario('выход', 'users:logout', prepare=_logout),
+]
+
+
+# Потоки событий не заканчиваются, а выгрузки читают таблицы целиком:
+# замерять у них нечего.
+STREAMING_URLS: set[str] = {'vote_stream', 'export_data'}
+
+
+def url_names() -> list[str]:
+    """Имена маршрутов ``discounts.urls`` и ``users.urls``, кроме потоков."""
+    names: list[str] = []
+    for module in (discounts_urls, users_urls):
+        namespace: str | None = getattr(module, 'app_name', None)
+        for pattern in module.urlpatterns:
+            if (
+                isinstance(pattern, URLPattern)
+                and pattern.name
+                and pattern.name not in STREAMING_URLS
+            ):
+                names.append(
+                    f'{namespace}:{pattern.name}'
+                    if namespace
+                    else pattern.name
+                )
+    return names
+
+
+def build_context() -> BenchmarkContext:
+    """
+    Выбирает для замера самого активного пользователя и популярный пост.
+
+    Пароль пользователя заменяется на ``BENCHMARK_PASSWORD``, поэтому
+    замер нужно выполнять в транзакции, которая затем откатывается.
+    """
+    user = (
+        get_user_model()
+        .objects.annotate(favorites_count=Count('favorites'))
+        .order_by('-favorites_count', 'pk')
+        .first()
+    )
+    post: Post | None = Post.objects.order_by('-score', '-id').first()
+    if user is None or post is None:
+        raise ValueError('Для замера нужны пользователи и посты')
+    user.set_password(BENCHMARK_PASSWORD)
+    user.save(update_fields=['password'])
+
+    ordering: tuple[str, ...] = HOME_ORDERINGS['newest']
+    first_page: list[Post] = list(Post.objects.order_by(*ordering)[:PAGE_SIZE])
+    home_cursor: str | None = None
+    if len(first_page) == PAGE_SIZE:
+        page_end: Post = first_page[-1]
+        home_cursor = encode_cursor([page_end.created_at, page_end.pk])
+
+    return BenchmarkContext(
+        user=user,
+        post=post,
+        category_id=post.category_id,
+        home_cursor=home_cursor,
+        home_ids=[post.pk for post in first_page],
+    )
+
+
+def percentile(timings: list[float], percent: int) -> float:
+    if len(timings) == 1:
+        return timings[0]
+    return statistics.quantiles(timings, n=100, method='inclusive')[
+        percent - 1
+    ]
+
+
+def run_scenario(
+    scenario: Scenario,
+    context: BenchmarkContext,
+    iterations: int,
+    warmup: int,
+) -> ScenarioResult:
+    client = Client()
+    if scenario.login:
+        client.force_login(context.user)
+    headers: dict[str, str] = dict(AJAX) if scenario.ajax else {}
+    if scenario.content_type:
+        headers['content_type'] = scenario.content_type
+    send: Callable[..., HttpResponse] = getattr(client, scenario.method)
+
+    for _ in range(warmup):
+        path, data = scenario.request(context, client)
+        send(path, data, **headers)
+
+    timings: list[float] = []
+    queries: int = 0
+    status: int = 0
+    for _ in range(iterations):
+        path, data = scenario.request(context, client)
+        with count_queries() as counter:
+            started: float = time.perf_counter()
+            response: HttpResponse = send(path, data, **headers)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = max(queries, len(counter))
+        status = response.status_code
+
+    # Отдельный запрос: tracemalloc замедляет код и исказил бы время.
+    path, data = scenario.request(context, client)
+    tracemalloc.start()
+    try:
+        send(path, data, **headers)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return ScenarioResult(
+        name=scenario.name,
+        url_name=scenario.url_name,
+        status=status,
+        iterations=iterations,
+        p50_ms=round(percentile(timings, 50), 2),
+        p95_ms=round(percentile(timings, 95), 2),
+        p99_ms=round(percentile(timings, 99), 2),
+        queries=queries,
+        peak_memory_kib=round(peak / 1024, 1),
+    )
+
+
+def run_benchmark(
+    iterations: int,
+    warmup: int,
+    only: str | None = None,
+) -> BenchmarkReport:
+    """Выполняет сценарии, имя которых содержит ``only``, или все."""
+    context: BenchmarkContext = build_context()
+    report = BenchmarkReport()
+    covered: set[str] = {scenario.url_name for scenario in SCENARIOS}
+    report.uncovered = [name for name in url_names() if name not in covered]
+    for scenario in SCENARIOS:
+        if only and only not in scenario.name:
+            continue
+        report.results.append(
+            run_scenario(scenario, context, iterations, warmup)
+        )
+    return report
@@ -0,0 +1,182 @@
+"""
+Карточки постов лент с кешем фрагментов.
+
+Ленты читают посты одной выборкой ``values()`` только с полями
+карточки и превращают строки в ``FeedRow``: без объектов моделей,
+связанных категорий и авторов.
+
+Каждая карточка кешируется отдельно. Ключ содержит версию поста — время
+правки и счётчики голосов, поэтому правка поста и голос за него
+делают старый фрагмент недостижимым. Название категории и имя автора в
+ключ не входят и после переименования отстают на ``CARD_CACHE_TIMEOUT``.
+
+Фрагмент не зависит от зрителя: на местах оценки и избранного в нём
+стоят метки ``MARKS``, которые заменяются после чтения из кеша. Метки —
+HTML-комментарии, а экранированный текст поста не может содержать
+``<``, поэтому подделать метку содержимым поста нельзя.
+"""
+
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.template import loader
+from django.utils.safestring import SafeString, mark_safe
+
+from .models import Post
+from .pagination import KeysetPage
+
+CARD_TEMPLATE: str = 'discounts/cards/card.html'
+CARD_CACHE_TIMEOUT: int = 10 * 60
+
+
+@dataclass(slots=True)
+class FeedRow:
+    """Пост ленты: только то, что показывает карточка."""
+
+    id: int
+    title: str
+    description: str
+    place: str
+    category_name: str
+    author_username: str
+    created_at: datetime
+    updated_at: datetime
+    upvotes_count: int
+    downvotes_count: int
+    # Состояние зрителя из ``with_viewer_state``.
+    user_vote: str | None
+    is_favorite: bool
+
+
+# Выражения ``values()`` для полей ``FeedRow`` в порядке объявления.
+FEED_ROW_COLUMNS: tuple[str, ...] = (
+    'id',
+    'title',
+    'description',
+    'place',
+    'category__name',
+    'author__username',
+    'created_at',
+    'updated_at',
+    'upvotes_count',
+    'downvotes_count',
+    'user_vote',
+    'is_favorite',
+)
+
+
+def feed_values(
+    posts: QuerySet[Post],
+    ordering: Sequence[str],
+) -> QuerySet[Any]:
+    """
+    Строки ``values()`` ленты для ``FeedRow``.
+
+    ``posts`` должна содержать состояние зрителя. Ключи сортировки
+    добавляются к столбцам, чтобы ``paginate`` собрал из них курсор.
+    """
+    columns: dict[str, None] = dict.fromkeys(
+        [*FEED_ROW_COLUMNS, *(name.lstrip('-') for name in ordering)]
+    )
+    return posts.values(*columns)
+
+
+def feed_rows(page: KeysetPage) -> KeysetPage:
+    """Страница строк ``feed_values`` с ``FeedRow`` вместо словарей."""
+    return KeysetPage(
+        items=[
+            FeedRow(*[row[column] for column in FEED_ROW_COLUMNS])
+            for row in page.items
+        ],
+        next_cursor=page.next_cursor,
+    )
+
+
+MARKS: dict[str, SafeString] = {
+    name: mark_safe(f'<!--{name}-->')
+    for name in (
+        'up_active',
+        'up_icon',
+        'down_active',
+        'down_icon',
+        'favorite_active',
+        'favorite_icon',
+        'favorite_title',
+    )
+}
+_MARK_RE: re.Pattern[str] = re.compile(
+    '|'.join(re.escape(mark) for mark in MARKS.values())
+)
+
+
+def _card_key(post: FeedRow, variant: str, member: bool) -> str:
+    audience: str = 'member' if member else 'guest'
+    version: str = (
+        f'{post.updated_at.timestamp()}:'
+        f'{post.upvotes_count}:{post.downvotes_count}'
+    )
+    return f'card:{variant}:{audience}:{post.id}:{version}'
+
+
+def _render_card(post: FeedRow, variant: str, member: bool) -> str:
+    # Без request: карточке не нужны контекстные процессоры, а зритель
+    # в ней только метками.
+    context: dict[str, Any] = {
+        'post': post,
+        'variant': variant,
+        'member': member,
+        'marks': MARKS,
+    }
+    return loader.render_to_string(CARD_TEMPLATE, context)
+
+
+def viewer_marks(post: FeedRow) -> dict[str, str]:
+    """Значения меток карточки по состоянию зрителя."""
+    vote: str | None = post.user_vote
+    favorite: bool = post.is_favorite
+    return {
+        MARKS['up_active']: ' active' if vote == 'up' else '',
+        MARKS['up_icon']: 'fas' if vote == 'up' else 'far',
+        MARKS['down_active']: ' active' if vote == 'down' else '',
+        MARKS['down_icon']: 'fas' if vote == 'down' else 'far',
+        MARKS['favorite_active']: ' active' if favorite else '',
+        MARKS['favorite_icon']: 'fas' if favorite else 'far',
+        MARKS['favorite_title']: (
+            'Удалить из избранного' if favorite else 'Добавить в избранное'
+        ),
+    }
+
+
+def _apply_marks(html: str, values: dict[str, str]) -> str:
+    return _MARK_RE.sub(lambda match: values[match[0]], html)
+
+
+async def render_cards(
+    posts: list[FeedRow],
+    variant: str,
+    member: bool,
+) -> SafeString:
+    """
+    HTML карточек ``posts`` с оценками и избранным зрителя.
+
+    Фрагменты всей страницы читаются и записываются в кеш одним
+    обращением, промахи отрисовываются без запросов к базе. ``member`` —
+    показывать ли кнопки оценок и избранного.
+    """
+    keys: list[str] = [_card_key(post, variant, member) for post in posts]
+    cached: dict[str, str] = await cache.aget_many(keys)
+    missing: dict[str, str] = {}
+    cards: list[str] = []
+    for post, key in zip(posts, keys, strict=True):
+        html: str | None = cached.get(key)
+        if html is None:
+            html = missing[key] = _render_card(post, variant, member)
+        cards.append(_apply_marks(html, viewer_marks(post)))
+    if missing:
+        await cache.aset_many(missing, CARD_CACHE_TIMEOUT)
+    return mark_safe(''.join(cards))
@@ -0,0 +1,293 @@
+"""
+Кеш страниц главной ленты и списка категорий.
+
+Ключ страницы содержит категорию, сортировку, курсор и версии данных,
+от которых зависит порядок постов. Версии хранятся отдельно для каждой
+категории и для ленты без фильтра:
+
+- ``posts`` меняется при создании, правке и удалении поста;
+- ``votes`` меняется при голосовании и влияет на сортировку по рейтингу;
+- ``hot`` меняется при пересчёте горячего рейтинга.
+
+Версия — время последнего изменения в наносекундах. Новая версия делает
+старые ключи недостижимыми, они вытесняются из кеша по таймауту. Из тех
+же версий и версии зрителя, которая меняется при его голосах, избранном
+и постах, собираются ``ETag`` и ``Last-Modified`` страниц лент. При
+попадании в кеш одним запросом по первичному ключу перечитываются
+счётчики голосов и состояние зрителя, а удалённые посты отбрасываются.
+
+Поверх страниц кешируется HTML: карточки без состояния зрителя и целиком
+страница для гостей. Счётчики в карточках пользователей могут отставать
+на ``HTML_CACHE_TIMEOUT``, свежие значения отдаёт ``viewer_states``.
+
+Функции, которые заполняют кеш, асинхронные: их вызывают асинхронные
+представления лент. Промахи кеша читаются с основной базы: иначе
+отстающая реплика могла бы записать старые данные под новой версией.
+"""
+
+import hashlib
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from Sales_Aggregator.db_router import primary_reads
+
+from .models import Category, Post
+from .pagination import KeysetPage
+
+FEED_CACHE_TIMEOUT: int = 10 * 60
+HTML_CACHE_TIMEOUT: int = 60
+CATEGORIES_CACHE_KEY: str = 'categories'
+# Поля постов кешированной страницы, которые перечитываются при попадании.
+REFRESHED_FIELDS: tuple[str, ...] = (
+    'upvotes_count',
+    'downvotes_count',
+    'user_vote',
+    'is_favorite',
+)
+
+# Версии, от которых зависит порядок постов при каждой сортировке.
+SORT_DEPENDENCIES: dict[str, tuple[str, ...]] = {
+    'newest': ('posts',),
+    'rating': ('posts', 'votes'),
+    'hot': ('posts', 'hot'),
+}
+
+
+def _version_key(scope: str, kind: str) -> str:
+    return f'feed_version:{scope}:{kind}'
+
+
+def _viewer_key(user_id: int) -> str:
+    return f'viewer_version:{user_id}'
+
+
+def _stored_versions(keys: list[str]) -> list[int]:
+    stored: dict[str, Any] = cache.get_many(keys)
+    for key in keys:
+        if key not in stored:
+            # Если версию вытеснили из кеша, новая берётся из часов и не
+            # совпадёт ни с одной из прежних.
+            cache.add(key, time.time_ns(), timeout=None)
+            stored[key] = cache.get(key)
+    return [stored[key] for key in keys]
+
+
+def _versions(scope: str, kinds: Iterable[str]) -> list[int]:
+    return _stored_versions([_version_key(scope, kind) for kind in kinds])
+
+
+def _touch(keys: Iterable[str]) -> None:
+    now: int = time.time_ns()
+    cache.set_many(dict.fromkeys(keys, now), timeout=None)
+
+
+def _bump(scopes: Iterable[str], kind: str) -> None:
+    _touch(_version_key(scope, kind) for scope in scopes)
+
+
+def bump_category(category_id: int, *kinds: str) -> None:
+    """
+    Сбрасывает кеш ленты категории и ленты без фильтра.
+
+    Версии меняются после фиксации транзакции, иначе запрос,
+    пришедший раньше фиксации, закешировал бы старые данные под новой
+    версией.
+    """
+
+    def bump() -> None:
+        for kind in kinds:
+            _bump(['all', str(category_id)], kind)
+
+    transaction.on_commit(bump)
+
+
+def bump_all(kind: str) -> None:
+    """Сбрасывает кеш лент всех категорий для версии ``kind``."""
+    scopes: list[str] = [
+        'all',
+        *(str(pk) for pk in Category.objects.values_list('pk', flat=True)),
+    ]
+    transaction.on_commit(lambda: _bump(scopes, kind))
+
+
+def bump_viewer(user_id: int) -> None:
+    """Отмечает изменение оценок, избранного или постов пользователя."""
+    transaction.on_commit(lambda: _touch([_viewer_key(user_id)]))
+
+
+def page_validators(
+    versions: Iterable[tuple[str, str]],
+    user_id: int | None,
+    path: str,
+) -> tuple[str, datetime]:
+    """
+    ``ETag`` и время изменения страницы ``path`` без запросов к базе.
+
+    ``versions`` — пары «область, вид версии», от которых зависит
+    страница. Для пользователя к ним добавляется его версия зрителя.
+    """
+    keys: list[str] = [_version_key(scope, kind) for scope, kind in versions]
+    if user_id is not None:
+        keys.append(_viewer_key(user_id))
+    stored: list[int] = _stored_versions(keys)
+    etag: str = hashlib.md5(f'{path}:{user_id}:{stored}'.encode()).hexdigest()
+    last_modified = datetime.fromtimestamp(max(stored) / 10**9, tz=UTC)
+    return etag, last_modified
+
+
+def _page_key(
+    prefix: str,
+    category: str | None,
+    sort: str,
+    cursor: str | None,
+) -> str:
+    scope: str = category or 'all'
+    versions: str = '.'.join(
+        str(version) for version in _versions(scope, SORT_DEPENDENCIES[sort])
+    )
+    position: str = hashlib.md5((cursor or '').encode()).hexdigest()
+    return f'{prefix}:{scope}:{sort}:{position}:{versions}'
+
+
+def _viewer_states_queryset(ids: Iterable[int], user: Any) -> QuerySet[Any]:
+    return (
+        Post.objects.filter(pk__in=list(ids))
+        .with_viewer_state(user)
+        .values(
+            'pk',
+            'upvotes_count',
+            'downvotes_count',
+            'score',
+            'user_vote',
+            'is_favorite',
+        )
+    )
+
+
+def viewer_states(ids: Iterable[int], user: Any) -> dict[int, dict[str, Any]]:
+    """
+    Счётчики голосов и состояние зрителя для постов ``ids``.
+
+    Удалённых постов в результате нет.
+    """
+    return {row.pop('pk'): row for row in _viewer_states_queryset(ids, user)}
+
+
+async def _refresh_posts(posts: list[Any], user: Any) -> list[Any]:
+    fresh: dict[int, dict[str, Any]] = {
+        row.pop('pk'): row
+        async for row in _viewer_states_queryset(
+            [post.id for post in posts], user
+        )
+    }
+    refreshed: list[Any] = []
+    for post in posts:
+        row: dict[str, Any] | None = fresh.get(post.id)
+        if row is None:
+            continue
+        for name in REFRESHED_FIELDS:
+            setattr(post, name, row[name])
+        refreshed.append(post)
+    return refreshed
+
+
+async def cached_home_page(
+    category: str | None,
+    sort: str,
+    cursor: str | None,
+    user: Any,
+    load: Callable[[], Awaitable[KeysetPage]],
+) -> KeysetPage:
+    """
+    Страница главной ленты из кеша или из ``load`` при промахе.
+
+    В кеше хранятся строки лент со всеми полями карточек, поэтому
+    при попадании к базе идёт только запрос свежих счётчиков и
+    состояния зрителя.
+    """
+    key: str = _page_key('feed_page', category, sort, cursor)
+    page: KeysetPage | None = await cache.aget(key)
+    if page is None:
+        with primary_reads():
+            page = await load()
+        await cache.aset(key, page, FEED_CACHE_TIMEOUT)
+        return page
+    return KeysetPage(
+        items=await _refresh_posts(page.items, user),
+        next_cursor=page.next_cursor,
+    )
+
+
+@dataclass
+class RenderedCards:
+    """Отрисованные карточки страницы ленты."""
+
+    html: str
+    next_cursor: str | None
+
+
+async def cached_cards(
+    audience: str,
+    category: str | None,
+    sort: str,
+    cursor: str | None,
+    render: Callable[[], Awaitable[RenderedCards]],
+) -> RenderedCards:
+    """
+    Карточки главной ленты для ``audience``: гостей или пользователей.
+
+    Карточки пользователей отрисованы без оценок и избранного, поэтому
+    одна копия подходит всем.
+    """
+    key: str = _page_key(f'feed_cards:{audience}', category, sort, cursor)
+    cards: RenderedCards | None = await cache.aget(key)
+    if cards is None:
+        cards = await render()
+        await cache.aset(key, cards, HTML_CACHE_TIMEOUT)
+    return cards
+
+
+async def cached_guest_response(
+    etag: str,
+    render: Callable[[], Awaitable[HttpResponse]],
+) -> HttpResponse:
+    """
+    Главная страница для гостей целиком из кеша или из ``render``.
+
+    Ключом служит ``ETag`` страницы: он меняется вместе с любыми
+    данными, которые на ней видны.
+    """
+    key: str = f'home_response:{etag}'
+    content: bytes | None = await cache.aget(key)
+    if content is not None:
+        return HttpResponse(content)
+    response: HttpResponse = await render()
+    if response.status_code == 200:
+        await cache.aset(key, response.content, FEED_CACHE_TIMEOUT)
+    return response
+
+
+async def cached_categories() -> list[Category]:
+    categories: list[Category] | None = await cache.aget(CATEGORIES_CACHE_KEY)
+    if categories is None:
+        with primary_reads():
+            categories = [
+                category async for category in Category.objects.all()
+            ]
+        await cache.aset(CATEGORIES_CACHE_KEY, categories, FEED_CACHE_TIMEOUT)
+    return categories
+
+
+def invalidate_categories() -> None:
+    def invalidate() -> None:
+        cache.delete(CATEGORIES_CACHE_KEY)
+        _bump(['all'], 'categories')
+
+    transaction.on_commit(invalidate)
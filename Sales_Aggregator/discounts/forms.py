@@ -1,6 +1,7 @@
 from django import forms
+from django.urls import reverse_lazy
 
-from .models import Post
+from .models import PLACE_MIN_LENGTH, Post
 
 
 class PostForm(forms.ModelForm):
@@ -23,8 +24,15 @@ class PostForm(forms.ModelForm):
             ),
             'place': forms.TextInput(
                 attrs={
-                    'class': 'form-control',
-                    'placeholder': 'Название магазина, кафе, сервиса',
+                    'class': 'form-input',
+                    'placeholder': (
+                        "Например: Книжный магазин 'Знание', "
+                        'ул. Студенческая, 15'
+                    ),
+                    'autocomplete': 'off',
+                    'list': 'place-suggestions',
+                    'data-suggestions-url': reverse_lazy('place_suggestions'),
+                    'data-min-length': PLACE_MIN_LENGTH,
                 }
             ),
             'category': forms.Select(attrs={'class': 'form-control'}),
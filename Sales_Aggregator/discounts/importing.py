@@ -0,0 +1,324 @@
+"""
+Потоковый импорт скидок из файлов партнёров.
+
+Файл читается по одной записи: JSON-массив разбирается по частям,
+JSONL и CSV — построчно, поэтому память не зависит от размера файла.
+Записи — плоские объекты с полями ``title``, ``description``, ``place``,
+``category`` (название или id), ``author`` (имя пользователя или id) и
+необязательной ``created_at``. Записи постов в формате ``dumpdata``
+тоже принимаются, записи других моделей пропускаются.
+
+Категории и авторы ищутся в словарях, загруженных один раз, а посты
+пишутся пакетами через ``COPY`` или ``bulk_create``.
+"""
+
+import csv
+import json
+import re
+from collections.abc import Iterator
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, TextIO
+
+from django.contrib.auth import get_user_model
+from django.db import connections, router
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Category, Post
+
+FORMATS: tuple[str, ...] = ('json', 'jsonl', 'csv')
+READ_SIZE: int = 64 * 1024
+# Запись JSON-массива не может быть длиннее: иначе ошибка в ней
+# заставила бы дочитывать в память весь остаток файла.
+MAX_RECORD_SIZE: int = 16 * READ_SIZE
+_TOKEN: re.Pattern[str] = re.compile(r'[^ \t\n\r]')
+_CUT_TOKEN: re.Pattern[str] = re.compile(r'[^,:{}\[\]"]*')
+# Столбцы COPY: у полей модели нет значений по умолчанию в базе,
+# поэтому счётчики передаются явно. hot_ranked_at остаётся NULL, и
+# refresh_hot_scores посчитает горячий рейтинг новых постов.
+COPY_COLUMNS: tuple[str, ...] = (
+    'title',
+    'description',
+    'place',
+    'category_id',
+    'author_id',
+    'created_at',
+    'updated_at',
+    'upvotes_count',
+    'downvotes_count',
+    'score',
+    'hot_score',
+)
+REQUIRED_FIELDS: tuple[str, ...] = ('title', 'description', 'place')
+
+Row = tuple[str, str, str, int, int, datetime]
+
+
+class InvalidRecord(ValueError):
+    """Запись файла нельзя превратить в пост."""
+
+
+def detect_format(path: Path) -> str:
+    suffix: str = path.suffix.lower().lstrip('.')
+    if suffix == 'ndjson':
+        return 'jsonl'
+    if suffix not in FORMATS:
+        raise ValueError(
+            f'Неизвестный формат «{suffix}», укажите один из: '
+            f'{", ".join(FORMATS)}'
+        )
+    return suffix
+
+
+def _truncated(error: json.JSONDecodeError, buffer: str) -> bool:
+    # Запись оборвана концом буфера: незакрытая строка даёт «Unterminated
+    # string» в её начале, а оборванные литерал или число — ошибку
+    # на последнем токене, за которым нет ни одного разделителя. Если
+    # разделители после ошибки есть, виновата сама запись.
+    if error.msg.startswith('Unterminated string'):
+        return True
+    return _CUT_TOKEN.fullmatch(buffer, error.pos) is not None
+
+
+def iter_json_array(stream: TextIO) -> Iterator[Any]:
+    """
+    Объекты JSON-массива по одному.
+
+    В памяти держится не больше одного объекта и блока ``READ_SIZE``;
+    объект длиннее ``MAX_RECORD_SIZE`` символов считается ошибкой.
+    """
+    decoder = json.JSONDecoder()
+    buffer: str = stream.read(READ_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Ожидается JSON-массив')
+    # Разобранная часть буфера не копируется после каждой записи,
+    # а пропускается сдвигом pos.
+    pos: int = 1
+    number: int = 1
+    # Что допустимо дальше: запись или «]» после «[», только запись после
+    # «,», «,» или «]» после записи.
+    expected: str = '{]'
+    while True:
+        token: re.Match[str] | None = _TOKEN.search(buffer, pos)
+        if token is None:
+            pos = len(buffer)
+        else:
+            pos = token.start()
+            char: str = buffer[pos]
+            if char not in expected:
+                if expected == ',]':
+                    raise ValueError(
+                        f'После записи {number - 1} ожидается «,» или «]»'
+                    )
+                if char in ',]':
+                    raise ValueError(f'Запись {number}: лишняя «,»')
+                raise ValueError('Элементы массива должны быть объектами')
+            if char == ']':
+                return
+            if char == ',':
+                pos += 1
+                expected = '{'
+                continue
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as error:
+                if not _truncated(error, buffer):
+                    raise ValueError(
+                        f'Запись {number}: {error.msg}, '
+                        f'символ {error.pos - pos + 1}'
+                    ) from None
+                if len(buffer) - pos >= MAX_RECORD_SIZE:
+                    raise ValueError(
+                        f'Запись {number} длиннее {MAX_RECORD_SIZE} символов'
+                    ) from None
+            else:
+                yield item
+                number += 1
+                expected = ',]'
+                continue
+        chunk: str = stream.read(READ_SIZE)
+        if not chunk:
+            raise ValueError('Файл оборвался внутри массива')
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def iter_jsonl(stream: TextIO) -> Iterator[Any]:
+    for number, line in enumerate(stream, start=1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                raise ValueError(f'Строка {number}: {error}') from error
+
+
+def iter_records(stream: TextIO, file_format: str) -> Iterator[Any]:
+    """Записи файла в порядке следования."""
+    if file_format == 'json':
+        return iter_json_array(stream)
+    if file_format == 'jsonl':
+        return iter_jsonl(stream)
+    return csv.DictReader(stream)
+
+
+def open_source(path: Path) -> TextIO:
+    # utf-8-sig убирает BOM, который добавляют при выгрузке из Excel.
+    return path.open(encoding='utf-8-sig', newline='')
+
+
+class Lookups:
+    """
+    Категории и авторы по названию и id.
+
+    Загружаются из базы один раз за импорт. Размер словарей зависит
+    от числа категорий и пользователей, а не от размера файла.
+    """
+
+    def __init__(
+        self,
+        create_categories: bool = False,
+        default_author: str | None = None,
+    ) -> None:
+        self.create_categories = create_categories
+        self.categories: dict[str, int] = {}
+        self.category_ids: set[int] = set()
+        for pk, name in Category.objects.values_list('pk', 'name'):
+            self.categories[name.casefold()] = pk
+            self.category_ids.add(pk)
+        self.authors: dict[str, int] = {}
+        self.author_ids: set[int] = set()
+        for pk, username in get_user_model().objects.values_list(
+            'pk', 'username'
+        ):
+            self.authors[username] = pk
+            self.author_ids.add(pk)
+        self.default_author: int | None = None
+        if default_author is not None:
+            if default_author not in self.authors:
+                raise ValueError(f'Пользователь {default_author} не найден')
+            self.default_author = self.authors[default_author]
+        self.created_categories: int = 0
+
+    def category(self, value: Any) -> int:
+        if isinstance(value, int):
+            if value not in self.category_ids:
+                raise InvalidRecord(f'Категория с id {value} не найдена')
+            return value
+        name: str = str(value or '').strip()
+        if not name:
+            raise InvalidRecord('Не указана категория')
+        pk: int | None = self.categories.get(name.casefold())
+        if pk is None:
+            pk = _id_of(name, self.category_ids)
+        if pk is None:
+            if not self.create_categories:
+                raise InvalidRecord(f'Категория «{name}» не найдена')
+            pk = Category.objects.create(name=name).pk
+            self.categories[name.casefold()] = pk
+            self.category_ids.add(pk)
+            self.created_categories += 1
+        return pk
+
+    def author(self, value: Any) -> int:
+        if isinstance(value, int):
+            if value not in self.author_ids:
+                raise InvalidRecord(f'Автор с id {value} не найден')
+            return value
+        username: str = str(value or '').strip()
+        if not username:
+            if self.default_author is None:
+                raise InvalidRecord('Не указан автор')
+            return self.default_author
+        pk: int | None = self.authors.get(username)
+        if pk is None:
+            pk = _id_of(username, self.author_ids)
+        if pk is None:
+            raise InvalidRecord(f'Автор {username} не найден')
+        return pk
+
+
+def _id_of(value: str, ids: set[int]) -> int | None:
+    # В CSV все значения — строки, поэтому id приходит цифрами. Совпадение
+    # с названием или именем проверяется раньше.
+    if value.isascii() and value.isdigit() and int(value) in ids:
+        return int(value)
+    return None
+
+
+def to_row(record: Any, lookups: Lookups) -> Row | None:
+    """
+    Значения поста из записи файла.
+
+    ``None`` для записей ``dumpdata`` других моделей, ``InvalidRecord``
+    для записей, которые нельзя импортировать.
+    """
+    if not isinstance(record, dict):
+        raise InvalidRecord('Запись должна быть объектом')
+    if 'model' in record:
+        if record['model'] != 'discounts.post':
+            return None
+        record = record.get('fields') or {}
+
+    values: list[str] = []
+    for name in REQUIRED_FIELDS:
+        value: str = str(record.get(name) or '').strip()
+        if not value:
+            raise InvalidRecord(f'Не заполнено поле {name}')
+        max_length: int | None = Post._meta.get_field(name).max_length
+        if max_length is not None and len(value) > max_length:
+            raise InvalidRecord(f'Поле {name} длиннее {max_length} символов')
+        values.append(value)
+
+    created_at: datetime = timezone.now()
+    if record.get('created_at'):
+        parsed: datetime | None = parse_datetime(str(record['created_at']))
+        if parsed is None:
+            raise InvalidRecord(f'Некорректная дата {record["created_at"]}')
+        if timezone.is_naive(parsed):
+            parsed = parsed.replace(tzinfo=UTC)
+        created_at = parsed
+
+    title, description, place = values
+    return (
+        title,
+        description,
+        place,
+        lookups.category(record.get('category')),
+        lookups.author(record.get('author')),
+        created_at,
+    )
+
+
+def copy_posts(rows: list[Row]) -> int:
+    """Записывает посты одним ``COPY``. Возвращает их число."""
+    db = connections[router.db_for_write(Post)]
+    sql: str = 'COPY {table} ({columns}) FROM STDIN'.format(
+        table=db.ops.quote_name(Post._meta.db_table),
+        columns=', '.join(COPY_COLUMNS),
+    )
+    with db.cursor() as cursor, cursor.copy(sql) as copy:
+        for row in rows:
+            # updated_at совпадает с датой создания, счётчики нулевые.
+            copy.write_row((*row, row[-1], 0, 0, 0, 0.0))
+    return len(rows)
+
+
+def bulk_create_posts(rows: list[Row]) -> int:
+    """Записывает посты через ``bulk_create``. Возвращает их число."""
+    posts: list[Post] = Post.objects.bulk_create(
+        Post(
+            title=title,
+            description=description,
+            place=place,
+            category_id=category_id,
+            author_id=author_id,
+        )
+        for title, description, place, category_id, author_id, _ in rows
+    )
+    # created_at заполняется автоматически, поэтому даты из файла
+    # проставляются отдельным запросом на весь пакет.
+    for post, row in zip(posts, rows, strict=True):
+        post.created_at = row[-1]
+    Post.objects.bulk_update(posts, ['created_at'])
+    return len(posts)
@@ -0,0 +1,135 @@
+"""
+Рассылка свежих счётчиков голосов открытым страницам.
+
+После голоса ``publish_counts`` отправляет новые счётчики поста через
+``NOTIFY`` PostgreSQL, поэтому их видят все процессы сервера без
+отдельного брокера. В каждом процессе поток ``start_listener`` слушает
+канал и складывает счётчики в ``broker``.
+
+Брокер объединяет изменения за ``COALESCE_WINDOW`` секунд: для поста
+хранятся только последние значения, так что популярный пост даёт одно
+изменение за окно, а не сообщение на каждый голос. Потоки событий
+(``vote_stream``) раз в окно забирают изменения своих постов.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+import psycopg
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL: str = 'post_vote_counts'
+COALESCE_WINDOW: float = 1.0
+# Сколько окон хранится для потоков, которые опоздали с опросом.
+BATCH_HISTORY: int = 60
+RECONNECT_DELAY: float = 5.0
+
+Counts = dict[int, tuple[int, int]]
+
+
+class CountsBroker:
+    """Объединяет счётчики постов по окнам и отдаёт их потокам событий."""
+
+    def __init__(self, window: float = COALESCE_WINDOW) -> None:
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending: Counts = {}
+        self._batches: deque[tuple[int, Counts]] = deque(maxlen=BATCH_HISTORY)
+        self._sequence: int = 0
+        self._flushed_at: float = time.monotonic()
+
+    def record(self, post_id: int, upvotes: int, downvotes: int) -> None:
+        with self._lock:
+            self._pending[post_id] = (upvotes, downvotes)
+
+    def position(self) -> int:
+        """Номер последнего окна: с него поток начинает читать изменения."""
+        with self._lock:
+            return self._sequence
+
+    def changes(self, since: int, post_ids: set[int]) -> tuple[int, Counts]:
+        """
+        Последние счётчики ``post_ids`` из окон после ``since``.
+
+        Возвращает новый номер окна для следующего вызова. Текущее окно
+        закрывается, если оно открыто дольше ``window``.
+        """
+        with self._lock:
+            now: float = time.monotonic()
+            if self._pending and now - self._flushed_at >= self.window:
+                self._sequence += 1
+                self._batches.append((self._sequence, self._pending))
+                self._pending = {}
+                self._flushed_at = now
+
+            counts: Counts = {}
+            for sequence, batch in self._batches:
+                if sequence <= since:
+                    continue
+                counts.update(
+                    (post_id, values)
+                    for post_id, values in batch.items()
+                    if post_id in post_ids
+                )
+            return self._sequence, counts
+
+
+broker = CountsBroker()
+
+
+def publish_counts(post_id: int, upvotes: int, downvotes: int) -> None:
+    """Рассылает счётчики поста после фиксации транзакции."""
+    payload: str = json.dumps([post_id, upvotes, downvotes])
+
+    def notify() -> None:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, payload])
+
+    transaction.on_commit(notify)
+
+
+def receive(payload: str) -> None:
+    """Кладёт в брокер счётчики из уведомления ``publish_counts``."""
+    try:
+        post_id, upvotes, downvotes = json.loads(payload)
+    except ValueError:
+        logger.warning('Некорректное уведомление о голосах: %s', payload)
+        return
+    broker.record(int(post_id), int(upvotes), int(downvotes))
+
+
+def _listen() -> None:
+    params = connections['default'].get_connection_params()
+    while True:
+        try:
+            with psycopg.connect(**params, autocommit=True) as listener:
+                listener.execute(f'LISTEN {CHANNEL}')
+                for notification in listener.notifies():
+                    receive(notification.payload)
+        except psycopg.Error:
+            logger.exception('Соединение для уведомлений о голосах потеряно')
+            time.sleep(RECONNECT_DELAY)
+
+
+_listener: threading.Thread | None = None
+_listener_lock = threading.Lock()
+
+
+def start_listener() -> None:
+    """
+    Запускает в процессе поток, который слушает уведомления о голосах.
+
+    Поток один на процесс и держит своё соединение с основной базой.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = threading.Thread(
+                target=_listen, name='vote-counts-listener', daemon=True
+            )
+            _listener.start()
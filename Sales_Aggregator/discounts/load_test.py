@@ -0,0 +1,123 @@
+"""
+Нагрузочный прогон запущенного сервера.
+
+В отличие от ``benchmark``, запросы идут по HTTP к настоящему серверу
+из нескольких потоков одновременно. Так видно, сколько запросов в
+секунду выдерживает модель воркеров: gunicorn с синхронным WSGI или с
+воркерами uvicorn на ASGI.
+"""
+
+import http.client
+import threading
+import time
+from dataclasses import asdict, dataclass
+from importlib import import_module
+from typing import Any
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY,
+    HASH_SESSION_KEY,
+    SESSION_KEY,
+)
+
+from .benchmark import percentile
+
+
+@dataclass
+class LoadResult:
+    path: str
+    requests: int
+    errors: int
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def session_cookie(user: Any) -> str:
+    """
+    Cookie сессии, в которой ``user`` уже вошёл.
+
+    Сессия создаётся в хранилище напрямую, как ``Client.force_login``.
+    """
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+
+def run_load(
+    base_url: str,
+    path: str,
+    concurrency: int,
+    total: int,
+    cookie: str | None = None,
+) -> LoadResult:
+    """
+    Отправляет ``total`` запросов GET к ``path`` в ``concurrency`` потоков.
+
+    Каждый поток держит своё соединение keep-alive. Ответы с кодом 400 и
+    выше и обрывы соединения считаются ошибками и в перцентили не входят.
+    """
+    url = urlsplit(base_url)
+    headers: dict[str, str] = {'Cookie': cookie} if cookie else {}
+    lock = threading.Lock()
+    remaining = iter(range(total))
+    timings: list[float] = []
+    errors: int = 0
+
+    def worker() -> None:
+        nonlocal errors
+        connection = http.client.HTTPConnection(
+            url.hostname or 'localhost', url.port or 80, timeout=60
+        )
+        try:
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                started: float = time.perf_counter()
+                try:
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    failed: bool = response.status >= 400
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    failed = True
+                elapsed: float = (time.perf_counter() - started) * 1000
+                with lock:
+                    if failed:
+                        errors += 1
+                    else:
+                        timings.append(elapsed)
+        finally:
+            connection.close()
+
+    threads: list[threading.Thread] = [
+        threading.Thread(target=worker) for _ in range(concurrency)
+    ]
+    started: float = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds: float = time.perf_counter() - started
+
+    return LoadResult(
+        path=path,
+        requests=total,
+        errors=errors,
+        rps=round(len(timings) / seconds, 1),
+        p50_ms=round(percentile(timings, 50), 2) if timings else 0.0,
+        p95_ms=round(percentile(timings, 95), 2) if timings else 0.0,
+        p99_ms=round(percentile(timings, 99), 2) if timings else 0.0,
+    )
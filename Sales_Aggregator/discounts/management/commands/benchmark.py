@@ -0,0 +1,133 @@
+import json
+import logging
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from django.db import transaction
+
+from discounts.benchmark import BenchmarkReport, ScenarioResult, run_benchmark
+
+COLUMNS: tuple[str, ...] = (
+    'p50_ms',
+    'p95_ms',
+    'p99_ms',
+    'queries',
+    'peak_memory_kib',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет представления discounts и users через тестовый клиент: '
+        'перцентили времени ответа, число SQL-запросов и пик памяти. '
+        'Все изменения в базе после замера откатываются.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=3,
+            help='Запросы перед замером, которые не учитываются.',
+        )
+        parser.add_argument(
+            '--only',
+            help='Замерить только сценарии, в названии которых есть строка.',
+        )
+        parser.add_argument(
+            '--json',
+            type=Path,
+            help='Сохранить результаты в JSON для сравнения между коммитами.',
+        )
+        parser.add_argument(
+            '--compare',
+            type=Path,
+            help='JSON прошлого замера: вывести изменение показателей.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['iterations'] < 1:
+            raise CommandError('Нужен хотя бы один повтор')
+        if settings.DEBUG:
+            self.stderr.write(
+                'DEBUG включён: время ответа будет выше, чем в продакшене.'
+            )
+
+        baseline: dict[str, dict[str, Any]] = {}
+        if options['compare']:
+            baseline = {
+                result['name']: result
+                for result in json.loads(options['compare'].read_text())[
+                    'results'
+                ]
+            }
+
+        # Журнал запросов отладочного middleware заглушается на время
+        # замера, иначе он заслонит результаты.
+        query_logger = logging.getLogger('Sales_Aggregator.middleware')
+        level: int = query_logger.level
+        query_logger.setLevel(logging.ERROR)
+        try:
+            with transaction.atomic():
+                report: BenchmarkReport = run_benchmark(
+                    options['iterations'],
+                    options['warmup'],
+                    options['only'],
+                )
+                transaction.set_rollback(True)
+        except ValueError as error:
+            raise CommandError(str(error)) from error
+        finally:
+            query_logger.setLevel(level)
+
+        self.write_table(report.results, baseline)
+        if report.uncovered:
+            self.stdout.write(
+                self.style.WARNING(
+                    'Нет сценариев для маршрутов: '
+                    + ', '.join(report.uncovered)
+                )
+            )
+        if options['json']:
+            options['json'].write_text(
+                json.dumps(
+                    {
+                        'iterations': options['iterations'],
+                        'results': [
+                            result.as_dict() for result in report.results
+                        ],
+                    },
+                    ensure_ascii=False,
+                    indent=2,
+                )
+            )
+
+    def write_table(
+        self,
+        results: list[ScenarioResult],
+        baseline: dict[str, dict[str, Any]],
+    ) -> None:
+        width: int = max(len(result.name) for result in results)
+        header: str = f'{"сценарий":<{width}}  код' + ''.join(
+            f'{column:>18}' for column in COLUMNS
+        )
+        self.stdout.write(header)
+        for result in results:
+            values: dict[str, Any] = result.as_dict()
+            previous: dict[str, Any] | None = baseline.get(result.name)
+            cells: list[str] = []
+            for column in COLUMNS:
+                cell: str = f'{values[column]:g}'
+                if previous is not None:
+                    cell += f' ({values[column] - previous[column]:+g})'
+                cells.append(f'{cell:>18}')
+            self.stdout.write(
+                f'{result.name:<{width}}  {result.status}' + ''.join(cells)
+            )
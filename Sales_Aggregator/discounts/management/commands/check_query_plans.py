@@ -0,0 +1,53 @@
+from typing import Any
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+
+from discounts.models import Post
+from discounts.query_plans import PlanReport, check_feed_plans
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет через EXPLAIN, что запросы лент читают страницы из '
+        'индексов, без последовательного сканирования и сортировки.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--user',
+            help='Пользователь, от имени которого строятся личные ленты. '
+            'По умолчанию автор последнего поста.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        latest: Post | None = Post.objects.order_by('-created_at').first()
+        if latest is None:
+            raise CommandError('Постов нет, планы проверять не на чем.')
+
+        user = latest.author
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist as error:
+                raise CommandError('Пользователь не найден') from error
+
+        reports: list[PlanReport] = check_feed_plans(user, latest.category_id)
+        for report in reports:
+            if report.ok:
+                self.stdout.write(f'{report.name}: OK')
+            else:
+                self.stdout.write(
+                    self.style.ERROR(
+                        f'{report.name}: {"; ".join(report.problems)}'
+                    )
+                )
+
+        failed: int = sum(not report.ok for report in reports)
+        if failed:
+            raise CommandError(f'Запросов без подходящего индекса: {failed}')
+        self.stdout.write(self.style.SUCCESS('Все планы используют индексы'))
@@ -0,0 +1,92 @@
+import time
+from typing import Any
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from django.db import transaction
+
+from discounts import feed_cache, vote_buffer
+from discounts.models import Post
+
+# Лайки и дизлайки в счётчиках поста и по таблице голосов.
+Counts = tuple[int, int, int, int]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает счётчики голосов постов с таблицей голосов. Нужна '
+        'после сбоев в режиме VOTE_COUNTS_BUFFERED, когда изменения '
+        'счётчиков из буфера упавшего процесса потеряны. Ещё не '
+        'записанные изменения в буферах работающих процессов не видны '
+        'команде: их учитывает только ожидание двух интервалов сброса '
+        'между двумя сравнениями. Исправлять надёжнее, пока за посты с '
+        'расхождениями не голосуют.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Пересчитать счётчики постов с расхождениями.',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Сколько расхождений вывести.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        # Буферы работающих процессов сервера ещё не записали изменения
+        # последних секунд, а у команды своего буфера нет. Такие
+        # расхождения исчезают за интервал сброса, поэтому считаются
+        # только те, что не изменились за два интервала.
+        first: dict[int, Counts] = self.mismatches()
+        if first:
+            time.sleep(2 * vote_buffer.FLUSH_INTERVAL)
+        second: dict[int, Counts] = self.mismatches()
+        stable: dict[int, Counts] = {
+            post_id: counts
+            for post_id, counts in second.items()
+            if first.get(post_id) == counts
+        }
+
+        for post_id, counts in list(stable.items())[: options['limit']]:
+            self.stdout.write(
+                f'Пост {post_id}: в счётчиках {counts[0]}/{counts[1]}, '
+                f'по голосам {counts[2]}/{counts[3]}'
+            )
+        if not stable:
+            self.stdout.write(
+                self.style.SUCCESS('Счётчики совпадают с голосами')
+            )
+            return
+        if not options['fix']:
+            raise CommandError(
+                f'Постов с расхождениями: {len(stable)}. '
+                'Запустите команду с --fix.'
+            )
+
+        with transaction.atomic():
+            fixed: int = Post.objects.filter(pk__in=stable).recount_votes()
+            feed_cache.bump_all('votes')
+        self.stdout.write(
+            self.style.SUCCESS(f'Счётчики исправлены у постов: {fixed}')
+        )
+
+    def mismatches(self) -> dict[int, Counts]:
+        return {
+            row[0]: row[1:]
+            for row in Post.objects.vote_count_mismatches()
+            .order_by('pk')
+            .values_list(
+                'pk',
+                'upvotes_count',
+                'downvotes_count',
+                'actual_upvotes',
+                'actual_downvotes',
+            )
+        }
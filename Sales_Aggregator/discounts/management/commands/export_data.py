@@ -0,0 +1,59 @@
+import time
+from pathlib import Path
+from typing import Any
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+
+from discounts.exporting import CHUNK_SIZE, DATASETS, FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты с итогами голосов, голоса или избранное в CSV или '
+        'JSONL. Таблица читается серверным курсором, поэтому память не '
+        'зависит от её размера.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('dataset', choices=sorted(DATASETS))
+        parser.add_argument(
+            '--format',
+            choices=sorted(FORMATS),
+            default='csv',
+        )
+        parser.add_argument(
+            '--output',
+            type=Path,
+            help='Файл для выгрузки. По умолчанию стандартный вывод.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help='Сколько строк курсор забирает из базы за раз.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['chunk_size'] < 1:
+            raise CommandError('Размер пакета должен быть положительным')
+        started: float = time.monotonic()
+        blocks = export_lines(
+            options['dataset'],
+            options['format'],
+            chunk_size=options['chunk_size'],
+        )
+        output: Path | None = options['output']
+        if output is None:
+            for block in blocks:
+                self.stdout.write(block, ending='')
+            return
+        with output.open('w', encoding='utf-8', newline='') as stream:
+            stream.writelines(blocks)
+        self.stderr.write(
+            f'Выгрузка записана в {output} за '
+            f'{time.monotonic() - started:.1f} с'
+        )
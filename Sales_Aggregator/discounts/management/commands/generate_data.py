@@ -0,0 +1,292 @@
+import random
+from collections.abc import Iterator, Sequence
+from itertools import accumulate
+from typing import Any
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandParser
+from django.db.models.expressions import RawSQL
+
+from discounts import feed_cache
+from discounts.models import Category, Favorite, Post, Vote
+
+CATEGORY_NAMES: list[str] = [
+    'Еда',
+    'Одежда и обувь',
+    'Культура и развлечения',
+    'Книги и канцелярия',
+    'Транспорт',
+    'Спорт',
+    'Техника',
+    'Образование',
+    'Красота',
+    'Путешествия',
+]
+PLACE_KINDS: list[str] = [
+    'Кофейня',
+    'Пиццерия',
+    'Книжный магазин',
+    'Кинотеатр',
+    'Музей',
+    'Фитнес-клуб',
+    'Магазин одежды',
+    'Салон связи',
+    'Столовая',
+    'Театр',
+]
+PLACE_NAMES: list[str] = [
+    'Знание',
+    'Восход',
+    'Аврора',
+    'Маяк',
+    'Полёт',
+    'Сфера',
+    'Орбита',
+    'Гранит',
+    'Север',
+    'Лето',
+]
+ITEMS: list[str] = [
+    'кофе',
+    'пиццу',
+    'учебники',
+    'билеты',
+    'абонемент',
+    'обед',
+    'кроссовки',
+    'наушники',
+    'стрижку',
+    'экскурсию',
+]
+CONDITIONS: list[str] = [
+    'Покажите студенческий билет на кассе.',
+    'Действует по будням до 16:00.',
+    'Нужна зачётка или студенческий.',
+    'Только для студентов очной формы обучения.',
+    'Скидка не суммируется с другими акциями.',
+    'Назовите кодовое слово «студент» при заказе.',
+]
+
+
+def zipf_weights(size: int, skew: float) -> list[float]:
+    """Накопленные веса закона Ципфа: первые элементы самые популярные."""
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(size)))
+
+
+def chunked(total: int, size: int) -> Iterator[int]:
+    while total > 0:
+        yield min(size, total)
+        total -= size
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетических пользователей, категории, посты, голоса и '
+        'избранное для нагрузочного тестирования. Активность авторов и '
+        'популярность постов распределены по закону Ципфа.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--votes', type=int, default=100000)
+        parser.add_argument('--favorites', type=int, default=20000)
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='За сколько последних дней распределить даты постов.',
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.1,
+            help='Показатель закона Ципфа: чем больше, тем сильнее перекос.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Количество строк в одном bulk_create.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Зерно генератора для воспроизводимых данных.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        self.rng = random.Random(options['seed'])
+        self.chunk_size: int = options['chunk_size']
+        self.skew: float = options['skew']
+
+        user_ids: list[int] = self.create_users(options['users'])
+        category_ids: list[int] = self.create_categories(options['categories'])
+        post_ids: list[int] = self.create_posts(
+            options['posts'],
+            user_ids,
+            category_ids,
+            options['days'],
+        )
+        # Популярность постов не должна зависеть от порядка их создания.
+        self.rng.shuffle(post_ids)
+        self.create_votes(options['votes'], post_ids, user_ids)
+        self.create_favorites(options['favorites'], post_ids, user_ids)
+
+        # bulk_create не отправляет сигналы, поэтому кеш лент и
+        # категорий сбрасывается явно.
+        feed_cache.bump_all('posts')
+        feed_cache.invalidate_categories()
+        call_command('recount_votes', stdout=self.stdout)
+        call_command('refresh_hot_scores', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS('Данные созданы'))
+
+    def create_users(self, count: int) -> list[int]:
+        user_model = get_user_model()
+        prefix: str = 'student'
+        start: int = user_model.objects.filter(
+            username__startswith=prefix
+        ).count()
+        # Хеширование пароля дорогое, поэтому хеш один на всех.
+        password: str = make_password('student')
+
+        user_ids: list[int] = []
+        for size in chunked(count, self.chunk_size):
+            users = user_model.objects.bulk_create(
+                user_model(
+                    username=f'{prefix}{start + number}', password=password
+                )
+                for number in range(len(user_ids), len(user_ids) + size)
+            )
+            user_ids += [user.pk for user in users]
+        self.stdout.write(f'Пользователи: {len(user_ids)}')
+        return user_ids
+
+    def create_categories(self, count: int) -> list[int]:
+        names: list[str] = [
+            CATEGORY_NAMES[number]
+            if number < len(CATEGORY_NAMES)
+            else f'Категория {number + 1}'
+            for number in range(count)
+        ]
+        Category.objects.bulk_create(
+            [Category(name=name) for name in names],
+            ignore_conflicts=True,
+        )
+        category_ids: list[int] = list(
+            Category.objects.filter(name__in=names).values_list(
+                'pk', flat=True
+            )
+        )
+        self.stdout.write(f'Категории: {len(category_ids)}')
+        return category_ids
+
+    def create_posts(
+        self,
+        count: int,
+        user_ids: Sequence[int],
+        category_ids: Sequence[int],
+        days: int,
+    ) -> list[int]:
+        authors = zipf_weights(len(user_ids), self.skew)
+        places: list[str] = [
+            f"{kind} '{name}'" for kind in PLACE_KINDS for name in PLACE_NAMES
+        ]
+        place_weights = zipf_weights(len(places), self.skew)
+
+        post_ids: list[int] = []
+        for size in chunked(count, self.chunk_size):
+            chosen_authors = self.rng.choices(
+                user_ids, cum_weights=authors, k=size
+            )
+            chosen_places = self.rng.choices(
+                places, cum_weights=place_weights, k=size
+            )
+            posts = Post.objects.bulk_create(
+                Post(
+                    title=(
+                        f'Скидка {self.rng.choice([5, 10, 15, 20, 30, 50])}% '
+                        f'на {self.rng.choice(ITEMS)}'
+                    ),
+                    description=' '.join(self.rng.sample(CONDITIONS, k=2)),
+                    place=place,
+                    category_id=self.rng.choice(category_ids),
+                    author_id=author_id,
+                )
+                for author_id, place in zip(
+                    chosen_authors, chosen_places, strict=True
+                )
+            )
+            ids: list[int] = [post.pk for post in posts]
+            # created_at заполняется автоматически, поэтому даты
+            # разносятся отдельным запросом. Квадрат смещает их к
+            # настоящему: свежих постов больше, чем старых.
+            Post.objects.filter(pk__in=ids).update(
+                created_at=RawSQL(
+                    "NOW() - random() ^ 2 * %s * INTERVAL '1 day'",
+                    [days],
+                )
+            )
+            post_ids += ids
+        self.stdout.write(f'Посты: {len(post_ids)}')
+        return post_ids
+
+    def create_votes(
+        self,
+        count: int,
+        post_ids: Sequence[int],
+        user_ids: Sequence[int],
+    ) -> None:
+        popularity = zipf_weights(len(post_ids), self.skew)
+        voters = zipf_weights(len(user_ids), self.skew / 2)
+        # Доля лайков у каждого поста своя, в среднем около 70%.
+        upvote_share: dict[int, float] = {}
+
+        for size in chunked(count, self.chunk_size):
+            pairs: set[tuple[int, int]] = set(
+                zip(
+                    self.rng.choices(post_ids, cum_weights=popularity, k=size),
+                    self.rng.choices(user_ids, cum_weights=voters, k=size),
+                    strict=True,
+                )
+            )
+            votes: list[Vote] = []
+            for post_id, user_id in pairs:
+                share: float = upvote_share.setdefault(
+                    post_id, self.rng.betavariate(7, 3)
+                )
+                vote_type: str = 'up' if self.rng.random() < share else 'down'
+                votes.append(
+                    Vote(post_id=post_id, user_id=user_id, vote_type=vote_type)
+                )
+            # Повторный голос пользователя за тот же пост пропускается.
+            Vote.objects.bulk_create(votes, ignore_conflicts=True)
+        self.stdout.write(f'Голоса в базе: {Vote.objects.count()}')
+
+    def create_favorites(
+        self,
+        count: int,
+        post_ids: Sequence[int],
+        user_ids: Sequence[int],
+    ) -> None:
+        popularity = zipf_weights(len(post_ids), self.skew)
+        for size in chunked(count, self.chunk_size):
+            pairs: set[tuple[int, int]] = set(
+                zip(
+                    self.rng.choices(post_ids, cum_weights=popularity, k=size),
+                    self.rng.choices(user_ids, k=size),
+                    strict=True,
+                )
+            )
+            Favorite.objects.bulk_create(
+                [
+                    Favorite(post_id=post_id, user_id=user_id)
+                    for post_id, user_id in pairs
+                ],
+                ignore_conflicts=True,
+            )
+        self.stdout.write(f'Избранное в базе: {Favorite.objects.count()}')
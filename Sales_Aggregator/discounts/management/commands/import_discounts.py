@@ -0,0 +1,200 @@
+import time
+from collections.abc import Callable
+from itertools import islice
+from pathlib import Path
+from typing import Any
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from django.db import transaction
+from django.utils import timezone
+
+from discounts import feed_cache
+from discounts.importing import (
+    FORMATS,
+    InvalidRecord,
+    Lookups,
+    Row,
+    bulk_create_posts,
+    copy_posts,
+    detect_format,
+    iter_records,
+    open_source,
+    to_row,
+)
+from discounts.models import ImportCheckpoint
+
+WRITERS: dict[str, Callable[[list[Row]], int]] = {
+    'copy': copy_posts,
+    'bulk': bulk_create_posts,
+}
+# Сколько ошибок в записях выводится, остальные только считаются.
+REPORTED_ERRORS: int = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты со скидками из JSON, JSONL или CSV, читая файл '
+        'потоком и записывая пакетами. После сбоя повторный запуск '
+        'продолжает с первой незаписанной записи.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('path', type=Path)
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Формат файла. По умолчанию определяется по расширению.',
+        )
+        parser.add_argument(
+            '--method',
+            choices=sorted(WRITERS),
+            default='copy',
+            help='Запись через COPY (быстрее) или bulk_create.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Количество записей в одной транзакции.',
+        )
+        parser.add_argument(
+            '--create-categories',
+            action='store_true',
+            help='Создавать категории, которых нет в базе.',
+        )
+        parser.add_argument(
+            '--default-author',
+            help='Пользователь, которому достаются записи без автора.',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать файл заново, забыв контрольную точку.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        path: Path = options['path']
+        if not path.is_file():
+            raise CommandError(f'Файл {path} не найден')
+        if options['chunk_size'] < 1:
+            raise CommandError('Размер пакета должен быть положительным')
+        try:
+            file_format: str = options['format'] or detect_format(path)
+            lookups = Lookups(
+                create_categories=options['create_categories'],
+                default_author=options['default_author'],
+            )
+        except ValueError as error:
+            raise CommandError(str(error)) from error
+
+        checkpoint: ImportCheckpoint = self.get_checkpoint(
+            path, options['restart']
+        )
+        write: Callable[[list[Row]], int] = WRITERS[options['method']]
+        chunk_size: int = options['chunk_size']
+        authors: set[int] = set()
+        started: float = time.monotonic()
+        done_before: int = checkpoint.records
+        if done_before:
+            self.stdout.write(f'Продолжение с записи {done_before + 1}')
+
+        with open_source(path) as stream:
+            records = islice(
+                iter_records(stream, file_format), done_before, None
+            )
+            while True:
+                try:
+                    chunk: list[Any] = list(islice(records, chunk_size))
+                except ValueError as error:
+                    raise CommandError(
+                        f'Ошибка разбора после записи {checkpoint.records}: '
+                        f'{error}. Исправьте файл и запустите команду '
+                        'снова, импорт продолжится с этого места.'
+                    ) from error
+                if not chunk:
+                    break
+
+                rows: list[Row] = []
+                skipped: int = 0
+                for number, record in enumerate(
+                    chunk, start=checkpoint.records + 1
+                ):
+                    try:
+                        row: Row | None = to_row(record, lookups)
+                    except InvalidRecord as error:
+                        if checkpoint.skipped + skipped < REPORTED_ERRORS:
+                            self.stderr.write(f'Запись {number}: {error}')
+                        skipped += 1
+                        continue
+                    if row is not None:
+                        rows.append(row)
+                        authors.add(row[4])
+
+                # Контрольная точка двигается в одной транзакции с
+                # постами пакета: пакет записан целиком или не записан.
+                with transaction.atomic():
+                    checkpoint.imported += write(rows) if rows else 0
+                    checkpoint.records += len(chunk)
+                    checkpoint.skipped += skipped
+                    checkpoint.save()
+                self.write_progress(checkpoint, done_before, started)
+
+        checkpoint.finished_at = timezone.now()
+        checkpoint.save(update_fields=['finished_at', 'updated_at'])
+        # COPY и bulk_create не отправляют сигналы, поэтому кеш лент
+        # сбрасывается явно.
+        feed_cache.bump_all('posts')
+        for author_id in authors:
+            feed_cache.bump_viewer(author_id)
+        if lookups.created_categories:
+            self.stdout.write(
+                f'Создано категорий: {lookups.created_categories}'
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Импорт завершён: постов {checkpoint.imported}, '
+                f'пропущено записей {checkpoint.skipped}. Горячий рейтинг '
+                'новых постов посчитает refresh_hot_scores.'
+            )
+        )
+
+    def get_checkpoint(self, path: Path, restart: bool) -> ImportCheckpoint:
+        size: int = path.stat().st_size
+        checkpoint, created = ImportCheckpoint.objects.get_or_create(
+            source=str(path.resolve()), defaults={'size': size}
+        )
+        if restart or created:
+            checkpoint.records = checkpoint.imported = checkpoint.skipped = 0
+            checkpoint.finished_at = None
+        elif checkpoint.finished_at is not None:
+            raise CommandError(
+                f'Файл уже импортирован {checkpoint.finished_at:%d.%m.%Y}. '
+                'Чтобы загрузить его ещё раз, добавьте --restart.'
+            )
+        elif checkpoint.size != size:
+            raise CommandError(
+                'Файл изменился после прерванного импорта, продолжить с '
+                'контрольной точки нельзя. Добавьте --restart, чтобы '
+                'начать заново.'
+            )
+        checkpoint.size = size
+        checkpoint.save()
+        return checkpoint
+
+    def write_progress(
+        self,
+        checkpoint: ImportCheckpoint,
+        done_before: int,
+        started: float,
+    ) -> None:
+        elapsed: float = time.monotonic() - started
+        rate: float = (checkpoint.records - done_before) / max(elapsed, 1e-6)
+        self.stdout.write(
+            f'Обработано записей: {checkpoint.records}, импортировано '
+            f'{checkpoint.imported}, пропущено {checkpoint.skipped} '
+            f'({rate:.0f} записей/с)'
+        )
@@ -0,0 +1,116 @@
+import json
+from pathlib import Path
+from typing import Any
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from django.db.models import Count
+
+from discounts.load_test import LoadResult, run_load, session_cookie
+
+COLUMNS: tuple[str, ...] = ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'errors')
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенный сервер параллельными запросами GET и выводит '
+        'число запросов в секунду и перцентили времени ответа.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument(
+            '--path',
+            action='append',
+            help='Путь для нагрузки, можно указать несколько раз. '
+            'По умолчанию главная, «Избранное» и «Мои посты».',
+        )
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=1000,
+            help='Число запросов к каждому пути.',
+        )
+        parser.add_argument(
+            '--user',
+            help='Пользователь, от имени которого идут запросы. По '
+            'умолчанию автор с наибольшим числом постов.',
+        )
+        parser.add_argument('--json', type=Path)
+        parser.add_argument('--compare', type=Path)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('Нужен хотя бы один поток и один запрос')
+
+        cookie: str = session_cookie(self.get_user(options['user']))
+        paths: list[str] = options['path'] or [
+            '/',
+            '/favorites/',
+            '/my-posts/',
+        ]
+
+        baseline: dict[str, dict[str, Any]] = {}
+        if options['compare']:
+            baseline = {
+                result['path']: result
+                for result in json.loads(options['compare'].read_text())[
+                    'results'
+                ]
+            }
+
+        results: list[LoadResult] = []
+        for path in paths:
+            result: LoadResult = run_load(
+                options['url'],
+                path,
+                options['concurrency'],
+                options['requests'],
+                cookie,
+            )
+            results.append(result)
+            self.write_row(result, baseline.get(path))
+
+        if options['json']:
+            options['json'].write_text(
+                json.dumps(
+                    {
+                        'concurrency': options['concurrency'],
+                        'results': [result.as_dict() for result in results],
+                    },
+                    ensure_ascii=False,
+                    indent=2,
+                )
+            )
+
+    def get_user(self, username: str | None) -> Any:
+        users = get_user_model().objects.all()
+        if username:
+            users = users.filter(username=username)
+        else:
+            users = users.annotate(posts_count=Count('posts')).order_by(
+                '-posts_count'
+            )
+        user = users.first()
+        if user is None:
+            raise CommandError('Пользователь не найден')
+        return user
+
+    def write_row(
+        self,
+        result: LoadResult,
+        previous: dict[str, Any] | None,
+    ) -> None:
+        values: dict[str, Any] = result.as_dict()
+        cells: list[str] = []
+        for column in COLUMNS:
+            cell: str = f'{column}={values[column]:g}'
+            if previous is not None:
+                cell += f' ({values[column] - previous[column]:+g})'
+            cells.append(cell)
+        self.stdout.write(f'{result.path}: ' + '  '.join(cells))
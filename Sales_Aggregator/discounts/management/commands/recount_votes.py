@@ -0,0 +1,40 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.db.models import Max, Min
+
+from discounts import feed_cache
+from discounts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики лайков, дизлайков и рейтинг постов.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество постов, обновляемых в одной транзакции.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        batch_size: int = options['batch_size']
+        bounds = Post.objects.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            self.stdout.write('Постов нет, пересчитывать нечего.')
+            return
+
+        updated: int = 0
+        for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+            with transaction.atomic():
+                updated += Post.objects.filter(
+                    pk__gte=start,
+                    pk__lt=start + batch_size,
+                ).recount_votes()
+        feed_cache.bump_all('votes')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Счётчики голосов обновлены: {updated}')
+        )
@@ -0,0 +1,42 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from discounts import feed_cache
+from discounts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает горячий рейтинг новых постов и постов, голоса '
+        'за которые изменились после прошлого запуска.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество постов, обновляемых в одной транзакции.',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересчитать рейтинг всех постов, например после '
+            'изменения формулы.',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        batch_size: int = options['batch_size']
+        if options['all']:
+            Post.objects.update(hot_ranked_at=None)
+
+        updated: int = 0
+        while batch := Post.objects.refresh_hot_scores(batch_size):
+            updated += batch
+        if updated:
+            feed_cache.bump_all('hot')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Горячий рейтинг обновлён: {updated}')
+        )
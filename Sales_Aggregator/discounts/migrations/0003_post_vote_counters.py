@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('discounts', '0002_remove_category_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='downvotes_count',
+            field=models.PositiveIntegerField(
+                default=0, verbose_name='Количество дизлайков'
+            ),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='score',
+            field=models.IntegerField(default=0, verbose_name='Рейтинг'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='upvotes_count',
+            field=models.PositiveIntegerField(
+                default=0, verbose_name='Количество лайков'
+            ),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE discounts_post AS p
+                SET upvotes_count = v.upvotes,
+                    downvotes_count = v.downvotes,
+                    score = v.upvotes - v.downvotes
+                FROM (
+                    SELECT
+                        post_id,
+                        COUNT(*) FILTER (WHERE vote_type = 'up') AS upvotes,
+                        COUNT(*) FILTER (WHERE vote_type = 'down') AS downvotes
+                    FROM discounts_vote
+                    GROUP BY post_id
+                ) AS v
+                WHERE v.post_id = p.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
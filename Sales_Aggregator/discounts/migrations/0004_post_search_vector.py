@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:44
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('discounts', '0003_post_vote_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.contrib.postgres.search.CombinedSearchVector(
+                    django.contrib.postgres.search.CombinedSearchVector(
+                        django.contrib.postgres.search.SearchVector(
+                            'title', config='russian', weight='A'
+                        ),
+                        '||',
+                        django.contrib.postgres.search.SearchVector(
+                            'place', config='russian', weight='B'
+                        ),
+                        django.contrib.postgres.search.SearchConfig('russian'),
+                    ),
+                    '||',
+                    django.contrib.postgres.search.SearchVector(
+                        'description', config='russian', weight='C'
+                    ),
+                    django.contrib.postgres.search.SearchConfig('russian'),
+                ),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+                verbose_name='Поисковый вектор',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['search_vector'], name='post_search_vector_gin'
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('discounts', '0005_post_place_trigram_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='hot_ranked_at',
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name='Дата расчёта горячего рейтинга',
+            ),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='hot_score',
+            field=models.FloatField(default=0, verbose_name='Горячий рейтинг'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(
+                models.OrderBy(models.F('hot_score'), descending=True),
+                models.OrderBy(models.F('created_at'), descending=True),
+                models.OrderBy(models.F('id'), descending=True),
+                name='post_hot_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(
+                condition=models.Q(('hot_ranked_at__isnull', True)),
+                fields=['id'],
+                name='post_hot_stale_idx',
+            ),
+        ),
+    ]
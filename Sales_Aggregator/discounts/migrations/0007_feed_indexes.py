@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('discounts', '0006_post_hot_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(
+                fields=['user', '-created_at', '-id'],
+                include=('post',),
+                name='favorite_user_created_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(
+                fields=['-created_at', '-id'], name='post_created_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(
+                fields=['category', '-created_at', '-id'],
+                name='post_category_created_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(
+                fields=['author', '-created_at', '-id'],
+                name='post_author_created_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(
+                fields=['-score', '-created_at', '-id'], name='post_score_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(
+                fields=['post', 'vote_type'], name='vote_post_type_idx'
+            ),
+        ),
+    ]
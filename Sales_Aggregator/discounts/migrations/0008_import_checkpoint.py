@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('discounts', '0007_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                (
+                    'id',
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                (
+                    'source',
+                    models.CharField(
+                        max_length=500, unique=True, verbose_name='Файл'
+                    ),
+                ),
+                (
+                    'size',
+                    models.PositiveBigIntegerField(
+                        verbose_name='Размер файла'
+                    ),
+                ),
+                (
+                    'records',
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name='Обработано записей'
+                    ),
+                ),
+                (
+                    'imported',
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name='Импортировано постов'
+                    ),
+                ),
+                (
+                    'skipped',
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name='Пропущено записей'
+                    ),
+                ),
+                (
+                    'finished_at',
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name='Дата завершения'
+                    ),
+                ),
+                (
+                    'updated_at',
+                    models.DateTimeField(
+                        auto_now=True, verbose_name='Дата обновления'
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'Контрольная точка импорта',
+                'verbose_name_plural': 'Контрольные точки импорта',
+            },
+        ),
+    ]
@@ -1,8 +1,77 @@
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    SearchVectorField,
+)
+from django.db import (
+    OperationalError,
+    connections,
+    models,
+    router,
+    transaction,
+)
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import (
+    Cast,
+    Coalesce,
+    Log,
+    Now,
+    NullIf,
+    Sqrt,
+    Upper,
+)
 
 User = get_user_model()
 
+SEARCH_CONFIG: str = 'russian'
+# Триграммный индекс помогает только запросам не короче трёх символов,
+# более короткие привели бы к полному сканированию таблицы.
+PLACE_MIN_LENGTH: int = 3
+
+# Горячий рейтинг: log10 от числа «уверенных» лайков (нижняя граница
+# Уилсона, умноженная на число голосов) плюс время публикации в единицах
+# HOT_DECAY_SECONDS. Каждые HOT_DECAY_SECONDS свежести стоят десятикратного
+# числа лайков, поэтому старые посты уступают новым без пересчёта,
+# и рейтинг поста меняется только при изменении его голосов.
+HOT_DECAY_SECONDS: int = 45000
+HOT_EPOCH: datetime = datetime(2025, 1, 1, tzinfo=UTC)
+# Квантиль нормального распределения для доверительного уровня 95%.
+WILSON_Z: float = 1.96
+
+
+def hot_score_expression() -> models.Expression:
+    """Выражение горячего рейтинга поста по его счётчикам и дате."""
+    z = Value(WILSON_Z)
+    # NULL вместо нуля голосов: деление на него даёт NULL, а не ошибку.
+    total = NullIf(
+        Cast(F('upvotes_count') + F('downvotes_count'), models.FloatField()),
+        Value(0.0),
+    )
+    share = Cast('upvotes_count', models.FloatField()) / total
+    lower_bound = (
+        share
+        + z * z / (2 * total)
+        - z * Sqrt(share * (1 - share) / total + z * z / (4 * total * total))
+    ) / (1 + z * z / total)
+    confident_upvotes = Coalesce(lower_bound * total, Value(0.0))
+
+    published = models.Func(
+        F('created_at'),
+        template='EXTRACT(EPOCH FROM %(expressions)s)',
+        output_field=models.FloatField(),
+    )
+    return (
+        Log(10, 1 + confident_upvotes)
+        + (published - HOT_EPOCH.timestamp()) / HOT_DECAY_SECONDS
+    )
+
 
 class Category(models.Model):
     name = models.CharField(
@@ -20,6 +89,195 @@ class Category(models.Model):
         return self.name
 
 
+def _votes_of_type(vote_type: str) -> Coalesce:
+    """Число голосов типа ``vote_type`` за пост по таблице Vote."""
+    votes = (
+        Vote.objects.filter(post=OuterRef('pk'), vote_type=vote_type)
+        .order_by()
+        .values('post')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(votes), Value(0))
+
+
+class PostQuerySet(models.QuerySet['Post']):
+    def with_viewer_state(self, user: Any) -> 'PostQuerySet':
+        """
+        Добавляет к постам оценку и отметку «в избранном» пользователя.
+
+        Оба значения считаются коррелированными подзапросами, поэтому лента
+        вместе с состоянием зрителя загружается одним запросом.
+        """
+        if not user.is_authenticated:
+            return self.annotate(
+                user_vote=Value(None, output_field=models.CharField()),
+                is_favorite=Value(False),
+            )
+        return self.annotate(
+            user_vote=Subquery(
+                Vote.objects.filter(post=OuterRef('pk'), user=user).values(
+                    'vote_type'
+                )[:1]
+            ),
+            is_favorite=Exists(
+                Favorite.objects.filter(post=OuterRef('pk'), user=user)
+            ),
+        )
+
+    def search(self, text: str) -> 'PostQuerySet':
+        """
+        Полнотекстовый поиск по заголовку, месту и описанию.
+
+        Запрос разбирается как в поисковиках (кавычки, ``or``, ``-слово``).
+        Найденные посты получают аннотацию ``rank``.
+        """
+        query = SearchQuery(
+            text,
+            config=SEARCH_CONFIG,
+            search_type='websearch',
+        )
+        # ts_rank возвращает real; приведение к double precision нужно,
+        # чтобы ранг без потерь попадал в курсор пагинации и обратно.
+        return self.filter(search_vector=query).annotate(
+            rank=Cast(
+                SearchRank(models.F('search_vector'), query),
+                models.FloatField(),
+            )
+        )
+
+    def popular_places(self, text: str, limit: int) -> list[tuple[str, int]]:
+        """
+        Места, содержащие ``text``, и число постов о каждом из них.
+
+        Написания, отличающиеся только регистром и пробелами, считаются
+        одним местом: оно показывается в самом частом варианте.
+        Популярные места идут первыми.
+        """
+        if len(text) < PLACE_MIN_LENGTH:
+            return []
+
+        # Запас на слияние одинаковых мест с разным написанием.
+        spellings = (
+            self.filter(place__icontains=text)
+            .order_by()
+            .values('place')
+            .annotate(posts=Count('pk'))
+            .order_by('-posts', 'place')[: limit * 5]
+        )
+        places: dict[str, tuple[str, int]] = {}
+        for row in spellings:
+            key: str = ' '.join(row['place'].split()).casefold()
+            place, posts = places.get(key, (row['place'], 0))
+            places[key] = (place, posts + row['posts'])
+
+        return sorted(
+            places.values(),
+            key=lambda item: (-item[1], item[0]),
+        )[:limit]
+
+    def recount_votes(self) -> int:
+        """Пересчитывает счётчики голосов по таблице Vote."""
+        return self.update(
+            upvotes_count=_votes_of_type('up'),
+            downvotes_count=_votes_of_type('down'),
+            score=_votes_of_type('up') - _votes_of_type('down'),
+            hot_ranked_at=None,
+        )
+
+    def vote_count_mismatches(self) -> 'PostQuerySet':
+        """
+        Посты, счётчики которых расходятся с таблицей Vote.
+
+        Посты получают аннотации ``actual_upvotes`` и ``actual_downvotes``.
+        """
+        return self.annotate(
+            actual_upvotes=_votes_of_type('up'),
+            actual_downvotes=_votes_of_type('down'),
+        ).exclude(
+            upvotes_count=F('actual_upvotes'),
+            downvotes_count=F('actual_downvotes'),
+            score=F('actual_upvotes') - F('actual_downvotes'),
+        )
+
+    # Строки постов блокируются по порядку id, чтобы сбросы буферов из
+    # разных процессов не взаимоблокировались. Снятие голоса может прийти
+    # из буфера другого процесса раньше самого голоса или без него, если
+    # тот процесс упал, поэтому счётчики не опускаются ниже нуля: иначе
+    # CHECK отклонил бы весь пакет, и он не записался бы никогда.
+    # Завышенный после этого счётчик исправляет check_vote_counts --fix.
+    VOTE_DELTAS_SQL = """
+        WITH deltas AS (
+            SELECT *
+            FROM unnest(
+                %(post_ids)s::bigint[],
+                %(upvotes)s::integer[],
+                %(downvotes)s::integer[]
+            ) AS deltas(post_id, up, down)
+        ),
+        locked AS (
+            SELECT id
+            FROM {post}
+            WHERE id IN (SELECT post_id FROM deltas)
+            ORDER BY id
+            FOR UPDATE
+        )
+        UPDATE {post}
+        SET upvotes_count = GREATEST(upvotes_count + deltas.up, 0),
+            downvotes_count = GREATEST(downvotes_count + deltas.down, 0),
+            score = GREATEST(upvotes_count + deltas.up, 0)
+                - GREATEST(downvotes_count + deltas.down, 0),
+            hot_ranked_at = NULL
+        FROM deltas
+        WHERE {post}.id = deltas.post_id
+            AND {post}.id IN (SELECT id FROM locked)
+        RETURNING {post}.category_id
+    """
+
+    def add_vote_deltas(self, deltas: dict[int, tuple[int, int]]) -> set[int]:
+        """
+        Прибавляет к счётчикам постов изменения ``(лайки, дизлайки)``.
+
+        Все посты обновляются одним запросом. Возвращает категории
+        обновлённых постов.
+        """
+        if not deltas:
+            return set()
+        post_ids: list[int] = sorted(deltas)
+        db: str = router.db_for_write(self.model)
+        with connections[db].cursor() as cursor:
+            cursor.execute(
+                self.VOTE_DELTAS_SQL.format(post=self.model._meta.db_table),
+                {
+                    'post_ids': post_ids,
+                    'upvotes': [deltas[post_id][0] for post_id in post_ids],
+                    'downvotes': [deltas[post_id][1] for post_id in post_ids],
+                },
+            )
+            return {category_id for (category_id,) in cursor.fetchall()}
+
+    def refresh_hot_scores(self, batch_size: int) -> int:
+        """
+        Пересчитывает горячий рейтинг одного пакета устаревших постов.
+
+        Устаревшими считаются новые посты и посты, голоса за которые
+        менялись после прошлого расчёта. Возвращает число обновлённых.
+        """
+        # Посты, за которые прямо сейчас голосуют, пропускаются и попадут
+        # в следующий пакет, а параллельные запуски не мешают друг другу.
+        with transaction.atomic(using=self.db):
+            stale: list[int] = list(
+                self.filter(hot_ranked_at__isnull=True)
+                .order_by('pk')
+                .select_for_update(skip_locked=True)
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            return self.filter(pk__in=stale).update(
+                hot_score=hot_score_expression(),
+                hot_ranked_at=Now(),
+            )
+
+
 class Post(models.Model):
     title = models.CharField(max_length=200, verbose_name='Заголовок')
     description = models.TextField(
@@ -49,22 +307,384 @@ class Post(models.Model):
         auto_now=True,
         verbose_name='Дата обновления',
     )
+    upvotes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество лайков',
+    )
+    downvotes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество дизлайков',
+    )
+    score = models.IntegerField(default=0, verbose_name='Рейтинг')
+    hot_score = models.FloatField(
+        default=0,
+        verbose_name='Горячий рейтинг',
+    )
+    hot_ranked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Дата расчёта горячего рейтинга',
+    )
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('title', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('place', weight='B', config=SEARCH_CONFIG)
+            + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+        verbose_name='Поисковый вектор',
+    )
+
+    objects = PostQuerySet.as_manager()
 
     @property
     def rating(self) -> int:
-        upvotes: int = self.votes.filter(vote_type='up').count()
-        downvotes: int = self.votes.filter(vote_type='down').count()
-        return upvotes - downvotes
+        return self.score
 
     class Meta:
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         ordering = ['-created_at']
+        # Индексы повторяют сортировки лент из views.HOME_ORDERINGS и
+        # фильтры лент, чтобы страница читалась из индекса без сортировки.
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='post_created_idx',
+            ),
+            models.Index(
+                fields=['category', '-created_at', '-id'],
+                name='post_category_created_idx',
+            ),
+            models.Index(
+                fields=['author', '-created_at', '-id'],
+                name='post_author_created_idx',
+            ),
+            models.Index(
+                fields=['-score', '-created_at', '-id'],
+                name='post_score_idx',
+            ),
+            GinIndex(fields=['search_vector'], name='post_search_vector_gin'),
+            GinIndex(
+                OpClass(Upper('place'), name='gin_trgm_ops'),
+                name='post_place_trgm_gin',
+            ),
+            models.Index(
+                F('hot_score').desc(),
+                F('created_at').desc(),
+                F('id').desc(),
+                name='post_hot_idx',
+            ),
+            models.Index(
+                fields=['id'],
+                condition=Q(hot_ranked_at__isnull=True),
+                name='post_hot_stale_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.title
 
 
+@dataclass(frozen=True)
+class VoteResult:
+    user_vote: str | None
+    upvotes_count: int
+    downvotes_count: int
+    category_id: int
+
+
+class VoteManager(models.Manager['Vote']):
+    # Голос с тем же типом снимается, с другим — меняется, иначе
+    # создаётся. Счётчики поста меняются на разницу в том же выражении.
+    # Переключения одной пары «пост — пользователь» сначала берут
+    # advisory-блокировку: так одновременные клики выполняются по очереди,
+    # снимок основного выражения видит последнюю версию голоса, и CHECK на
+    # счётчиках не срабатывает на устаревшей строке поста. Если голос
+    # вставили в обход блокировки, ON CONFLICT ничего не делает, пост не
+    # блокируется и попытка повторяется.
+    LOCK_SQL = """
+        SELECT pg_advisory_xact_lock(
+            hashtextextended(%(post_id)s || ':' || %(user_id)s, 0)
+        )
+    """
+    CHANGES_SQL = """
+        WITH previous AS (
+            SELECT id, vote_type
+            FROM {vote}
+            WHERE post_id = %(post_id)s AND user_id = %(user_id)s
+            FOR UPDATE
+        ),
+        removed AS (
+            DELETE FROM {vote}
+            WHERE id IN (
+                SELECT id FROM previous WHERE vote_type = %(vote_type)s
+            )
+            RETURNING vote_type
+        ),
+        changed AS (
+            UPDATE {vote}
+            SET vote_type = %(vote_type)s
+            WHERE id IN (
+                SELECT id FROM previous WHERE vote_type <> %(vote_type)s
+            )
+            RETURNING vote_type
+        ),
+        inserted AS (
+            INSERT INTO {vote} (post_id, user_id, vote_type, created_at)
+            SELECT %(post_id)s, %(user_id)s, %(vote_type)s, NOW()
+            WHERE NOT EXISTS (SELECT 1 FROM previous)
+                AND EXISTS (SELECT 1 FROM {post} WHERE id = %(post_id)s)
+            ON CONFLICT (post_id, user_id) DO NOTHING
+            RETURNING vote_type
+        ),
+        changes AS (
+            SELECT vote_type, -1 AS delta FROM removed
+            UNION ALL
+            SELECT vote_type, 1 FROM changed
+            UNION ALL
+            SELECT CASE vote_type WHEN 'up' THEN 'down' ELSE 'up' END, -1
+            FROM changed
+            UNION ALL
+            SELECT vote_type, 1 FROM inserted
+        ),
+    """
+    TOGGLE_SQL = (
+        CHANGES_SQL
+        + """
+        counted AS (
+            UPDATE {post}
+            SET upvotes_count = upvotes_count + COALESCE(
+                    (SELECT SUM(delta) FROM changes WHERE vote_type = 'up'),
+                    0
+                ),
+                downvotes_count = downvotes_count + COALESCE(
+                    (SELECT SUM(delta) FROM changes WHERE vote_type = 'down'),
+                    0
+                ),
+                score = score + COALESCE(
+                    (
+                        SELECT SUM(
+                            CASE vote_type WHEN 'up' THEN delta ELSE -delta END
+                        )
+                        FROM changes
+                    ),
+                    0
+                ),
+                hot_ranked_at = NULL
+            WHERE id = %(post_id)s AND EXISTS (SELECT 1 FROM changes)
+            RETURNING upvotes_count, downvotes_count, category_id
+        )
+        SELECT
+            EXISTS (SELECT 1 FROM {post} WHERE id = %(post_id)s),
+            EXISTS (SELECT 1 FROM counted),
+            CASE
+                WHEN EXISTS (SELECT 1 FROM removed) THEN NULL
+                ELSE %(vote_type)s
+            END,
+            (SELECT upvotes_count FROM counted),
+            (SELECT downvotes_count FROM counted),
+            (SELECT category_id FROM counted)
+    """
+    )
+    # Отложенный режим: голос записывается сразу, а вместо обновления
+    # строки поста возвращаются изменения счётчиков для vote_buffer.
+    BUFFERED_TOGGLE_SQL = (
+        CHANGES_SQL
+        + """
+        deltas (up, down) AS (
+            SELECT
+                COALESCE(SUM(delta) FILTER (WHERE vote_type = 'up'), 0),
+                COALESCE(SUM(delta) FILTER (WHERE vote_type = 'down'), 0)
+            FROM changes
+        )
+        SELECT
+            {post}.id IS NOT NULL,
+            EXISTS (SELECT 1 FROM changes),
+            CASE
+                WHEN EXISTS (SELECT 1 FROM removed) THEN NULL
+                ELSE %(vote_type)s
+            END,
+            {post}.upvotes_count,
+            {post}.downvotes_count,
+            {post}.category_id,
+            deltas.up,
+            deltas.down
+        FROM deltas
+        LEFT JOIN {post} ON {post}.id = %(post_id)s
+    """
+    )
+    TOGGLE_ATTEMPTS: int = 3
+
+    def toggle(self, post_id: int, user_id: int, vote_type: str) -> VoteResult:
+        """
+        Переключает голос пользователя одной транзакцией.
+
+        Возвращает новый голос и свежие счётчики поста. Если поста нет,
+        выбрасывает ``Post.DoesNotExist``.
+        """
+        params: dict[str, Any] = {
+            'post_id': post_id,
+            'user_id': user_id,
+            'vote_type': vote_type,
+        }
+        row: tuple[Any, ...] = self._toggle(self.TOGGLE_SQL, params)
+        return VoteResult(*row)
+
+    def toggle_buffered(
+        self,
+        post_id: int,
+        user_id: int,
+        vote_type: str,
+    ) -> tuple[VoteResult, int, int]:
+        """
+        Переключает голос, не трогая строку поста.
+
+        Возвращает результат со счётчиками, сохранёнными в посте до этого
+        голоса, и изменения лайков и дизлайков, которые нужно добавить
+        к счётчикам (см. ``vote_buffer``).
+        """
+        params: dict[str, Any] = {
+            'post_id': post_id,
+            'user_id': user_id,
+            'vote_type': vote_type,
+        }
+        *row, upvotes_delta, downvotes_delta = self._toggle(
+            self.BUFFERED_TOGGLE_SQL, params
+        )
+        return VoteResult(*row), upvotes_delta, downvotes_delta
+
+    def _toggle(self, sql: str, params: dict[str, Any]) -> tuple[Any, ...]:
+        tables: dict[str, str] = {
+            'vote': self.model._meta.db_table,
+            'post': Post._meta.db_table,
+        }
+        db: str = router.db_for_write(self.model)
+        with transaction.atomic(using=db), connections[db].cursor() as cursor:
+            for _ in range(self.TOGGLE_ATTEMPTS):
+                cursor.execute(self.LOCK_SQL.format(**tables), params)
+                cursor.execute(sql.format(**tables), params)
+                post_exists, applied, *result = cursor.fetchone()
+                if not post_exists:
+                    raise Post.DoesNotExist('Пост не найден')
+                if applied:
+                    return tuple(result)
+        raise OperationalError('Не удалось применить голос')
+
+    # Пакет голосов одного пользователя: ``NULL`` в vote_type снимает
+    # голос. Пары «пост — пользователь» блокируются в порядке постов, как
+    # в toggle, поэтому пакеты и одиночные клики не взаимоблокируются.
+    BATCH_LOCK_SQL = """
+        SELECT pg_advisory_xact_lock(
+            hashtextextended(post_id || ':' || %(user_id)s, 0)
+        )
+        FROM unnest(%(post_ids)s::bigint[]) AS locked(post_id)
+    """
+    BATCH_SQL = """
+        WITH wanted AS (
+            SELECT wanted.post_id, wanted.vote_type
+            FROM unnest(%(post_ids)s::bigint[], %(vote_types)s::text[])
+                AS wanted(post_id, vote_type)
+            WHERE EXISTS (SELECT 1 FROM {post} WHERE id = wanted.post_id)
+        ),
+        previous AS (
+            SELECT {vote}.id, {vote}.post_id, {vote}.vote_type
+            FROM {vote}
+            JOIN wanted USING (post_id)
+            WHERE {vote}.user_id = %(user_id)s
+            FOR UPDATE OF {vote}
+        ),
+        removed AS (
+            DELETE FROM {vote}
+            USING previous, wanted
+            WHERE {vote}.id = previous.id
+                AND wanted.post_id = previous.post_id
+                AND wanted.vote_type IS NULL
+            RETURNING {vote}.post_id, previous.vote_type
+        ),
+        changed AS (
+            UPDATE {vote}
+            SET vote_type = wanted.vote_type
+            FROM previous, wanted
+            WHERE {vote}.id = previous.id
+                AND wanted.post_id = previous.post_id
+                AND wanted.vote_type <> previous.vote_type
+            RETURNING {vote}.post_id, wanted.vote_type
+        ),
+        inserted AS (
+            INSERT INTO {vote} (post_id, user_id, vote_type, created_at)
+            SELECT post_id, %(user_id)s, vote_type, NOW()
+            FROM wanted
+            WHERE vote_type IS NOT NULL
+                AND post_id NOT IN (SELECT post_id FROM previous)
+            ON CONFLICT (post_id, user_id) DO NOTHING
+            RETURNING post_id, vote_type
+        ),
+        changes AS (
+            SELECT post_id, vote_type, -1 AS delta FROM removed
+            UNION ALL
+            SELECT post_id, vote_type, 1 FROM changed
+            UNION ALL
+            SELECT
+                post_id,
+                CASE vote_type WHEN 'up' THEN 'down' ELSE 'up' END,
+                -1
+            FROM changed
+            UNION ALL
+            SELECT post_id, vote_type, 1 FROM inserted
+        ),
+        deltas AS (
+            SELECT
+                post_id,
+                SUM(delta) FILTER (WHERE vote_type = 'up') AS up,
+                SUM(delta) FILTER (WHERE vote_type = 'down') AS down
+            FROM changes
+            GROUP BY post_id
+        )
+        UPDATE {post}
+        SET upvotes_count = upvotes_count + COALESCE(deltas.up, 0),
+            downvotes_count = downvotes_count + COALESCE(deltas.down, 0),
+            score = score + COALESCE(deltas.up, 0) - COALESCE(deltas.down, 0),
+            hot_ranked_at = NULL
+        FROM deltas
+        WHERE {post}.id = deltas.post_id
+        RETURNING {post}.id, {post}.category_id
+    """
+
+    def apply_batch(
+        self,
+        user_id: int,
+        votes: dict[int, str | None],
+    ) -> dict[int, int]:
+        """
+        Устанавливает голоса пользователя за несколько постов сразу.
+
+        ``votes`` сопоставляет посту нужный голос, ``None`` снимает его.
+        Голоса и счётчики постов меняются двумя запросами в одной
+        транзакции, несуществующие посты пропускаются. Возвращает
+        категории постов, счётчики которых изменились.
+        """
+        if not votes:
+            return {}
+        tables: dict[str, str] = {
+            'vote': self.model._meta.db_table,
+            'post': Post._meta.db_table,
+        }
+        post_ids: list[int] = sorted(votes)
+        params: dict[str, Any] = {
+            'user_id': user_id,
+            'post_ids': post_ids,
+            'vote_types': [votes[post_id] for post_id in post_ids],
+        }
+        db: str = router.db_for_write(self.model)
+        with transaction.atomic(using=db), connections[db].cursor() as cursor:
+            cursor.execute(self.BATCH_LOCK_SQL, params)
+            cursor.execute(self.BATCH_SQL.format(**tables), params)
+            return dict(cursor.fetchall())
+
+
 class Vote(models.Model):
     VOTE_TYPES: list[tuple[str, str]] = [
         ('up', 'Положительная'),
@@ -93,15 +713,110 @@ class Vote(models.Model):
         verbose_name='Дата оценки',
     )
 
+    objects = VoteManager()
+
     class Meta:
         verbose_name = 'Оценка'
         verbose_name_plural = 'Оценки'
         unique_together = ['post', 'user']
+        indexes = [
+            # Подсчёт голосов поста по типам читает только индекс.
+            models.Index(
+                fields=['post', 'vote_type'],
+                name='vote_post_type_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return f'{self.user.username} - {self.vote_type} - {self.post.title}'
 
 
+class FavoriteManager(models.Manager['Favorite']):
+    TOGGLE_SQL = """
+        WITH removed AS (
+            DELETE FROM {favorite}
+            WHERE user_id = %(user_id)s AND post_id = %(post_id)s
+            RETURNING id
+        ),
+        added AS (
+            INSERT INTO {favorite} (user_id, post_id, created_at)
+            SELECT %(user_id)s, %(post_id)s, NOW()
+            WHERE NOT EXISTS (SELECT 1 FROM removed)
+                AND EXISTS (SELECT 1 FROM {post} WHERE id = %(post_id)s)
+            ON CONFLICT (user_id, post_id) DO NOTHING
+            RETURNING id
+        )
+        SELECT
+            EXISTS (SELECT 1 FROM removed),
+            EXISTS (SELECT 1 FROM {post} WHERE id = %(post_id)s)
+    """
+
+    def toggle(self, post_id: int, user_id: int) -> bool:
+        """
+        Добавляет пост в избранное или убирает его оттуда одним запросом.
+
+        Возвращает ``True``, если пост теперь в избранном. Если поста нет,
+        выбрасывает ``Post.DoesNotExist``.
+        """
+        sql: str = self.TOGGLE_SQL.format(
+            favorite=self.model._meta.db_table,
+            post=Post._meta.db_table,
+        )
+        db: str = router.db_for_write(self.model)
+        with connections[db].cursor() as cursor:
+            cursor.execute(sql, {'post_id': post_id, 'user_id': user_id})
+            removed, post_exists = cursor.fetchone()
+        if not post_exists:
+            raise Post.DoesNotExist('Пост не найден')
+        return not removed
+
+    BATCH_SQL = """
+        WITH wanted AS (
+            SELECT wanted.post_id, wanted.keep
+            FROM unnest(%(post_ids)s::bigint[], %(keep)s::boolean[])
+                AS wanted(post_id, keep)
+            WHERE EXISTS (SELECT 1 FROM {post} WHERE id = wanted.post_id)
+        ),
+        removed AS (
+            DELETE FROM {favorite}
+            USING wanted
+            WHERE {favorite}.user_id = %(user_id)s
+                AND {favorite}.post_id = wanted.post_id
+                AND NOT wanted.keep
+        )
+        INSERT INTO {favorite} (user_id, post_id, created_at)
+        SELECT %(user_id)s, post_id, NOW()
+        FROM wanted
+        WHERE keep
+        ON CONFLICT (user_id, post_id) DO NOTHING
+    """
+
+    def apply_batch(self, user_id: int, favorites: dict[int, bool]) -> None:
+        """
+        Добавляет посты в избранное или убирает их одним запросом.
+
+        ``favorites`` сопоставляет посту, должен ли он быть в избранном.
+        Несуществующие посты пропускаются.
+        """
+        if not favorites:
+            return
+        post_ids: list[int] = sorted(favorites)
+        sql: str = self.BATCH_SQL.format(
+            favorite=self.model._meta.db_table,
+            post=Post._meta.db_table,
+        )
+        db: str = router.db_for_write(self.model)
+        with connections[db].cursor() as cursor:
+            cursor.execute(
+                sql,
+                {
+                    'user_id': user_id,
+                    'post_ids': post_ids,
+                    'keep': [favorites[post_id] for post_id in post_ids],
+                },
+            )
+
+
 class Favorite(models.Model):
     user = models.ForeignKey(
         User,
@@ -120,10 +835,63 @@ class Favorite(models.Model):
         verbose_name='Дата добавления',
     )
 
+    objects = FavoriteManager()
+
     class Meta:
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранные'
         unique_together = ['user', 'post']
+        indexes = [
+            models.Index(
+                fields=['user', '-created_at', '-id'],
+                include=['post'],
+                name='favorite_user_created_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return f'{self.user.username} - {self.post.title}'
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Сколько записей файла уже обработала команда ``import_discounts``.
+
+    Обновляется в одной транзакции с пакетом постов, поэтому после сбоя
+    импорт продолжается ровно с первой незаписанной записи.
+    """
+
+    source = models.CharField(
+        max_length=500,
+        unique=True,
+        verbose_name='Файл',
+    )
+    size = models.PositiveBigIntegerField(verbose_name='Размер файла')
+    records = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Обработано записей',
+    )
+    imported = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Импортировано постов',
+    )
+    skipped = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Пропущено записей',
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дата завершения',
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата обновления',
+    )
+
+    class Meta:
+        verbose_name = 'Контрольная точка импорта'
+        verbose_name_plural = 'Контрольные точки импорта'
+
+    def __str__(self) -> str:
+        return f'{self.source}: {self.records}'
@@ -0,0 +1,146 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+
+PAGE_SIZE: int = 20
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class KeysetPage:
+    items: list[Any]
+    next_cursor: str | None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+def _cursor_value(value: Any) -> Any:
+    # DjangoJSONEncoder округляет время до миллисекунд, а курсору нужна
+    # точность до микросекунд, иначе строки с одним временем теряются.
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'Неподдерживаемое значение курсора: {value!r}')
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload: bytes = json.dumps(list(values), default=_cursor_value).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> list[Any]:
+    padding: str = '=' * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as error:
+        raise InvalidCursor('Некорректный курсор') from error
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor('Курсор не подходит к сортировке')
+    return values
+
+
+def seek_filter(ordering: Sequence[str], values: Sequence[Any]) -> Q:
+    """
+    Условие «строго после» для ключей сортировки.
+
+    Первое поле дополнительно ограничено нестрогим неравенством, чтобы
+    PostgreSQL мог начать сканирование индекса сразу с нужной позиции.
+    """
+    fields: list[str] = [name.lstrip('-') for name in ordering]
+    lookups: list[str] = [
+        'lt' if name.startswith('-') else 'gt' for name in ordering
+    ]
+
+    condition = Q()
+    for index, field in enumerate(fields):
+        step = Q(**{f'{field}__{lookups[index]}': values[index]})
+        for previous in range(index):
+            step &= Q(**{fields[previous]: values[previous]})
+        condition |= step
+
+    return Q(**{f'{fields[0]}__{lookups[0]}e': values[0]}) & condition
+
+
+def page_queryset(
+    queryset: QuerySet[Any],
+    ordering: Sequence[str],
+    cursor: str | None = None,
+    page_size: int = PAGE_SIZE,
+) -> QuerySet[Any]:
+    """
+    Выборка строк страницы после позиции ``cursor``.
+
+    Возвращает на одну строку больше ``page_size``: по лишней строке
+    ``paginate`` понимает, что есть следующая страница.
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values: list[Any] = decode_cursor(cursor, len(ordering))
+        try:
+            queryset = queryset.filter(seek_filter(ordering, values))
+        except (ValidationError, TypeError, ValueError) as error:
+            raise InvalidCursor('Некорректный курсор') from error
+    return queryset[: page_size + 1]
+
+
+def _keyset_page(
+    items: list[Any],
+    ordering: Sequence[str],
+    page_size: int,
+) -> KeysetPage:
+    next_cursor: str | None = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last: Any = items[-1]
+        # Строки ``values()`` — словари, остальные выборки дают объекты.
+        names: list[str] = [name.lstrip('-') for name in ordering]
+        next_cursor = encode_cursor(
+            [last[name] for name in names]
+            if isinstance(last, dict)
+            else [getattr(last, name) for name in names]
+        )
+    return KeysetPage(items=items, next_cursor=next_cursor)
+
+
+def paginate(
+    queryset: QuerySet[Any],
+    ordering: Sequence[str],
+    cursor: str | None = None,
+    page_size: int = PAGE_SIZE,
+) -> KeysetPage:
+    """
+    Возвращает страницу выборки после позиции ``cursor``.
+
+    Поля ``ordering`` должны однозначно упорядочивать строки (последним
+    обычно идёт первичный ключ) и быть атрибутами объектов выборки или
+    ключами её строк, если это ``values()``.
+    """
+    items: list[Any] = list(
+        page_queryset(queryset, ordering, cursor, page_size)
+    )
+    return _keyset_page(items, ordering, page_size)
+
+
+async def apaginate(
+    queryset: QuerySet[Any],
+    ordering: Sequence[str],
+    cursor: str | None = None,
+    page_size: int = PAGE_SIZE,
+) -> KeysetPage:
+    """Асинхронный ``paginate`` для асинхронных представлений."""
+    items: list[Any] = [
+        item
+        async for item in page_queryset(queryset, ordering, cursor, page_size)
+    ]
+    return _keyset_page(items, ordering, page_size)
@@ -0,0 +1,117 @@
+"""
+Проверка планов запросов лент.
+
+Запросы лент выполняются через ``EXPLAIN`` с запрещёнными
+последовательным сканированием и сортировкой. На маленькой базе
+PostgreSQL всё равно предпочёл бы их индексам, а при запрете выберет
+индекс, если подходящий есть. Если в плане всё же остался ``Seq Scan``
+или ``Sort``, значит, для запроса нет индекса и на большой таблице он
+будет читать её целиком.
+"""
+
+import json
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from django.db import connections, transaction
+from django.db.models import QuerySet
+from django.test import RequestFactory
+
+from .cards import feed_values
+from .pagination import encode_cursor, page_queryset
+from .views import feed_queryset
+
+PLAN_SETTINGS: tuple[str, ...] = (
+    'SET LOCAL enable_seqscan = off',
+    'SET LOCAL enable_sort = off',
+)
+
+
+@dataclass
+class PlanReport:
+    name: str
+    problems: list[str]
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+
+def _plan_nodes(node: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield node
+    for child in node.get('Plans', []):
+        yield from _plan_nodes(child)
+
+
+def plan_problems(queryset: QuerySet[Any]) -> list[str]:
+    """Последовательные сканирования и сортировки в плане запроса."""
+    with (
+        transaction.atomic(using=queryset.db),
+        connections[queryset.db].cursor() as cursor,
+    ):
+        for statement in PLAN_SETTINGS:
+            cursor.execute(statement)
+        plan = json.loads(queryset.explain(format='json'))
+        # Откат отменяет SET LOCAL, даже если проверка идёт внутри
+        # внешней транзакции, например в тестах.
+        transaction.set_rollback(True, using=queryset.db)
+
+    problems: list[str] = []
+    for node in _plan_nodes(plan[0]['Plan']):
+        if node['Node Type'] == 'Seq Scan':
+            problems.append(
+                f'последовательное сканирование {node["Relation Name"]}'
+            )
+        elif node['Node Type'] in ('Sort', 'Incremental Sort'):
+            keys: str = ', '.join(node['Sort Key'])
+            problems.append(f'сортировка по {keys}')
+    return problems
+
+
+def check_feed_plans(user: Any, category_id: int) -> list[PlanReport]:
+    """
+    Проверяет первую и следующую страницы лент.
+
+    Запросы строятся теми же функциями, что и в представлениях, от имени
+    ``user``. Для следующей страницы курсор берётся по первому посту
+    ленты, поэтому пустые ленты проверяются только первой страницей.
+    Поиск не проверяется: результаты упорядочены по рангу, которого нет
+    в индексе.
+    """
+    cases: list[tuple[str, dict[str, str]]] = [
+        ('home', {}),
+        ('home', {'sort': 'rating'}),
+        ('home', {'sort': 'hot'}),
+        ('home', {'category': str(category_id)}),
+        ('my-posts', {}),
+        ('favorites', {}),
+    ]
+    factory = RequestFactory()
+    reports: list[PlanReport] = []
+    for feed, query in cases:
+        request = factory.get('/', query)
+        request.user = user
+        posts, ordering = feed_queryset(request, feed)
+        # План той же выборки, которой ленты читают карточки.
+        rows = feed_values(posts, ordering)
+
+        name: str = ' '.join(
+            [feed, *(f'{key}={value}' for key, value in query.items())]
+        )
+        reports.append(
+            PlanReport(name, plan_problems(page_queryset(rows, ordering)))
+        )
+
+        first = rows.order_by(*ordering).first()
+        if first is not None:
+            cursor: str = encode_cursor(
+                [first[field.lstrip('-')] for field in ordering]
+            )
+            reports.append(
+                PlanReport(
+                    f'{name}, следующая страница',
+                    plan_problems(page_queryset(rows, ordering, cursor)),
+                )
+            )
+    return reports
@@ -0,0 +1,32 @@
+from typing import Any
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import feed_cache
+from .models import Category, Post
+
+
+@receiver(post_save, sender=Post)
+def post_saved(
+    sender: type[Post], instance: Post, created: bool, **kwargs: Any
+) -> None:
+    if created:
+        feed_cache.bump_category(instance.category_id, 'posts')
+    else:
+        # При правке поста могла смениться категория, а прежняя
+        # неизвестна, поэтому сбрасываются ленты всех категорий.
+        feed_cache.bump_all('posts')
+    feed_cache.bump_viewer(instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender: type[Post], instance: Post, **kwargs: Any) -> None:
+    feed_cache.bump_category(instance.category_id, 'posts')
+    feed_cache.bump_viewer(instance.author_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender: type[Category], **kwargs: Any) -> None:
+    feed_cache.invalidate_categories()
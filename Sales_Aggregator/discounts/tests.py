@@ -1 +1,1956 @@
-# Create your tests here.
+import csv
+import json
+import logging
+import re
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connections
+from django.http import HttpRequest, HttpResponse
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from psycopg_pool import ConnectionPool
+from Sales_Aggregator.db_pool import pool_stats
+from Sales_Aggregator.db_router import (
+    ReplicaRouter,
+    primary_reads,
+    replica_reads,
+)
+from Sales_Aggregator.middleware import (
+    PrimaryStickinessMiddleware,
+    QueryCountMiddleware,
+)
+from Sales_Aggregator.query_budget import count_queries, query_budget
+from users.models import CustomUser
+
+from Sales_Aggregator import request_timing
+
+from . import cards, exporting, feed_cache, importing, live_counts, vote_buffer
+from .benchmark import run_benchmark
+from .live_counts import CountsBroker
+from .load_test import session_cookie
+from .management.commands import check_vote_counts, import_discounts
+from .models import (
+    Category,
+    Favorite,
+    ImportCheckpoint,
+    Post,
+    PostQuerySet,
+    Vote,
+)
+from .pagination import (
+    PAGE_SIZE,
+    KeysetPage,
+    apaginate,
+    encode_cursor,
+    paginate,
+)
+from .query_plans import check_feed_plans
+from .views import HOME_ORDERINGS
+from .vote_buffer import VoteCountBuffer
+
+AJAX: dict[str, str] = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+
+def create_posts(
+    author: CustomUser,
+    category: Category,
+    count: int,
+) -> list[Post]:
+    return Post.objects.bulk_create(
+        Post(
+            title=f'Скидка {number}',
+            description='Условия',
+            place='Кафе',
+            category=category,
+            author=author,
+        )
+        for number in range(count)
+    )
+
+
+def card_ids(html: str) -> list[int]:
+    return [
+        int(post_id)
+        for post_id in re.findall(
+            r'data-favorite-url="/favorite/(\d+)/"', html
+        )
+    ]
+
+
+def home_card_ids(html: str) -> list[int]:
+    return [
+        int(post_id)
+        for post_id in re.findall(
+            r'class="discount-card" data-post-id="(\d+)"', html
+        )
+    ]
+
+
+# Реплика-зеркало не видит данных из незафиксированной транзакции теста,
+# поэтому ленты в тестах читают с основной базы даже при DB_REPLICA_HOSTS.
+@override_settings(REPLICA_DATABASES=[])
+class DiscountsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.author = CustomUser.objects.create_user('author', password='pass')
+        cls.viewer = CustomUser.objects.create_user('viewer', password='pass')
+        cls.food = Category.objects.create(name='Еда')
+        cls.books = Category.objects.create(name='Книги')
+        cls.post = Post.objects.create(
+            title='Скидка на кофе',
+            description='Покажите студенческий',
+            place='Кофейня',
+            category=cls.food,
+            author=cls.author,
+        )
+
+    def setUp(self) -> None:
+        # Кеш не откатывается вместе с транзакцией теста.
+        cache.clear()
+
+
+class VoteTests(DiscountsTestCase):
+    def vote(self, vote_type: str) -> dict[str, object]:
+        response = self.client.post(
+            reverse('vote_post', args=[self.post.id, vote_type]),
+            **AJAX,
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_vote_updates_stored_counters(self) -> None:
+        self.client.force_login(self.viewer)
+
+        self.assertEqual(
+            self.vote('up'),
+            {
+                'success': True,
+                'user_vote': 'up',
+                'upvotes_count': 1,
+                'downvotes_count': 0,
+            },
+        )
+        self.assertEqual(self.vote('down')['user_vote'], 'down')
+        data = self.vote('down')
+
+        self.assertIsNone(data['user_vote'])
+        self.assertEqual(data['upvotes_count'], 0)
+        self.assertEqual(data['downvotes_count'], 0)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_counters_match_votes(self) -> None:
+        Vote.objects.toggle(self.post.id, self.viewer.id, 'up')
+        Vote.objects.toggle(self.post.id, self.author.id, 'down')
+        Vote.objects.toggle(self.post.id, self.author.id, 'up')
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.upvotes_count, 2)
+        self.assertEqual(self.post.downvotes_count, 0)
+        self.assertEqual(self.post.rating, 2)
+
+    def test_invalid_vote_type(self) -> None:
+        self.client.force_login(self.viewer)
+        response = self.client.post(
+            reverse('vote_post', args=[self.post.id, 'sideways']),
+            **AJAX,
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_vote_for_missing_post(self) -> None:
+        self.client.force_login(self.viewer)
+        response = self.client.post(reverse('vote_post', args=[0, 'up']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_recount_votes_command(self) -> None:
+        Vote.objects.create(post=self.post, user=self.viewer, vote_type='up')
+        Vote.objects.create(post=self.post, user=self.author, vote_type='down')
+
+        call_command('recount_votes', stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.upvotes_count, 1)
+        self.assertEqual(self.post.downvotes_count, 1)
+        self.assertEqual(self.post.score, 0)
+
+
+class FavoriteTests(DiscountsTestCase):
+    def test_toggle_favorite(self) -> None:
+        self.client.force_login(self.viewer)
+        url: str = reverse('toggle_favorite', args=[self.post.id])
+
+        self.assertTrue(self.client.post(url, **AJAX).json()['is_favorite'])
+        self.assertTrue(Favorite.objects.filter(user=self.viewer).exists())
+        self.assertFalse(self.client.post(url, **AJAX).json()['is_favorite'])
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_favorite_missing_post(self) -> None:
+        self.client.force_login(self.viewer)
+        response = self.client.post(reverse('toggle_favorite', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class BatchActionsTests(DiscountsTestCase):
+    def batch(self, *operations: object) -> Any:
+        response = self.client.post(
+            reverse('batch_actions'),
+            {'operations': list(operations)},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_applies_operations(self) -> None:
+        other, missing = create_posts(self.author, self.books, 2)
+        missing_id: int = missing.id
+        missing.delete()
+        Vote.objects.toggle(other.id, self.viewer.id, 'down')
+        Favorite.objects.toggle(other.id, self.viewer.id)
+        self.client.force_login(self.viewer)
+
+        # Сессия и пользователь, две точки сохранения, блокировки, голоса,
+        # избранное и итоговое состояние: число не зависит от размера пакета.
+        with query_budget(10):
+            data = self.batch(
+                {'type': 'vote', 'post_id': self.post.id, 'value': 'down'},
+                {'type': 'vote', 'post_id': self.post.id, 'value': 'up'},
+                {'type': 'vote', 'post_id': other.id, 'value': None},
+                {'type': 'favorite', 'post_id': self.post.id, 'value': True},
+                {'type': 'favorite', 'post_id': other.id, 'value': False},
+                {'type': 'vote', 'post_id': missing_id, 'value': 'up'},
+                {'type': 'vote', 'post_id': self.post.id, 'value': 'left'},
+            )
+
+        self.assertEqual(
+            [result['success'] for result in data['results']],
+            [True, True, True, True, True, False, False],
+        )
+        self.assertEqual(data['results'][5]['error'], 'Пост не найден')
+        self.assertEqual(
+            data['posts'][str(self.post.id)],
+            {
+                'upvotes_count': 1,
+                'downvotes_count': 0,
+                'score': 1,
+                'user_vote': 'up',
+                'is_favorite': True,
+            },
+        )
+        self.assertEqual(
+            data['posts'][str(other.id)],
+            {
+                'upvotes_count': 0,
+                'downvotes_count': 0,
+                'score': 0,
+                'user_vote': None,
+                'is_favorite': False,
+            },
+        )
+        self.assertEqual(
+            list(Favorite.objects.values_list('post_id', flat=True)),
+            [self.post.id],
+        )
+
+    def test_ids_beyond_integer_range(self) -> None:
+        self.client.force_login(self.viewer)
+        data = self.batch(
+            {'type': 'vote', 'post_id': 2**31, 'value': 'up'},
+            {'type': 'favorite', 'post_id': 2**31, 'value': True},
+            {'type': 'vote', 'post_id': 2**63, 'value': 'up'},
+            {'type': 'vote', 'post_id': self.post.id, 'value': 'up'},
+        )
+
+        self.assertEqual(
+            [result.get('error') for result in data['results']],
+            ['Пост не найден'] * 3 + [None],
+        )
+        self.assertEqual(list(data['posts']), [str(self.post.id)])
+
+    def test_repeated_batch_changes_nothing(self) -> None:
+        Vote.objects.toggle(self.post.id, self.author.id, 'up')
+        self.client.force_login(self.viewer)
+        operations = (
+            {'type': 'vote', 'post_id': self.post.id, 'value': 'down'},
+            {'type': 'favorite', 'post_id': self.post.id, 'value': True},
+        )
+        first = self.batch(*operations)
+        self.assertEqual(self.batch(*operations), first)
+
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.upvotes_count, self.post.downvotes_count), (1, 1)
+        )
+        self.assertEqual(Vote.objects.count(), 2)
+        self.assertEqual(Favorite.objects.count(), 1)
+
+    def test_publishes_changed_counts(self) -> None:
+        self.client.force_login(self.viewer)
+        with (
+            mock.patch.object(live_counts, 'publish_counts') as publish,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            self.batch(
+                {'type': 'vote', 'post_id': self.post.id, 'value': 'up'},
+                {'type': 'favorite', 'post_id': self.post.id, 'value': True},
+            )
+        publish.assert_called_once_with(self.post.id, 1, 0)
+
+    def test_bad_requests(self) -> None:
+        self.client.force_login(self.viewer)
+        url: str = reverse('batch_actions')
+        too_many = [
+            {'type': 'favorite', 'post_id': self.post.id, 'value': True}
+        ] * 101
+        for body in ('not json', '[]', '{"operations": {}}'):
+            with self.subTest(body=body):
+                response = self.client.post(
+                    url, body, content_type='application/json'
+                )
+                self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            url, {'operations': too_many}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_login(self) -> None:
+        response = self.client.post(
+            reverse('batch_actions'),
+            {'operations': []},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(VOTE_COUNTS_BUFFERED=1)
+class VoteBufferTests(DiscountsTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.buffer = VoteCountBuffer()
+        for patcher in (
+            mock.patch.object(vote_buffer, 'buffer', self.buffer),
+            mock.patch.object(vote_buffer, 'start_flusher'),
+            mock.patch.object(vote_buffer, 'FLUSH_INTERVAL', 0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def vote(self, user: CustomUser, vote_type: str) -> Any:
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('vote_post', args=[self.post.id, vote_type]),
+                **AJAX,
+            )
+        return response.json()
+
+    def test_counts_are_written_on_flush(self) -> None:
+        Post.objects.filter(pk=self.post.pk).update(
+            hot_ranked_at=timezone.now()
+        )
+        self.assertEqual(self.vote(self.viewer, 'up')['upvotes_count'], 1)
+        data = self.vote(self.author, 'down')
+        self.assertEqual(
+            (data['upvotes_count'], data['downvotes_count']), (1, 1)
+        )
+        self.assertEqual(self.vote(self.author, 'up')['upvotes_count'], 2)
+
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.upvotes_count, self.post.downvotes_count), (0, 0)
+        )
+        self.assertEqual(Vote.objects.count(), 2)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.upvotes_count, self.post.downvotes_count), (2, 0)
+        )
+        self.assertEqual(self.post.score, 2)
+        self.assertIsNone(self.post.hot_ranked_at)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_flushes_ids_beyond_integer_range(self) -> None:
+        post = Post.objects.create(
+            id=2**31,
+            title='Скидка',
+            description='Условия',
+            place='Кафе',
+            category=self.books,
+            author=self.author,
+        )
+        self.buffer.add(post.id, 2, 1)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        post.refresh_from_db()
+        self.assertEqual((post.upvotes_count, post.downvotes_count), (2, 1))
+
+    def test_unmatched_removal_does_not_block_flush(self) -> None:
+        (other,) = create_posts(self.author, self.books, 1)
+        first, second = VoteCountBuffer(), VoteCountBuffer()
+        # Голос попал в буфер одного процесса, а его снятие — в буфер
+        # другого, который сбрасывается первым.
+        first.add(self.post.id, 1, 0)
+        second.add(self.post.id, -1, 0)
+        second.add(other.id, 0, 1)
+
+        self.assertEqual(second.flush(), 2)
+        self.assertEqual(second.pending(self.post.id), (0, 0))
+        self.assertEqual(first.flush(), 1)
+        self.post.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.post.upvotes_count, self.post.score), (1, 1))
+        self.assertEqual((other.downvotes_count, other.score), (1, -1))
+
+    def test_full_buffer_wakes_flusher(self) -> None:
+        buffer = VoteCountBuffer(max_posts=2)
+        buffer.add(self.post.id, 1, 0)
+        self.assertFalse(buffer.full.is_set())
+        buffer.add(self.post.id + 1, 0, 1)
+        self.assertTrue(buffer.full.is_set())
+
+    def test_failed_flush_keeps_changes(self) -> None:
+        self.vote(self.viewer, 'up')
+        with (
+            mock.patch.object(
+                PostQuerySet, 'add_vote_deltas', side_effect=DatabaseError
+            ),
+            self.assertRaises(DatabaseError),
+        ):
+            self.buffer.flush()
+        self.assertEqual(self.buffer.pending(self.post.id), (1, 0))
+
+    def test_check_waits_for_running_processes(self) -> None:
+        self.vote(self.viewer, 'up')
+        out = StringIO()
+        # Процесс сервера сбрасывает буфер, пока команда ждёт.
+        with mock.patch.object(
+            check_vote_counts.time,
+            'sleep',
+            side_effect=lambda seconds: self.buffer.flush(),
+        ) as sleep:
+            call_command('check_vote_counts', stdout=out)
+        sleep.assert_called_once()
+        self.assertIn('совпадают', out.getvalue())
+
+    def test_check_finds_lost_changes(self) -> None:
+        self.vote(self.viewer, 'up')
+        # Процесс упал, не успев сбросить буфер.
+        with mock.patch.object(vote_buffer, 'buffer', VoteCountBuffer()):
+            with self.assertRaisesMessage(CommandError, 'расхождениями: 1'):
+                call_command('check_vote_counts', stdout=StringIO())
+
+            out = StringIO()
+            call_command('check_vote_counts', '--fix', stdout=out)
+        self.assertIn('в счётчиках 0/0, по голосам 1/0', out.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.upvotes_count, 1)
+
+
+class ViewerStateTests(DiscountsTestCase):
+    def test_with_viewer_state(self) -> None:
+        Vote.objects.toggle(self.post.id, self.viewer.id, 'down')
+        Favorite.objects.toggle(self.post.id, self.viewer.id)
+
+        post = Post.objects.with_viewer_state(self.viewer).get()
+        self.assertEqual(post.user_vote, 'down')
+        self.assertTrue(post.is_favorite)
+
+        post = Post.objects.with_viewer_state(self.author).get()
+        self.assertIsNone(post.user_vote)
+        self.assertFalse(post.is_favorite)
+
+
+class PaginationTests(DiscountsTestCase):
+    def collect_feed(self, url: str) -> list[int]:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        ids: list[int] = card_ids(response.content.decode())
+        next_url: str | None = response.context['next_page_url']
+        while next_url:
+            data = self.client.get(next_url).json()
+            ids += card_ids(data['html'])
+            next_url = data['next_url']
+        return ids
+
+    def test_home_feed_pages_cover_all_posts(self) -> None:
+        posts: list[Post] = create_posts(self.author, self.food, 45)
+        # Одинаковое время создания проверяет разрешение ничьих по id.
+        Post.objects.update(created_at=self.post.created_at)
+        for post in posts[:10]:
+            Vote.objects.toggle(post.id, self.viewer.id, 'up')
+        self.client.force_login(self.viewer)
+
+        for sort in ['newest', 'rating']:
+            with self.subTest(sort=sort):
+                ids: list[int] = self.collect_feed(f'/?sort={sort}')
+                self.assertEqual(len(ids), 46)
+                self.assertEqual(len(set(ids)), 46)
+
+        ids = self.collect_feed('/?sort=rating')
+        self.assertEqual(set(ids[:10]), {post.id for post in posts[:10]})
+
+    def test_first_page_is_limited(self) -> None:
+        create_posts(self.author, self.food, PAGE_SIZE + 5)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(
+            len(home_card_ids(response.content.decode())), PAGE_SIZE
+        )
+        self.assertIsNotNone(response.context['next_page_url'])
+
+    def test_private_feeds(self) -> None:
+        posts: list[Post] = create_posts(self.viewer, self.books, 25)
+        for post in posts[:22]:
+            Favorite.objects.toggle(post.id, self.viewer.id)
+        self.client.force_login(self.viewer)
+
+        self.assertEqual(len(self.collect_feed(reverse('user_posts'))), 25)
+        self.assertEqual(len(self.collect_feed(reverse('favorites'))), 22)
+
+    def test_private_feed_page_requires_login(self) -> None:
+        response = self.client.get(reverse('feed_page', args=['favorites']))
+        self.assertEqual(response.status_code, 401)
+
+    def test_invalid_cursor(self) -> None:
+        url: str = reverse('feed_page', args=['home'])
+        for cursor in ['!!!', encode_cursor(['вчера', 1])]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+
+
+class HotScoreTests(DiscountsTestCase):
+    def refresh(self) -> str:
+        stdout = StringIO()
+        call_command('refresh_hot_scores', stdout=stdout)
+        return stdout.getvalue()
+
+    def test_refresh_only_stale_posts(self) -> None:
+        self.assertIn('обновлён: 1', self.refresh())
+        self.assertIn('обновлён: 0', self.refresh())
+
+        Vote.objects.toggle(self.post.id, self.viewer.id, 'up')
+        self.post.refresh_from_db()
+        self.assertIsNone(self.post.hot_ranked_at)
+        self.assertIn('обновлён: 1', self.refresh())
+
+        call_command('recount_votes', stdout=StringIO())
+        self.assertIn('обновлён: 1', self.refresh())
+
+    def test_confident_votes_rank_higher(self) -> None:
+        voters: list[CustomUser] = [
+            CustomUser.objects.create_user(f'voter{number}')
+            for number in range(10)
+        ]
+        unanimous, mixed, single = create_posts(self.author, self.food, 3)
+        for voter in voters:
+            Vote.objects.toggle(unanimous.id, voter.id, 'up')
+        for voter in voters[:6]:
+            Vote.objects.toggle(mixed.id, voter.id, 'up')
+        for voter in voters[6:]:
+            Vote.objects.toggle(mixed.id, voter.id, 'down')
+        Vote.objects.toggle(single.id, self.viewer.id, 'up')
+        Post.objects.update(created_at=self.post.created_at)
+        self.refresh()
+
+        self.assertEqual(
+            list(Post.objects.order_by('-hot_score')),
+            [unanimous, mixed, single, self.post],
+        )
+
+    def test_newer_posts_outrank_old_votes(self) -> None:
+        fresh: Post = create_posts(self.author, self.food, 1)[0]
+        Post.objects.filter(pk=self.post.pk).update(
+            created_at=fresh.created_at - timedelta(days=2),
+        )
+        Vote.objects.toggle(self.post.id, self.viewer.id, 'up')
+        Vote.objects.toggle(self.post.id, self.author.id, 'up')
+        self.refresh()
+
+        response = self.client.get(reverse('home'), {'sort': 'hot'})
+        self.assertEqual(
+            home_card_ids(response.content.decode()), [fresh.id, self.post.id]
+        )
+
+
+class SearchTests(DiscountsTestCase):
+    def test_search_uses_russian_stemming(self) -> None:
+        self.assertEqual(list(Post.objects.search('кофейни')), [self.post])
+        self.assertFalse(Post.objects.search('чай').exists())
+
+    def test_title_ranks_above_description(self) -> None:
+        in_description: Post = Post.objects.create(
+            title='Скидка на выпечку',
+            description='К выпечке кофе в подарок',
+            place='Пекарня',
+            category=self.food,
+            author=self.author,
+        )
+
+        response = self.client.get(reverse('home'), {'q': 'кофе'})
+
+        self.assertEqual(response.context['sort_by'], 'relevance')
+        self.assertEqual(
+            home_card_ids(response.content.decode()),
+            [self.post.id, in_description.id],
+        )
+
+    def test_search_keeps_category_filter(self) -> None:
+        response = self.client.get(
+            reverse('home'),
+            {'q': 'кофе', 'category': self.books.id},
+        )
+        self.assertEqual(home_card_ids(response.content.decode()), [])
+        self.assertContains(response, 'Ничего не найдено')
+
+    def test_search_endpoint_pages(self) -> None:
+        create_posts(self.author, self.books, 30)
+        url: str | None = reverse('search_posts') + '?q=скидка'
+        ids: list[int] = []
+        while url:
+            data = self.client.get(url).json()
+            ids += [result['id'] for result in data['results']]
+            url = data['next_url']
+
+        self.assertEqual(len(ids), 31)
+        self.assertEqual(len(set(ids)), 31)
+
+    def test_search_endpoint_requires_query(self) -> None:
+        response = self.client.get(reverse('search_posts'), {'q': '  '})
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_search(self) -> None:
+        admin = CustomUser.objects.create_superuser('admin', password='pass')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:discounts_post_changelist'),
+            {'q': 'кофейни'},
+        )
+        self.assertEqual(list(response.context['cl'].result_list), [self.post])
+
+
+class PlaceSuggestionsTests(DiscountsTestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        super().setUpTestData()
+        places: list[str] = [
+            'Кофе Хауз',
+            'кофе  хауз',
+            'Кофе Хауз',
+            'Кофемания',
+            'Кофемания',
+            'Кофемания',
+            'Кофемания',
+            'Шоколадница',
+        ]
+        Post.objects.bulk_create(
+            Post(
+                title='Скидка',
+                description='Условия',
+                place=place,
+                category=cls.food,
+                author=cls.author,
+            )
+            for place in places
+        )
+
+    def test_popular_places_are_merged_and_ranked(self) -> None:
+        self.assertEqual(
+            Post.objects.popular_places('КОФЕ', 10),
+            [('Кофемания', 4), ('Кофе Хауз', 3), ('Кофейня', 1)],
+        )
+        self.assertEqual(
+            Post.objects.popular_places('кофе', 1)[0][0], 'Кофемания'
+        )
+
+    def test_suggestions_are_cached(self) -> None:
+        url: str = reverse('place_suggestions')
+        with self.assertNumQueries(1):
+            first = self.client.get(url, {'q': ' кофе '}).json()
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {'q': 'КОФЕ'}).json()
+
+        self.assertEqual(first, second)
+        self.assertEqual(
+            first['results'][0], {'place': 'Кофемания', 'posts': 4}
+        )
+
+    def test_short_prefix_skips_database(self) -> None:
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse('place_suggestions'), {'q': 'ко'}
+            )
+        self.assertEqual(response.json(), {'results': []})
+
+    def test_create_form_uses_suggestions(self) -> None:
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('create_post'))
+        self.assertContains(response, 'list="place-suggestions"')
+        self.assertContains(
+            response,
+            f'data-suggestions-url="{reverse("place_suggestions")}"',
+        )
+
+
+class QueryPlanTests(DiscountsTestCase):
+    def test_feed_queries_use_indexes(self) -> None:
+        posts: list[Post] = create_posts(self.viewer, self.books, 30)
+        for post in posts[::3]:
+            Vote.objects.toggle(post.id, self.author.id, 'up')
+            Favorite.objects.toggle(post.id, self.viewer.id)
+        Post.objects.refresh_hot_scores(100)
+
+        reports = check_feed_plans(self.viewer, self.books.id)
+
+        self.assertEqual(len(reports), 12)
+        self.assertEqual(
+            [
+                (report.name, report.problems)
+                for report in reports
+                if not report.ok
+            ],
+            [],
+        )
+
+    def test_check_query_plans_command(self) -> None:
+        stdout = StringIO()
+        call_command('check_query_plans', stdout=stdout)
+        self.assertIn('Все планы используют индексы', stdout.getvalue())
+
+
+class FeedRowTests(DiscountsTestCase):
+    def rows_page(self, cursor: str | None = None) -> KeysetPage:
+        posts = Post.objects.with_viewer_state(self.viewer)
+        ordering = HOME_ORDERINGS['newest']
+        return cards.feed_rows(
+            paginate(cards.feed_values(posts, ordering), ordering, cursor)
+        )
+
+    def test_rows_from_one_query(self) -> None:
+        Vote.objects.toggle(self.post.id, self.viewer.id, 'up')
+        Favorite.objects.toggle(self.post.id, self.viewer.id)
+        with count_queries() as counter:
+            page: KeysetPage = self.rows_page()
+        self.assertEqual(len(counter), 1)
+        row = page.items[0]
+        self.assertIsInstance(row, cards.FeedRow)
+        self.assertFalse(hasattr(row, '__dict__'))
+        self.assertEqual(
+            (row.id, row.category_name, row.author_username),
+            (self.post.id, 'Еда', 'author'),
+        )
+        self.assertEqual((row.upvotes_count, row.user_vote), (1, 'up'))
+        self.assertTrue(row.is_favorite)
+
+    def test_cursor_from_rows(self) -> None:
+        create_posts(self.author, self.food, PAGE_SIZE)
+        first: KeysetPage = self.rows_page()
+        second: KeysetPage = self.rows_page(first.next_cursor)
+        ids: list[int] = [row.id for row in first.items + second.items]
+        self.assertEqual(len(ids), PAGE_SIZE + 1)
+        self.assertEqual(len(set(ids)), PAGE_SIZE + 1)
+        self.assertIsNone(second.next_cursor)
+
+
+class CardFragmentTests(DiscountsTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.client.force_login(self.viewer)
+        Favorite.objects.toggle(self.post.id, self.viewer.id)
+        render_card = cards._render_card
+        patcher = mock.patch.object(
+            cards, '_render_card', side_effect=render_card
+        )
+        self.render_card = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def favorites_html(self) -> str:
+        response = self.client.get(reverse('favorites'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_viewer_state_is_applied_to_cached_fragment(self) -> None:
+        Vote.objects.toggle(self.post.id, self.viewer.id, 'down')
+        html: str = self.favorites_html()
+        self.assertIn('class="vote-btn dislike-btn active"', html)
+        self.assertIn('class="vote-btn like-btn"', html)
+        self.assertIn('<i class="fas fa-heart"></i>', html)
+        self.assertNotIn('<!--', html)
+
+        # Фрагмент общий: у автора та же карточка без его оценок.
+        self.client.force_login(self.author)
+        html = self.client.get(reverse('home') + '?q=кофе').content.decode()
+        self.assertIn('class="vote-btn dislike-btn"', html)
+        self.assertIn('<i class="far fa-heart"></i>', html)
+        self.assertEqual(self.render_card.call_count, 2)
+
+    def test_vote_and_edit_change_version(self) -> None:
+        self.favorites_html()
+        self.favorites_html()
+        self.assertEqual(self.render_card.call_count, 1)
+
+        Vote.objects.toggle(self.post.id, self.author.id, 'up')
+        self.assertIn(
+            '<span class="vote-count">1</span>', self.favorites_html()
+        )
+        self.assertEqual(self.render_card.call_count, 2)
+
+        self.post.refresh_from_db()
+        self.post.title = 'Скидка на какао'
+        self.post.save()
+        self.assertIn('Скидка на какао', self.favorites_html())
+        self.assertEqual(self.render_card.call_count, 3)
+
+    def test_post_text_cannot_forge_marks(self) -> None:
+        Post.objects.filter(pk=self.post.pk).update(title='<!--up_active-->')
+        html: str = self.favorites_html()
+        self.assertIn('&lt;!--up_active--&gt;', html)
+
+    def test_guest_card(self) -> None:
+        self.client.logout()
+        response = self.client.get(reverse('feed_page', args=['home']))
+        html: str = response.json()['html']
+        self.assertIn('Войдите, чтобы оценить', html)
+        self.assertNotIn('vote-btn', html)
+        self.assertNotIn('favorite', html)
+
+    def test_cached_template_loader(self) -> None:
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertIsInstance(loader, CachedLoader)
+
+
+class FeedCacheTests(DiscountsTestCase):
+    def home_ids(self, query: str = '') -> list[int]:
+        response = self.client.get(reverse('home') + query)
+        self.assertEqual(response.status_code, 200)
+        return home_card_ids(response.content.decode())
+
+    def cached_page(self) -> KeysetPage:
+        async def load() -> KeysetPage:
+            posts = Post.objects.with_viewer_state(self.viewer)
+            return await apaginate(posts, HOME_ORDERINGS['newest'])
+
+        return async_to_sync(feed_cache.cached_home_page)(
+            None, 'newest', None, self.viewer, load
+        )
+
+    def test_hit_reads_only_fresh_counters(self) -> None:
+        self.cached_page()
+        Vote.objects.toggle(self.post.id, self.viewer.id, 'up')
+
+        with count_queries() as counter:
+            page: KeysetPage = self.cached_page()
+        self.assertEqual(len(counter), 1)
+        self.assertEqual(page.items[0].upvotes_count, 1)
+        self.assertEqual(page.items[0].user_vote, 'up')
+
+    def test_deleted_post_is_never_served(self) -> None:
+        self.assertEqual(self.cached_page().items, [self.post])
+        # Версия ленты меняется только после фиксации транзакции, а её
+        # в тесте нет: кешированная страница остаётся, но пост отброшен.
+        Post.objects.filter(pk=self.post.pk).delete()
+        self.assertEqual(self.cached_page().items, [])
+
+    def test_create_and_delete_invalidate_category(self) -> None:
+        category: str = f'?category={self.food.id}'
+        self.client.force_login(self.author)
+        self.home_ids(category)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('create_post'),
+                {
+                    'title': 'Скидка на чай',
+                    'description': 'По будням',
+                    'place': 'Чайная',
+                    'category': self.food.id,
+                },
+            )
+        created: Post = Post.objects.get(title='Скидка на чай')
+        self.assertEqual(self.home_ids(category), [created.id, self.post.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('delete_post', args=[created.id]),
+                **AJAX,
+            )
+        self.assertEqual(self.home_ids(category), [self.post.id])
+
+    def test_vote_reorders_rating_feed(self) -> None:
+        newer: Post = Post.objects.create(
+            title='Скидка на чай',
+            description='По будням',
+            place='Чайная',
+            category=self.books,
+            author=self.author,
+        )
+        self.client.force_login(self.viewer)
+        self.assertEqual(
+            self.home_ids('?sort=rating'), [newer.id, self.post.id]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('vote_post', args=[self.post.id, 'up']),
+                **AJAX,
+            )
+        self.assertEqual(
+            self.home_ids('?sort=rating'), [self.post.id, newer.id]
+        )
+
+    def test_guest_page_is_served_without_queries(self) -> None:
+        first = self.client.get(reverse('home'))
+        with count_queries() as counter:
+            second = self.client.get(reverse('home'))
+        self.assertEqual(len(counter), 0)
+        self.assertEqual(first.content, second.content)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Спорт')
+        self.assertContains(self.client.get(reverse('home')), 'Спорт')
+
+    def test_member_page_skips_feed_query(self) -> None:
+        Vote.objects.toggle(self.post.id, self.viewer.id, 'up')
+        self.client.force_login(self.viewer)
+        self.client.get(reverse('home'))
+
+        self.client.force_login(self.author)
+        with count_queries() as counter:
+            response = self.client.get(reverse('home'))
+        # Только сессия и пользователь: лента и категории из кеша.
+        self.assertEqual(len(counter), 2)
+        self.assertEqual(
+            home_card_ids(response.content.decode()), [self.post.id]
+        )
+        self.assertNotContains(response, 'fas fa-thumbs-up')
+
+
+class ViewerStateEndpointTests(DiscountsTestCase):
+    def test_returns_state_of_requested_posts(self) -> None:
+        other: Post = create_posts(self.author, self.books, 1)[0]
+        Vote.objects.toggle(self.post.id, self.viewer.id, 'down')
+        Favorite.objects.toggle(other.id, self.viewer.id)
+        self.client.force_login(self.viewer)
+
+        with count_queries() as counter:
+            response = self.client.get(
+                reverse('viewer_state'),
+                {'ids': f'{self.post.id},{other.id}'},
+            )
+        self.assertEqual(len(counter), 3)
+        posts = response.json()['posts']
+        self.assertEqual(posts[str(self.post.id)]['user_vote'], 'down')
+        self.assertEqual(posts[str(self.post.id)]['downvotes_count'], 1)
+        self.assertFalse(posts[str(self.post.id)]['is_favorite'])
+        self.assertTrue(posts[str(other.id)]['is_favorite'])
+
+    def test_deleted_posts_are_omitted(self) -> None:
+        self.client.force_login(self.viewer)
+        response = self.client.get(
+            reverse('viewer_state'), {'ids': f'{self.post.id},999999'}
+        )
+        self.assertEqual(list(response.json()['posts']), [str(self.post.id)])
+
+    def test_rejects_bad_requests(self) -> None:
+        url: str = reverse('viewer_state')
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        self.client.force_login(self.viewer)
+        self.assertEqual(self.client.get(url, {'ids': 'a'}).status_code, 400)
+        too_many: str = ','.join(str(number) for number in range(1, 102))
+        self.assertEqual(
+            self.client.get(url, {'ids': too_many}).status_code, 400
+        )
+
+
+class LiveCountsTests(DiscountsTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.broker = CountsBroker(window=0)
+        for patcher in (
+            mock.patch.object(live_counts, 'broker', self.broker),
+            mock.patch.object(live_counts, 'start_listener'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_broker_keeps_latest_counts_of_window(self) -> None:
+        position: int = self.broker.position()
+        self.broker.record(self.post.id, 1, 0)
+        self.broker.record(self.post.id, 2, 0)
+        self.broker.record(self.post.id + 1, 0, 1)
+
+        position, counts = self.broker.changes(position, {self.post.id})
+        self.assertEqual(counts, {self.post.id: (2, 0)})
+        self.assertEqual(
+            self.broker.changes(position, {self.post.id}), (1, {})
+        )
+
+    def test_open_window_is_not_sent(self) -> None:
+        broker = CountsBroker(window=60)
+        broker.record(self.post.id, 1, 0)
+        self.assertEqual(broker.changes(0, {self.post.id}), (0, {}))
+
+    def test_vote_publishes_counts(self) -> None:
+        self.client.force_login(self.viewer)
+        with mock.patch.object(live_counts, 'publish_counts') as publish:
+            self.client.post(
+                reverse('vote_post', args=[self.post.id, 'down']), **AJAX
+            )
+        publish.assert_called_once_with(self.post.id, 0, 1)
+
+    def test_notification_reaches_broker(self) -> None:
+        live_counts.receive(f'[{self.post.id}, 3, 1]')
+        with self.assertLogs('discounts.live_counts', logging.WARNING):
+            live_counts.receive('не json')
+        self.assertEqual(
+            self.broker.changes(0, {self.post.id}), (1, {self.post.id: (3, 1)})
+        )
+
+    def test_stream_validation(self) -> None:
+        url: str = reverse('vote_stream')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(self.viewer)
+        self.assertEqual(self.client.get(url, {'ids': 'x'}).status_code, 400)
+        # Под WSGI поток не открывается.
+        self.assertEqual(self.client.get(url, {'ids': '1'}).status_code, 204)
+
+    async def test_stream_pushes_counts(self) -> None:
+        await self.async_client.aforce_login(self.viewer)
+        response = await self.async_client.get(
+            reverse('vote_stream'), {'ids': str(self.post.id)}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        self.assertEqual(await anext(events), b'retry: 3000\n\n')
+
+        self.broker.record(self.post.id + 1, 9, 9)
+        self.broker.record(self.post.id, 5, 1)
+        event: bytes = await anext(events)
+        self.assertEqual(
+            event,
+            b'event: counts\n'
+            + f'data: {{"{self.post.id}": {{"upvotes_count": 5, '
+            '"downvotes_count": 1}}\n\n'.encode(),
+        )
+
+
+class ConditionalGetTests(DiscountsTestCase):
+    def revalidate(self, url: str) -> tuple[int, int]:
+        """Код повторного запроса с ``ETag`` первого и число SQL."""
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first.headers)
+        with count_queries() as counter:
+            second = self.client.get(
+                url, HTTP_IF_NONE_MATCH=first.headers['ETag']
+            )
+        return second.status_code, len(counter)
+
+    def test_guest_home_not_modified(self) -> None:
+        self.assertEqual(self.revalidate(reverse('home')), (304, 0))
+        self.assertEqual(
+            self.revalidate(reverse('home') + '?sort=rating'), (304, 0)
+        )
+
+    def test_private_feeds_not_modified_without_feed_query(self) -> None:
+        self.client.force_login(self.viewer)
+        for name in ['home', 'user_posts', 'favorites']:
+            with self.subTest(view=name):
+                # Только сессия и пользователь.
+                self.assertEqual(self.revalidate(reverse(name)), (304, 2))
+
+    def test_if_modified_since(self) -> None:
+        first = self.client.get(reverse('home'))
+        second = self.client.get(
+            reverse('home'),
+            HTTP_IF_MODIFIED_SINCE=first.headers['Last-Modified'],
+        )
+        self.assertEqual(second.status_code, 304)
+
+    def test_changes_produce_new_etag(self) -> None:
+        self.client.force_login(self.viewer)
+        url: str = reverse('favorites')
+        etag: str = self.client.get(url).headers['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('toggle_favorite', args=[self.post.id]),
+                **AJAX,
+            )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(card_ids(response.content.decode()), [self.post.id])
+
+        self.client.force_login(self.author)
+        url = reverse('user_posts')
+        etag = self.client.get(url).headers['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.toggle(self.post.id, self.viewer.id, 'up')
+            feed_cache.bump_category(self.food.id, 'votes')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_guest_rating_page_changes_after_vote(self) -> None:
+        newer: Post = create_posts(self.author, self.books, 1)[0]
+        url: str = reverse('home') + '?sort=rating'
+        etag: str = self.client.get(url).headers['ETag']
+        self.client.force_login(self.viewer)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('vote_post', args=[self.post.id, 'up']),
+                **AJAX,
+            )
+        self.client.logout()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            home_card_ids(response.content.decode()), [self.post.id, newer.id]
+        )
+
+    def test_search_is_not_conditional(self) -> None:
+        response = self.client.get(reverse('home'), {'q': 'кофе'})
+        self.assertNotIn('ETag', response.headers)
+
+
+class QueryBudgetTests(DiscountsTestCase):
+    def assert_constant_queries(self, url: str, max_queries: int) -> None:
+        counts: list[int] = []
+        for _ in range(2):
+            posts: list[Post] = create_posts(self.viewer, self.books, 10)
+            for post in posts:
+                Vote.objects.toggle(post.id, self.viewer.id, 'up')
+                Favorite.objects.toggle(post.id, self.viewer.id)
+            # Замеряется промах кеша лент: он дороже попадания.
+            cache.clear()
+            with query_budget(max_queries) as counter:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(counter))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_feeds_for_anonymous(self) -> None:
+        self.assert_constant_queries(reverse('home'), 2)
+
+    def test_feeds_for_viewer(self) -> None:
+        self.client.force_login(self.viewer)
+        for name in ['home', 'user_posts', 'favorites']:
+            with self.subTest(view=name):
+                self.assert_constant_queries(reverse(name), 4)
+        self.assert_constant_queries(
+            reverse('feed_page', args=['home']) + '?sort=rating',
+            3,
+        )
+        self.assert_constant_queries(reverse('home') + '?q=скидка', 4)
+        self.assert_constant_queries(reverse('search_posts') + '?q=скидка', 3)
+
+    def test_vote_and_favorite(self) -> None:
+        self.client.force_login(self.viewer)
+        with query_budget(6):
+            self.client.post(
+                reverse('vote_post', args=[self.post.id, 'up']),
+                **AJAX,
+            )
+        with query_budget(3):
+            self.client.post(
+                reverse('toggle_favorite', args=[self.post.id]),
+                **AJAX,
+            )
+
+    def test_admin_changelists(self) -> None:
+        admin = CustomUser.objects.create_superuser('admin', password='pass')
+        self.client.force_login(admin)
+        for name in ['post', 'vote', 'favorite']:
+            with self.subTest(model=name):
+                self.assert_constant_queries(
+                    reverse(f'admin:discounts_{name}_changelist'),
+                    8,
+                )
+
+
+@override_settings(REPLICA_DATABASES=['default'])
+class ReplicaRoutingTests(DiscountsTestCase):
+    """Роль реплики играет ``default``, выбор реплики подменяется."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        patcher = mock.patch(
+            'Sales_Aggregator.db_router._choose_replica',
+            return_value='default',
+        )
+        self.choose_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_router(self) -> None:
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Post), 'default')
+        self.choose_replica.assert_not_called()
+
+        with replica_reads():
+            router.db_for_read(Post)
+            self.choose_replica.assert_called_once()
+            with primary_reads():
+                router.db_for_read(Post)
+        self.choose_replica.assert_called_once()
+
+        self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertTrue(router.allow_migrate('default', 'discounts'))
+        self.assertFalse(router.allow_migrate('replica_1', 'discounts'))
+
+    def test_feed_views_read_from_replica(self) -> None:
+        self.client.force_login(self.viewer)
+        self.client.get(reverse('favorites'))
+        self.choose_replica.assert_called()
+
+        self.choose_replica.reset_mock()
+        self.client.get(reverse('search_posts'), {'q': 'кофе'})
+        self.choose_replica.assert_called()
+
+    def test_cache_fill_reads_primary(self) -> None:
+        response = self.client.get(reverse('home'))
+
+        self.assertEqual(
+            home_card_ids(response.content.decode()), [self.post.id]
+        )
+        self.choose_replica.assert_not_called()
+
+    def test_write_pins_user_to_primary(self) -> None:
+        self.client.force_login(self.viewer)
+        self.client.get(reverse('favorites'))
+        self.assertNotIn(
+            PrimaryStickinessMiddleware.COOKIE_NAME, self.client.cookies
+        )
+
+        response = self.client.post(
+            reverse('vote_post', args=[self.post.id, 'up']), **AJAX
+        )
+        self.assertIn(
+            PrimaryStickinessMiddleware.COOKIE_NAME, response.cookies
+        )
+
+        self.choose_replica.reset_mock()
+        self.client.get(reverse('favorites'))
+        self.choose_replica.assert_not_called()
+
+    def test_disabled_without_replicas(self) -> None:
+        with (
+            override_settings(REPLICA_DATABASES=[]),
+            self.assertRaises(MiddlewareNotUsed),
+        ):
+            PrimaryStickinessMiddleware(lambda request: HttpResponse())
+
+    async def test_write_pins_user_to_primary_over_asgi(self) -> None:
+        await self.async_client.aforce_login(self.viewer)
+        response = await self.async_client.post(
+            reverse('vote_post', args=[self.post.id, 'up']),
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+        self.assertIn(
+            PrimaryStickinessMiddleware.COOKIE_NAME, response.cookies
+        )
+
+        self.choose_replica.reset_mock()
+        response = await self.async_client.get(reverse('favorites'))
+        self.assertEqual(card_ids(response.content.decode()), [])
+        self.choose_replica.assert_not_called()
+
+
+class AsyncFeedViewsTests(DiscountsTestCase):
+    """Ленты через ASGI-обработчик, как под uvicorn."""
+
+    async def test_feeds(self) -> None:
+        await self.async_client.aforce_login(self.viewer)
+        for name in ('home', 'user_posts', 'favorites'):
+            with self.subTest(view=name):
+                response = await self.async_client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+
+        response = await self.async_client.get(
+            reverse('feed_page', args=['home'])
+        )
+        self.assertEqual(
+            home_card_ids(response.json()['html']), [self.post.id]
+        )
+
+    async def test_guest_home_and_private_feed(self) -> None:
+        response = await self.async_client.get(reverse('home'))
+        self.assertEqual(
+            home_card_ids(response.content.decode()), [self.post.id]
+        )
+
+        response = await self.async_client.get(
+            reverse('feed_page', args=['favorites'])
+        )
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(reverse('favorites'))
+        self.assertEqual(response.status_code, 302)
+
+
+def streamed_content(response: Any) -> bytes:
+    async def read() -> bytes:
+        return b''.join([chunk async for chunk in response.streaming_content])
+
+    return async_to_sync(read)()
+
+
+def streamed_json(response: Any) -> Any:
+    return json.loads(streamed_content(response))
+
+
+class ApiTests(DiscountsTestCase):
+    def get_feed(self, feed: str, **params: Any) -> Any:
+        response = self.client.get(reverse('api_feed', args=[feed]), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return streamed_json(response)
+
+    def test_sparse_fields(self) -> None:
+        with count_queries() as counter:
+            data = self.get_feed('home', fields='id,title')
+        self.assertEqual(
+            data,
+            {
+                'results': [{'id': self.post.id, 'title': 'Скидка на кофе'}],
+                'next_cursor': None,
+                'next_url': None,
+            },
+        )
+        self.assertEqual(len(counter), 1)
+        self.assertNotIn('JOIN', counter.queries[0])
+
+    def test_all_fields(self) -> None:
+        self.client.force_login(self.viewer)
+        Favorite.objects.create(user=self.viewer, post=self.post)
+        [item] = self.get_feed('home')['results']
+        self.assertEqual(item['category'], 'Еда')
+        self.assertEqual(item['author'], 'author')
+        self.assertIs(item['is_favorite'], True)
+        self.assertIsNone(item['user_vote'])
+
+    def test_cursor_paging(self) -> None:
+        create_posts(self.author, self.books, 25)
+        ids: list[int] = []
+        data = self.get_feed('home', fields='id', limit=10)
+        ids += [item['id'] for item in data['results']]
+        while data['next_url']:
+            response = self.client.get(data['next_url'])
+            data = streamed_json(response)
+            ids += [item['id'] for item in data['results']]
+        self.assertEqual(len(ids), 26)
+        self.assertEqual(len(set(ids)), 26)
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_category_filter(self) -> None:
+        create_posts(self.author, self.books, 3)
+        data = self.get_feed('home', fields='category', category=self.food.id)
+        self.assertEqual(data['results'], [{'category': 'Еда'}])
+
+    def test_private_feeds(self) -> None:
+        for feed in ('favorites', 'my-posts'):
+            response = self.client.get(reverse('api_feed', args=[feed]))
+            self.assertEqual(response.status_code, 401)
+
+        self.client.force_login(self.viewer)
+        Favorite.objects.create(user=self.viewer, post=self.post)
+        data = self.get_feed('favorites', fields='id,is_favorite')
+        self.assertEqual(
+            data['results'], [{'id': self.post.id, 'is_favorite': True}]
+        )
+        self.assertEqual(self.get_feed('my-posts')['results'], [])
+
+    def test_bad_requests(self) -> None:
+        url: str = reverse('api_feed', args=['home'])
+        for params in (
+            {'fields': 'id,password'},
+            {'limit': 'all'},
+            {'limit': 0},
+            {'limit': 1000},
+            {'cursor': 'broken'},
+            {'category': 'abc'},
+            {'category': '-1'},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+        response = self.client.get(reverse('api_feed', args=['unknown']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_smaller_than_html(self) -> None:
+        create_posts(self.author, self.food, 19)
+        self.client.force_login(self.author)
+        html = self.client.get(reverse('user_posts')).content
+        response = self.client.get(
+            reverse('api_feed', args=['my-posts']),
+            {'fields': 'id,title,place,category,created_at,score'},
+        )
+        payload: bytes = streamed_content(response)
+        self.assertLess(len(payload) * 5, len(html))
+
+    def test_categories(self) -> None:
+        response = self.client.get(reverse('api_categories'))
+        self.assertEqual(
+            response.json()['results'][0],
+            {
+                'id': self.food.id,
+                'name': 'Еда',
+                'feed_url': reverse('api_feed', args=['home'])
+                + f'?category={self.food.id}',
+            },
+        )
+
+
+class GenerateDataTests(TestCase):
+    def test_generated_counters_match_votes(self) -> None:
+        call_command(
+            'generate_data',
+            users=20,
+            categories=3,
+            posts=50,
+            votes=300,
+            favorites=40,
+            chunk_size=25,
+            seed=1,
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(CustomUser.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertGreater(Vote.objects.count(), 0)
+        self.assertGreater(Favorite.objects.count(), 0)
+        for post in Post.objects.all():
+            self.assertEqual(
+                post.upvotes_count,
+                post.votes.filter(vote_type='up').count(),
+            )
+        self.assertFalse(
+            Post.objects.filter(hot_ranked_at__isnull=True).exists()
+        )
+
+
+class ImportDiscountsTests(DiscountsTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def write_jsonl(self, name: str, records: list[Any]) -> Path:
+        path: Path = self.directory / name
+        path.write_text(
+            ''.join(
+                json.dumps(record, ensure_ascii=False) + '\n'
+                for record in records
+            )
+        )
+        return path
+
+    def record(self, number: int, **fields: Any) -> dict[str, Any]:
+        return {
+            'title': f'Скидка партнёра {number}',
+            'description': 'Условия',
+            'place': 'Магазин',
+            'category': 'Книги',
+            'author': 'author',
+            **fields,
+        }
+
+    def import_file(self, path: Path, *args: str) -> str:
+        out = StringIO()
+        call_command(
+            'import_discounts', str(path), *args, stdout=out, stderr=out
+        )
+        return out.getvalue()
+
+    def test_json_array_is_read_in_blocks(self) -> None:
+        records: list[Any] = [self.record(number) for number in range(30)]
+        stream = StringIO(json.dumps(records, ensure_ascii=False, indent=1))
+        with mock.patch.object(importing, 'READ_SIZE', 7):
+            self.assertEqual(list(importing.iter_json_array(stream)), records)
+
+        with self.assertRaisesMessage(ValueError, 'оборвался'):
+            list(importing.iter_json_array(StringIO('[{"title": 1}, {"ti')))
+
+    def test_json_array_reports_bad_record(self) -> None:
+        records: str = ', '.join(
+            json.dumps(self.record(number)) for number in range(1000)
+        )
+        stream = StringIO(f'[{{"title": 1}}, {{"title": tru}}, {records}]')
+        with self.assertRaisesMessage(
+            ValueError, 'Запись 2: Expecting value, символ 11'
+        ):
+            list(importing.iter_json_array(stream))
+        # Остаток файла после ошибки не дочитывается.
+        self.assertEqual(stream.tell(), importing.READ_SIZE)
+
+        cases: dict[str, str] = {
+            '[{"a": 1} {"b": 2}]': 'После записи 1 ожидается «,» или «]»',
+            '[{"a": 1},, {"b": 2}]': 'Запись 2: лишняя «,»',
+            '[{"a": 1}, {"b": 2},]': 'Запись 3: лишняя «,»',
+            '[{"a": 1},{"a":}, {"b": 2}]': 'Запись 2: Expecting value',
+            '[{"a": 1},{"a": tr': 'оборвался',
+        }
+        # Мелкие блоки обрывают записи на каждом символе.
+        for read_size in (3, importing.READ_SIZE):
+            for text, message in cases.items():
+                with (
+                    self.subTest(text, read_size=read_size),
+                    mock.patch.object(importing, 'READ_SIZE', read_size),
+                    self.assertRaisesMessage(ValueError, message),
+                ):
+                    list(importing.iter_json_array(StringIO(text)))
+
+        long_record: str = json.dumps(self.record(1, description='x' * 100))
+        with (
+            mock.patch.object(importing, 'READ_SIZE', 16),
+            mock.patch.object(importing, 'MAX_RECORD_SIZE', 64),
+            self.assertRaisesMessage(ValueError, 'Запись 1 длиннее 64'),
+        ):
+            list(importing.iter_json_array(StringIO(f'[{long_record}]')))
+
+    def test_imports_jsonl(self) -> None:
+        path: Path = self.write_jsonl(
+            'feed.jsonl',
+            [
+                self.record(1, created_at='2025-03-01T12:00:00Z'),
+                self.record(2, category='книги', author=''),
+                self.record(3, category='Спорт'),
+                self.record(4, author='nobody'),
+                self.record(5, title=''),
+                {'model': 'discounts.category', 'fields': {'name': 'Спорт'}},
+                {
+                    'model': 'discounts.post',
+                    'fields': {
+                        **self.record(6),
+                        'category': self.food.pk,
+                        'author': self.viewer.pk,
+                    },
+                },
+            ],
+        )
+        output: str = self.import_file(
+            path, '--chunk-size=2', '--default-author=viewer'
+        )
+
+        self.assertIn('Запись 3: Категория «Спорт» не найдена', output)
+        self.assertIn('Запись 4: Автор nobody не найден', output)
+        self.assertIn('Запись 5: Не заполнено поле title', output)
+        self.assertIn('постов 3, пропущено записей 3', output)
+        imported = Post.objects.exclude(pk=self.post.pk).order_by('title')
+        self.assertEqual(
+            [
+                (post.title, post.category_id, post.author_id)
+                for post in imported
+            ],
+            [
+                ('Скидка партнёра 1', self.books.pk, self.author.pk),
+                ('Скидка партнёра 2', self.books.pk, self.viewer.pk),
+                ('Скидка партнёра 6', self.food.pk, self.viewer.pk),
+            ],
+        )
+        first: Post = imported[0]
+        self.assertEqual(
+            first.created_at.isoformat(), '2025-03-01T12:00:00+00:00'
+        )
+        self.assertEqual((first.upvotes_count, first.score), (0, 0))
+        self.assertIsNone(first.hot_ranked_at)
+        self.assertIn(
+            'Скидка партнёра 1',
+            [post.title for post in Post.objects.search('партнёра')],
+        )
+
+        with self.assertRaisesMessage(CommandError, '--restart'):
+            self.import_file(path)
+
+    def test_csv_with_bulk_create_and_new_categories(self) -> None:
+        path: Path = self.directory / 'feed.csv'
+        with path.open('w', encoding='utf-8-sig', newline='') as stream:
+            writer = csv.DictWriter(stream, fieldnames=list(self.record(0)))
+            writer.writeheader()
+            writer.writerow(self.record(1))
+            writer.writerow(self.record(2, category='Спорт'))
+
+        output: str = self.import_file(
+            path, '--method=bulk', '--create-categories'
+        )
+
+        self.assertIn('Создано категорий: 1', output)
+        self.assertEqual(
+            set(
+                Post.objects.filter(
+                    title__startswith='Скидка партнёра'
+                ).values_list('category__name', flat=True)
+            ),
+            {'Книги', 'Спорт'},
+        )
+
+    def test_csv_with_numeric_ids(self) -> None:
+        path: Path = self.directory / 'feed.csv'
+        with path.open('w', encoding='utf-8-sig', newline='') as stream:
+            writer = csv.DictWriter(stream, fieldnames=list(self.record(0)))
+            writer.writeheader()
+            writer.writerow(
+                self.record(1, category=self.books.id, author=self.viewer.id)
+            )
+            writer.writerow(self.record(2, category=10**6))
+
+        output: str = self.import_file(path)
+
+        self.assertIn(f'Категория «{10**6}» не найдена', output)
+        self.assertEqual(
+            list(
+                Post.objects.filter(
+                    title__startswith='Скидка партнёра'
+                ).values_list('category', 'author')
+            ),
+            [(self.books.id, self.viewer.id)],
+        )
+
+    def test_resumes_after_failure(self) -> None:
+        path: Path = self.write_jsonl(
+            'feed.jsonl', [self.record(number) for number in range(5)]
+        )
+        calls: list[int] = []
+
+        def fail_second_chunk(rows: list[importing.Row]) -> int:
+            calls.append(len(rows))
+            if len(calls) == 2:
+                raise DatabaseError('соединение потеряно')
+            return importing.copy_posts(rows)
+
+        with (
+            mock.patch.dict(
+                import_discounts.WRITERS, {'copy': fail_second_chunk}
+            ),
+            self.assertRaises(DatabaseError),
+        ):
+            self.import_file(path, '--chunk-size=2')
+
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual((checkpoint.records, checkpoint.imported), (2, 2))
+
+        output: str = self.import_file(path, '--chunk-size=2')
+        self.assertIn('Продолжение с записи 3', output)
+        self.assertEqual(
+            sorted(
+                Post.objects.filter(
+                    title__startswith='Скидка партнёра'
+                ).values_list('title', flat=True)
+            ),
+            [f'Скидка партнёра {number}' for number in range(5)],
+        )
+
+    def test_changed_file_is_not_resumed(self) -> None:
+        path: Path = self.write_jsonl('feed.jsonl', [self.record(1)])
+        ImportCheckpoint.objects.create(
+            source=str(path.resolve()), size=1, records=1
+        )
+        with self.assertRaisesMessage(CommandError, 'Файл изменился'):
+            self.import_file(path)
+        self.import_file(path, '--restart')
+        self.assertEqual(Post.objects.count(), 2)
+
+
+class ExportTests(DiscountsTestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        super().setUpTestData()
+        cls.staff = CustomUser.objects.create_user(
+            'staff', password='pass', is_staff=True
+        )
+
+    def setUp(self) -> None:
+        super().setUp()
+        Vote.objects.toggle(self.post.id, self.viewer.id, 'up')
+        self.client.force_login(self.staff)
+
+    def test_staff_only(self) -> None:
+        self.client.force_login(self.viewer)
+        response = self.client.get(reverse('export_data', args=['posts']))
+        self.assertEqual(response.status_code, 302)
+
+    def test_posts_csv(self) -> None:
+        response = self.client.get(reverse('export_data', args=['posts']))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('posts.csv', response['Content-Disposition'])
+        rows: list[dict[str, str]] = list(
+            csv.DictReader(
+                StringIO(b''.join(response.streaming_content).decode())
+            )
+        )
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Скидка на кофе')
+        self.assertEqual(rows[0]['category'], 'Еда')
+        self.assertEqual(rows[0]['author'], 'author')
+        self.assertEqual(rows[0]['upvotes_count'], '1')
+
+    def test_votes_jsonl(self) -> None:
+        response = self.client.get(
+            reverse('export_data', args=['votes']), {'format': 'jsonl'}
+        )
+        lines: list[Any] = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [
+                (line['post_id'], line['user_id'], line['vote_type'])
+                for line in lines
+            ],
+            [(self.post.id, self.viewer.id, 'up')],
+        )
+
+    def test_first_row_is_sent_alone(self) -> None:
+        create_posts(self.author, self.food, 5)
+        with mock.patch.object(exporting, 'ROWS_PER_BLOCK', 2):
+            blocks: list[str] = list(exporting.export_lines('posts', 'csv'))
+        # Заголовок, первая строка, затем блоки по две строки.
+        self.assertEqual(
+            [block.count('\n') for block in blocks], [1, 1, 2, 2, 1]
+        )
+
+    def test_unknown_dataset_and_format(self) -> None:
+        response = self.client.get(reverse('export_data', args=['users']))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(
+            reverse('export_data', args=['posts']), {'format': 'xml'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_asgi_streams_async_iterator(self) -> None:
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(
+            reverse('export_data', args=['favorites'])
+        )
+        self.assertTrue(response.is_async)
+        content: bytes = b''.join(
+            [chunk async for chunk in response.streaming_content]
+        )
+        self.assertEqual(content.decode(), 'id,post_id,user_id,created_at\r\n')
+
+    def test_command(self) -> None:
+        out = StringIO()
+        call_command('export_data', 'posts', '--format', 'jsonl', stdout=out)
+        self.assertEqual(
+            [json.loads(line)['id'] for line in out.getvalue().splitlines()],
+            [self.post.id],
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'votes.csv'
+            call_command(
+                'export_data',
+                'votes',
+                '--output',
+                str(path),
+                stderr=StringIO(),
+            )
+            with path.open(newline='') as stream:
+                rows: list[dict[str, str]] = list(csv.DictReader(stream))
+        self.assertEqual(rows[0]['user_id'], str(self.viewer.id))
+
+
+class BenchmarkTests(DiscountsTestCase):
+    def test_scenarios_cover_all_urls(self) -> None:
+        Favorite.objects.toggle(self.post.id, self.viewer.id)
+
+        report = run_benchmark(iterations=2, warmup=0)
+
+        self.assertEqual(report.uncovered, [])
+        failed = [
+            (result.name, result.status)
+            for result in report.results
+            if result.status >= 400
+        ]
+        self.assertEqual(failed, [])
+
+
+class LoadTestTests(DiscountsTestCase):
+    def test_session_cookie_logs_in(self) -> None:
+        name, value = session_cookie(self.viewer).split('=', 1)
+        self.client.cookies[name] = value
+
+        response = self.client.get(reverse('favorites'))
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(
+    REQUEST_TIMING=1,
+    REQUEST_TIMING_SLOW_MS=10_000,
+    REQUEST_TIMING_SLOW_QUERY_MS=10_000,
+)
+class RequestTimingTests(DiscountsTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        patcher = mock.patch.object(
+            request_timing, 'histograms', request_timing.LatencyHistograms()
+        )
+        self.histograms = patcher.start()
+        self.addCleanup(patcher.stop)
+        # Соединение теста открыто до загрузки middleware и не прошло
+        # через connection_created; асинхронные тесты ходят в базу из
+        # этого потока.
+        request_timing.install()
+
+    def server_timing(self, response: Any) -> dict[str, str]:
+        return {
+            metric.split(';')[0]: metric
+            for metric in response['Server-Timing'].split(', ')
+        }
+
+    def test_server_timing(self) -> None:
+        self.client.force_login(self.viewer)
+        response = self.client.get(reverse('home'))
+        metrics: dict[str, str] = self.server_timing(response)
+        self.assertEqual(set(metrics), {'total', 'db', 'render'})
+        self.assertRegex(metrics['db'], r'desc="[1-9]\d* queries"')
+        self.assertNotEqual(metrics['render'], 'render;dur=0.0')
+
+        stats = self.histograms.views['home']
+        self.assertEqual(stats.count, 1)
+        self.assertGreater(stats.queries, 0)
+        self.assertGreater(stats.render, 0)
+
+    async def test_async_view_queries_are_counted(self) -> None:
+        await self.async_client.aforce_login(self.viewer)
+        response = await self.async_client.get(reverse('favorites'))
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+        self.assertIn('favorites', self.histograms.views)
+
+    def test_unmatched_and_namespaced_views(self) -> None:
+        self.client.get('/no-such-page/')
+        self.client.get(reverse('users:login'))
+        self.assertEqual(
+            sorted(self.histograms.views), ['unmatched', 'users:login']
+        )
+
+    @override_settings(
+        REQUEST_TIMING_SLOW_MS=0, REQUEST_TIMING_SLOW_QUERY_MS=0
+    )
+    def test_logs_slow_requests_and_queries(self) -> None:
+        with self.assertLogs('Sales_Aggregator', logging.WARNING) as logs:
+            self.client.get(reverse('api_categories'))
+        self.assertIn('Медленный SQL-запрос', logs.output[0])
+        self.assertIn('GET /api/v1/categories/', logs.output[0])
+        self.assertIn('(api_categories): медленный ответ', logs.output[-1])
+
+    def test_metrics(self) -> None:
+        self.client.get(reverse('api_categories'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        text: str = response.content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_bucket'
+            '{view="api_categories",le="+Inf"} 1',
+            text,
+        )
+        self.assertIn(
+            'http_request_db_queries_total{view="api_categories"}', text
+        )
+
+        response = self.client.get(
+            reverse('metrics'), headers={'X-Forwarded-For': '10.0.0.1'}
+        )
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 404)
+
+    def test_buckets_are_cumulative(self) -> None:
+        for total in (0.003, 0.2, 20.0):
+            self.histograms.observe(
+                request_timing.RequestTiming(view='home'), total
+            )
+        text: str = self.histograms.exposition()
+        self.assertIn('{view="home",le="0.005"} 1\n', text)
+        self.assertIn('{view="home",le="0.25"} 2\n', text)
+        self.assertIn('{view="home",le="10.0"} 2\n', text)
+        self.assertIn('{view="home",le="+Inf"} 3\n', text)
+        self.assertIn(
+            'http_request_duration_seconds_count{view="home"} 3', text
+        )
+
+    @override_settings(REQUEST_TIMING=0)
+    def test_disabled(self) -> None:
+        response = self.client.get(reverse('home'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.histograms.views, {})
+
+
+class QueryCountMiddlewareTests(TestCase):
+    def test_logs_counts_and_duplicates(self) -> None:
+        def view(request: HttpRequest) -> HttpResponse:
+            list(Category.objects.all())
+            list(Category.objects.all())
+            return HttpResponse()
+
+        with override_settings(DEBUG=True):
+            middleware = QueryCountMiddleware(view)
+        request = HttpRequest()
+        request.method = 'GET'
+        request.path = '/'
+
+        with self.assertLogs('Sales_Aggregator', logging.INFO) as logs:
+            middleware(request)
+
+        self.assertIn('GET /: 2 SQL-запросов', logs.output[0])
+        self.assertIn('выполнен 2 раз', logs.output[1])
+
+    def test_count_queries(self) -> None:
+        with count_queries() as counter:
+            Category.objects.count()
+        self.assertEqual(len(counter), 1)
+        self.assertEqual(counter.duplicates(), {})
+
+
+class DbPoolStatsTests(TestCase):
+    def use_pool(self, pool: ConnectionPool | None) -> None:
+        patcher = mock.patch.object(
+            type(connections['default']),
+            'pool',
+            new_callable=mock.PropertyMock,
+            return_value=pool,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_without_pool(self) -> None:
+        self.use_pool(None)
+        self.assertIsNone(pool_stats()['default'])
+
+    def test_pool_counters(self) -> None:
+        pool = ConnectionPool(
+            kwargs=connections['default'].get_connection_params(),
+            min_size=1,
+            open=True,
+        )
+        self.addCleanup(pool.close)
+        with pool.connection() as pooled:
+            pooled.execute('SELECT 1')
+
+        self.use_pool(pool)
+        stats = pool_stats()['default']
+        assert stats is not None
+        self.assertEqual(stats['pool_min'], 1)
+        self.assertEqual(stats['requests_num'], 1)
+        self.assertIn('avg_wait_ms', stats)
+
+    def test_view_is_for_staff(self) -> None:
+        url: str = reverse('db_pool_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        admin = CustomUser.objects.create_superuser('admin', password='pass')
+        self.client.force_login(admin)
+        self.use_pool(None)
+        self.assertIsNone(self.client.get(url).json()['default'])
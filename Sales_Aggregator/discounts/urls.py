@@ -1,9 +1,14 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.home, name='home'),
+    path('feed/<slug:feed>/', views.feed_page, name='feed_page'),
+    path('search/', views.search_posts, name='search_posts'),
+    path('places/', views.place_suggestions, name='place_suggestions'),
+    path('viewer-state/', views.viewer_state, name='viewer_state'),
+    path('vote-stream/', views.vote_stream, name='vote_stream'),
     path('create/', views.CreatePostView.as_view(), name='create_post'),
     path(
         'vote/<int:post_id>/<str:vote_type>/',
@@ -15,7 +20,11 @@ urlpatterns = [
         views.toggle_favorite,
         name='toggle_favorite',
     ),
+    path('batch/', views.batch_actions, name='batch_actions'),
     path('my-posts/', views.user_posts, name='user_posts'),
     path('favorites/', views.favorites, name='favorites'),
     path('delete/<int:post_id>/', views.delete_post, name='delete_post'),
+    path('export/<slug:dataset>/', views.export_data, name='export_data'),
+    path('api/v1/feeds/<slug:feed>/', api.feed, name='api_feed'),
+    path('api/v1/categories/', api.categories, name='api_categories'),
 ]
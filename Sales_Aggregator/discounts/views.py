@@ -1,81 +1,573 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from datetime import datetime
 from typing import Any
 
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Q, QuerySet
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db import router, transaction
+from django.db.models import BigIntegerField, F, QuerySet
 from django.http import (
+    Http404,
     HttpRequest,
     HttpResponse,
+    HttpResponseBadRequest,
     JsonResponse,
+    StreamingHttpResponse,
 )
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    quote_etag,
+)
 from django.utils.decorators import method_decorator
+from django.utils.http import http_date
 from django.views import View
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import require_GET, require_http_methods
+from Sales_Aggregator.db_router import read_from_replica
 
+from . import cards, exporting, feed_cache, live_counts, vote_buffer
 from .forms import PostForm
-from .models import Category, Favorite, Post, Vote
+from .models import (
+    PLACE_MIN_LENGTH,
+    Category,
+    Favorite,
+    Post,
+    PostQuerySet,
+    Vote,
+    VoteResult,
+)
+from .pagination import InvalidCursor, KeysetPage, apaginate, paginate
 
+Feed = tuple[QuerySet[Post], tuple[str, ...]]
+FeedBuilder = Callable[[HttpRequest], Feed]
 
-def home(request: HttpRequest) -> HttpResponse:
-    posts: QuerySet[Post] = Post.objects.annotate(
-        upvotes_count=Count('votes', filter=Q(votes__vote_type='up')),
-        downvotes_count=Count(
-            'votes',
-            filter=Q(votes__vote_type='down'),
-        ),
-    )
+
+HOME_ORDERINGS: dict[str, tuple[str, ...]] = {
+    'newest': ('-created_at', '-id'),
+    'rating': ('-score', '-created_at', '-id'),
+    'hot': ('-hot_score', '-created_at', '-id'),
+    'relevance': ('-rank', '-created_at', '-id'),
+}
+
+
+def _search_text(request: HttpRequest) -> str:
+    return request.GET.get('q', '').strip()
+
+
+def _home_sort(request: HttpRequest) -> str:
+    # Сортировка по релевантности имеет смысл только при поиске.
+    searching: bool = bool(_search_text(request))
+    sort: str = request.GET.get('sort', '')
+    if sort not in HOME_ORDERINGS or (sort == 'relevance' and not searching):
+        return 'relevance' if searching else 'newest'
+    return sort
+
+
+def _home_feed(request: HttpRequest) -> Feed:
+    posts: PostQuerySet = Post.objects.all()
 
     category_filter: str | None = request.GET.get('category')
     if category_filter:
         posts = posts.filter(category_id=category_filter)
 
-    sort_by: str = request.GET.get('sort', 'newest')
-    if sort_by == 'rating':
-        posts = posts.order_by(
-            '-upvotes_count',
-            'downvotes_count',
-            '-created_at',
+    search_text: str = _search_text(request)
+    if search_text:
+        posts = posts.search(search_text)
+
+    return posts, HOME_ORDERINGS[_home_sort(request)]
+
+
+def _user_posts_feed(request: HttpRequest) -> Feed:
+    posts: QuerySet[Post] = Post.objects.filter(author=request.user)
+    return posts, ('-created_at', '-id')
+
+
+def _favorites_feed(request: HttpRequest) -> Feed:
+    posts: QuerySet[Post] = Post.objects.filter(
+        favorited_by__user=request.user
+    ).annotate(
+        favorited_at=F('favorited_by__created_at'),
+        favorite_id=F('favorited_by__id'),
+    )
+    return posts, ('-favorited_at', '-favorite_id')
+
+
+# Выборка ленты и вариант карточек её постов.
+FEEDS: dict[str, tuple[FeedBuilder, str]] = {
+    'home': (_home_feed, 'home'),
+    'my-posts': (_user_posts_feed, 'user_posts'),
+    'favorites': (_favorites_feed, 'favorites'),
+}
+PRIVATE_FEEDS: set[str] = {'my-posts', 'favorites'}
+
+PLACE_SUGGESTIONS_LIMIT: int = 10
+PLACE_SUGGESTIONS_TIMEOUT: int = 5 * 60
+VIEWER_STATE_LIMIT: int = 100
+VOTE_STREAM_LIFETIME: int = 5 * 60
+VOTE_STREAM_HEARTBEAT: int = 15
+VOTE_STREAM_RETRY_MS: int = 3000
+BATCH_LIMIT: int = 100
+
+
+def feed_queryset(
+    request: HttpRequest,
+    feed: str,
+    viewer: Any = None,
+) -> Feed:
+    """
+    Выборка постов ленты ``feed`` со всем, что нужно карточкам.
+
+    Состояние зрителя берётся для ``viewer``, по умолчанию для автора
+    запроса.
+    """
+    build, _ = FEEDS[feed]
+    posts, ordering = build(request)
+    posts = posts.select_related('category', 'author').with_viewer_state(
+        request.user if viewer is None else viewer
+    )
+    return posts, ordering
+
+
+def _load_feed_page(
+    request: HttpRequest,
+    feed: str,
+    viewer: Any = None,
+) -> KeysetPage:
+    posts, ordering = feed_queryset(request, feed, viewer)
+    return paginate(posts, ordering, request.GET.get('cursor'))
+
+
+async def _aload_feed_rows(
+    request: HttpRequest,
+    feed: str,
+    viewer: Any = None,
+) -> KeysetPage:
+    """Страница ленты с ``cards.FeedRow`` для отрисовки карточек."""
+    posts, ordering = feed_queryset(request, feed, viewer)
+    page: KeysetPage = await apaginate(
+        cards.feed_values(posts, ordering),
+        ordering,
+        request.GET.get('cursor'),
+    )
+    return cards.feed_rows(page)
+
+
+async def _resolve_user(request: HttpRequest) -> None:
+    """
+    Загружает пользователя асинхронным запросом.
+
+    Шаблоны и общие с синхронными представлениями функции читают
+    ``request.user``, поэтому загруженный пользователь подставляется туда.
+    """
+    request.user = await request.auser()
+
+
+def _home_cache_scope(request: HttpRequest) -> str | None:
+    """
+    Категория для ключа кеша главной или ``None``, если не кешировать.
+
+    Результаты поиска не кешируются: сочетаний запросов слишком много,
+    чтобы повторные попадания случались часто.
+    """
+    category: str = request.GET.get('category', '')
+    if _search_text(request) or (category and not category.isdigit()):
+        return None
+    return category or 'all'
+
+
+async def _render_cards(
+    request: HttpRequest,
+    feed: str,
+    page: KeysetPage,
+) -> feed_cache.RenderedCards:
+    _, variant = FEEDS[feed]
+    html: str = await cards.render_cards(
+        page.items, variant, request.user.is_authenticated
+    )
+    return feed_cache.RenderedCards(html, page.next_cursor)
+
+
+async def _load_cards(
+    request: HttpRequest,
+    feed: str,
+) -> feed_cache.RenderedCards:
+    """
+    Карточки страницы ленты, для главной без поиска — через кеш.
+
+    Кешированные карточки отрисованы без состояния зрителя, его
+    подставляет скрипт страницы по ответу ``viewer_state``.
+    """
+    scope: str | None = _home_cache_scope(request)
+    if feed != 'home' or scope is None:
+        page: KeysetPage = await _aload_feed_rows(request, feed)
+        return await _render_cards(request, feed, page)
+
+    category: str | None = None if scope == 'all' else scope
+    sort: str = _home_sort(request)
+    cursor: str | None = request.GET.get('cursor')
+    guest = AnonymousUser()
+
+    async def render() -> feed_cache.RenderedCards:
+        page: KeysetPage = await feed_cache.cached_home_page(
+            category,
+            sort,
+            cursor,
+            guest,
+            lambda: _aload_feed_rows(request, feed, guest),
         )
-    else:
-        posts = posts.order_by('-created_at')
+        return await _render_cards(request, feed, page)
 
-    categories: QuerySet[Category] = Category.objects.all()
+    audience: str = 'member' if request.user.is_authenticated else 'guest'
+    return await feed_cache.cached_cards(
+        audience, category, sort, cursor, render
+    )
 
-    user_votes: dict[int, str] = {}
-    user_favorites: set[int] = set()
 
-    if request.user.is_authenticated:
-        post_ids: list[int] = list(posts.values_list('id', flat=True))
-        if post_ids:
-            votes = Vote.objects.filter(
-                post_id__in=post_ids,
-                user=request.user,
-            )
-            for vote in votes:
-                user_votes[vote.post_id] = vote.vote_type
+def _next_page_url(
+    request: HttpRequest,
+    feed: str,
+    next_cursor: str | None,
+) -> str | None:
+    return _page_url(request, reverse('feed_page', args=[feed]), next_cursor)
 
-            favorites = Favorite.objects.filter(
-                post_id__in=post_ids,
-                user=request.user,
-            )
-            user_favorites = {fav.post_id for fav in favorites}
 
-    for post in posts:
-        post.user_vote = user_votes.get(post.id)  # type: ignore[attr-defined]
-        post.is_favorite = post.id in user_favorites  # type: ignore[attr-defined]
+def _page_url(
+    request: HttpRequest,
+    url: str,
+    next_cursor: str | None,
+) -> str | None:
+    if next_cursor is None:
+        return None
+    params = request.GET.copy()
+    params.pop('post_created', None)
+    params['cursor'] = next_cursor
+    return f'{url}?{params.urlencode()}'
+
+
+async def _render_home(request: HttpRequest) -> HttpResponse:
+    try:
+        cards: feed_cache.RenderedCards = await _load_cards(request, 'home')
+    except InvalidCursor as error:
+        return HttpResponseBadRequest(str(error))
+
+    categories: list[Category] = await feed_cache.cached_categories()
 
     context: dict[str, Any] = {
-        'posts': posts,
+        'cards': cards,
+        'next_page_url': _next_page_url(request, 'home', cards.next_cursor),
         'categories': categories,
-        'current_category': category_filter,
-        'sort_by': sort_by,
+        'current_category': request.GET.get('category'),
+        'sort_by': _home_sort(request),
+        'search_text': _search_text(request),
     }
 
     return render(request, 'discounts/home.html', context)
 
 
+def _feed_validators(
+    request: HttpRequest,
+    feed: str,
+) -> tuple[str, datetime] | None:
+    """
+    ``ETag`` и время изменения страницы ленты.
+
+    Считаются по версиям из кеша, без запросов к базе. Для поиска
+    возвращается ``None``: его результаты зависят от всех постов.
+    """
+    versions: list[tuple[str, str]]
+    if feed == 'home':
+        scope: str | None = _home_cache_scope(request)
+        if scope is None:
+            return None
+        # Счётчики голосов на главной видны только пользователям, а им
+        # свежие значения подставляет ``viewer_state``.
+        versions = [
+            (scope, kind)
+            for kind in feed_cache.SORT_DEPENDENCIES[_home_sort(request)]
+        ]
+        versions.append(('all', 'categories'))
+    elif feed == 'my-posts':
+        # Изменения своих постов меняют версию зрителя, голоса за них —
+        # версию голосов.
+        versions = [('all', 'votes')]
+    else:
+        versions = [('all', 'posts'), ('all', 'votes')]
+    user_id: int | None = (
+        request.user.pk if request.user.is_authenticated else None
+    )
+    return feed_cache.page_validators(
+        versions, user_id, request.get_full_path()
+    )
+
+
+async def _conditional_response(
+    request: HttpRequest,
+    validators: tuple[str, datetime] | None,
+    respond: Callable[[], Awaitable[HttpResponse]],
+) -> HttpResponse:
+    """Ответ 304, если страница у клиента не изменилась, иначе ``respond``."""
+    if validators is None:
+        return await respond()
+    etag: str = quote_etag(validators[0])
+    last_modified: float = validators[1].timestamp()
+    response: HttpResponse | None = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified),
+    )
+    if response is None:
+        response = await respond()
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+    # Браузер и прокси проверяют страницу при каждом показе, а страницы
+    # пользователей прокси не хранит вовсе.
+    patch_cache_control(
+        response,
+        no_cache=True,
+        private=request.user.is_authenticated,
+    )
+    return response
+
+
+@read_from_replica
+async def home(request: HttpRequest) -> HttpResponse:
+    await _resolve_user(request)
+    validators: tuple[str, datetime] | None = _feed_validators(request, 'home')
+    if validators is None or request.user.is_authenticated:
+        return await _conditional_response(
+            request, validators, lambda: _render_home(request)
+        )
+
+    # Гостям главная отдаётся целиком из кеша: страница у всех одна.
+    etag: str = validators[0]
+    return await _conditional_response(
+        request,
+        validators,
+        lambda: feed_cache.cached_guest_response(
+            etag, lambda: _render_home(request)
+        ),
+    )
+
+
+@require_GET
+@read_from_replica
+async def feed_page(request: HttpRequest, feed: str) -> HttpResponse:
+    if feed not in FEEDS:
+        raise Http404('Лента не найдена')
+    await _resolve_user(request)
+    if feed in PRIVATE_FEEDS and not request.user.is_authenticated:
+        return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+
+    try:
+        cards: feed_cache.RenderedCards = await _load_cards(request, feed)
+    except InvalidCursor as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    return JsonResponse(
+        {
+            'html': cards.html,
+            'next_cursor': cards.next_cursor,
+            'next_url': _next_page_url(request, feed, cards.next_cursor),
+        }
+    )
+
+
+def _requested_post_ids(request: HttpRequest) -> list[int]:
+    """Посты из параметра ``ids``; ``ValueError``, если список некорректен."""
+    try:
+        ids: list[int] = [
+            int(post_id)
+            for post_id in request.GET.get('ids', '').split(',')
+            if post_id
+        ]
+    except ValueError as error:
+        raise ValueError('Некорректный список постов') from error
+    if len(ids) > VIEWER_STATE_LIMIT:
+        raise ValueError(f'Не больше {VIEWER_STATE_LIMIT} постов за запрос')
+    return ids
+
+
+@require_GET
+@read_from_replica
+def viewer_state(request: HttpRequest) -> JsonResponse:
+    """Оценки, избранное и счётчики голосов для карточек на странице."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+    try:
+        ids: list[int] = _requested_post_ids(request)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    states: dict[int, dict[str, Any]] = {}
+    if ids:
+        states = feed_cache.viewer_states(ids, request.user)
+    return JsonResponse(
+        {'posts': {str(post_id): state for post_id, state in states.items()}}
+    )
+
+
+async def _vote_events(post_ids: set[int]) -> AsyncIterator[str]:
+    yield f'retry: {VOTE_STREAM_RETRY_MS}\n\n'
+    position: int = live_counts.broker.position()
+    started: float = time.monotonic()
+    last_event: float = started
+    while time.monotonic() - started < VOTE_STREAM_LIFETIME:
+        await asyncio.sleep(live_counts.broker.window)
+        position, counts = live_counts.broker.changes(position, post_ids)
+        now: float = time.monotonic()
+        if counts:
+            data: str = json.dumps(
+                {
+                    str(post_id): {
+                        'upvotes_count': upvotes,
+                        'downvotes_count': downvotes,
+                    }
+                    for post_id, (upvotes, downvotes) in counts.items()
+                }
+            )
+            yield f'event: counts\ndata: {data}\n\n'
+            last_event = now
+        elif now - last_event >= VOTE_STREAM_HEARTBEAT:
+            # Комментарий не даёт прокси закрыть простаивающее соединение.
+            yield ': ping\n\n'
+            last_event = now
+
+
+@require_GET
+async def vote_stream(request: HttpRequest) -> HttpResponse:
+    """
+    Поток событий со свежими счётчиками голосов постов ``ids``.
+
+    Раз в окно брокера приходит событие ``counts`` с изменившимися
+    счётчиками. Через ``VOTE_STREAM_LIFETIME`` секунд поток закрывается,
+    и браузер переподключается сам. Под WSGI поток занял бы поток
+    сервера целиком, поэтому там отвечаем 204 и браузер не
+    переподключается.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+    try:
+        ids: list[int] = _requested_post_ids(request)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    live_counts.start_listener()
+    return StreamingHttpResponse(
+        _vote_events(set(ids)),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@require_GET
+@staff_member_required
+@read_from_replica
+async def export_data(request: HttpRequest, dataset: str) -> HttpResponse:
+    """
+    Выгрузка ``dataset`` для аналитики, формат задаёт параметр ``format``.
+
+    Ответ начинается сразу и идёт блоками строк. Под ASGI строки читаются
+    асинхронным итератором: синхронный Django собрал бы в память целиком.
+    """
+    if dataset not in exporting.DATASETS:
+        raise Http404('Выгрузка не найдена')
+    file_format: str = request.GET.get('format', 'csv')
+    if file_format not in exporting.FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат')
+
+    # Поток читается уже после выхода из представления, поэтому база
+    # выбирается заранее, пока действует read_from_replica.
+    using: str = router.db_for_read(exporting.DATASETS[dataset].model)
+    lines: Iterator[str] | AsyncIterator[str] = (
+        exporting.aexport_lines(dataset, file_format, using)
+        if isinstance(request, ASGIRequest)
+        else exporting.export_lines(dataset, file_format, using)
+    )
+    return StreamingHttpResponse(
+        lines,
+        content_type=exporting.FORMATS[file_format],
+        headers={
+            'Content-Disposition': (
+                f'attachment; filename="{dataset}.{file_format}"'
+            ),
+            'X-Accel-Buffering': 'no',
+        },
+    )
+
+
+@require_GET
+@read_from_replica
+def search_posts(request: HttpRequest) -> JsonResponse:
+    if not _search_text(request):
+        return JsonResponse({'error': 'Пустой поисковый запрос'}, status=400)
+
+    try:
+        page: KeysetPage = _load_feed_page(request, 'home')
+    except InvalidCursor as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    results: list[dict[str, Any]] = [
+        {
+            'id': post.id,
+            'title': post.title,
+            'description': post.description,
+            'place': post.place,
+            'category': post.category.name,
+            'author': post.author.username,
+            'rating': post.rating,
+            'created_at': post.created_at,
+            'rank': getattr(post, 'rank', None),
+        }
+        for post in page.items
+    ]
+    return JsonResponse(
+        {
+            'results': results,
+            'next_cursor': page.next_cursor,
+            'next_url': _page_url(
+                request, reverse('search_posts'), page.next_cursor
+            ),
+        }
+    )
+
+
+@require_GET
+@read_from_replica
+def place_suggestions(request: HttpRequest) -> JsonResponse:
+    text: str = ' '.join(request.GET.get('q', '').split())
+    if len(text) < PLACE_MIN_LENGTH:
+        return JsonResponse({'results': []})
+
+    digest: str = hashlib.md5(text.casefold().encode()).hexdigest()
+    cache_key: str = f'place_suggestions:{digest}'
+    results: list[dict[str, Any]] | None = cache.get(cache_key)
+    if results is None:
+        results = [
+            {'place': place, 'posts': posts}
+            for place, posts in Post.objects.popular_places(
+                text,
+                PLACE_SUGGESTIONS_LIMIT,
+            )
+        ]
+        cache.set(cache_key, results, PLACE_SUGGESTIONS_TIMEOUT)
+    return JsonResponse({'results': results})
+
+
 @method_decorator(login_required, name='dispatch')
 class CreatePostView(View):
     def get(self, request: HttpRequest) -> HttpResponse:
@@ -99,8 +591,6 @@ def vote_post(
     post_id: int,
     vote_type: str,
 ) -> HttpResponse:
-    post: Post = get_object_or_404(Post, id=post_id)
-
     if vote_type not in ['up', 'down']:
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse(
@@ -110,33 +600,29 @@ def vote_post(
         messages.error(request, 'Неверный тип оценки')
         return redirect('home')
 
-    existing_vote: Vote | None = Vote.objects.filter(
-        post=post,
-        user=request.user,
-    ).first()
-
-    if existing_vote:
-        if existing_vote.vote_type == vote_type:
-            existing_vote.delete()
-            user_vote: str | None = None
-        else:
-            existing_vote.vote_type = vote_type
-            existing_vote.save()
-            user_vote = vote_type
-    else:
-        Vote.objects.create(post=post, user=request.user, vote_type=vote_type)
-        user_vote = vote_type
-
-    upvotes_count: int = post.votes.filter(vote_type='up').count()
-    downvotes_count: int = post.votes.filter(vote_type='down').count()
+    toggle: Callable[[int, int, str], VoteResult] = (
+        vote_buffer.toggle
+        if settings.VOTE_COUNTS_BUFFERED
+        else Vote.objects.toggle
+    )
+    try:
+        result: VoteResult = toggle(post_id, request.user.pk, vote_type)
+    except Post.DoesNotExist as error:
+        raise Http404('Пост не найден') from error
+
+    feed_cache.bump_category(result.category_id, 'votes')
+    feed_cache.bump_viewer(request.user.pk)
+    live_counts.publish_counts(
+        post_id, result.upvotes_count, result.downvotes_count
+    )
 
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse(
             {
                 'success': True,
-                'user_vote': user_vote,
-                'upvotes_count': upvotes_count,
-                'downvotes_count': downvotes_count,
+                'user_vote': result.user_vote,
+                'upvotes_count': result.upvotes_count,
+                'downvotes_count': result.downvotes_count,
             }
         )
 
@@ -151,30 +637,26 @@ def vote_post(
 @login_required
 @require_http_methods(['POST'])
 def toggle_favorite(request: HttpRequest, post_id: int) -> HttpResponse:
-    post: Post = get_object_or_404(Post, id=post_id)
-
-    favorite, created = Favorite.objects.get_or_create(
-        user=request.user,
-        post=post,
-    )
-
-    if not created:
-        favorite.delete()
-        is_favorite: bool = False
-        message: str = 'Пост удален из избранного'
+    try:
+        is_favorite: bool = Favorite.objects.toggle(post_id, request.user.pk)
+    except Post.DoesNotExist as error:
+        raise Http404('Пост не найден') from error
+    feed_cache.bump_viewer(request.user.pk)
+
+    if is_favorite:
+        message: str = 'Пост добавлен в избранное'
     else:
-        is_favorite = True
-        message = 'Пост добавлен в избранное'
+        message = 'Пост удален из избранного'
 
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse(
             {'success': True, 'is_favorite': is_favorite, 'message': message}
         )
 
-    if not created:
-        messages.info(request, message)
-    else:
+    if is_favorite:
         messages.success(request, message)
+    else:
+        messages.info(request, message)
 
     referer: str = request.META.get('HTTP_REFERER', '')
     if 'favorites' in referer:
@@ -184,40 +666,133 @@ def toggle_favorite(request: HttpRequest, post_id: int) -> HttpResponse:
     return redirect('home')
 
 
+def _batch_operation(operation: Any) -> tuple[str, int, Any]:
+    """Тип, пост и значение операции; ``ValueError``, если она некорректна."""
+    if not isinstance(operation, dict):
+        raise ValueError('Операция должна быть объектом')
+    kind: Any = operation.get('type')
+    post_id: Any = operation.get('post_id')
+    value: Any = operation.get('value')
+    if not isinstance(post_id, int) or isinstance(post_id, bool):
+        raise ValueError('Некорректный post_id')
+    if kind == 'vote':
+        if value not in ('up', 'down', None):
+            raise ValueError('Неверный тип оценки')
+    elif kind == 'favorite':
+        if not isinstance(value, bool):
+            raise ValueError('Отметка избранного должна быть true или false')
+    else:
+        raise ValueError('Неизвестный тип операции')
+    # Id вне bigint не может быть у поста, а в запросе сорвал бы весь пакет.
+    if not 0 < post_id <= BigIntegerField.MAX_BIGINT:
+        raise ValueError('Пост не найден')
+    return kind, post_id, value
+
+
 @login_required
-def user_posts(request: HttpRequest) -> HttpResponse:
-    posts: QuerySet[Post] = (
-        Post.objects.filter(author=request.user)
-        .annotate(
-            upvotes_count=Count('votes', filter=Q(votes__vote_type='up')),
-            downvotes_count=Count(
-                'votes',
-                filter=Q(votes__vote_type='down'),
-            ),
+@require_http_methods(['POST'])
+def batch_actions(request: HttpRequest) -> JsonResponse:
+    """
+    Оценки и избранное для нескольких постов одним запросом.
+
+    Тело — JSON ``{"operations": [...]}``, операция —
+    ``{"type": "vote", "post_id": 1, "value": "up"}`` (``null`` снимает
+    голос) или ``{"type": "favorite", "post_id": 1, "value": true}``.
+    В отличие от кнопок на странице операции задают итоговое состояние,
+    а не переключают его, поэтому клиент может безопасно повторить пакет
+    после обрыва связи. Из операций одного типа над одним постом
+    действует последняя.
+    """
+    try:
+        operations: Any = json.loads(request.body)['operations']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse(
+            {'error': 'Ожидается JSON с полем operations'}, status=400
+        )
+    if not isinstance(operations, list):
+        return JsonResponse(
+            {'error': 'operations должно быть списком'}, status=400
+        )
+    if len(operations) > BATCH_LIMIT:
+        return JsonResponse(
+            {'error': f'Не больше {BATCH_LIMIT} операций за запрос'},
+            status=400,
         )
-        .order_by('-created_at')
+
+    votes: dict[int, str | None] = {}
+    favorites: dict[int, bool] = {}
+    results: list[dict[str, Any]] = []
+    for operation in operations:
+        try:
+            kind, post_id, value = _batch_operation(operation)
+        except ValueError as error:
+            results.append({'success': False, 'error': str(error)})
+            continue
+        if kind == 'vote':
+            votes[post_id] = value
+        else:
+            favorites[post_id] = value
+        results.append({'success': True, 'post_id': post_id})
+
+    states: dict[int, dict[str, Any]] = {}
+    if votes or favorites:
+        with transaction.atomic():
+            changed: dict[int, int] = Vote.objects.apply_batch(
+                request.user.pk, votes
+            )
+            Favorite.objects.apply_batch(request.user.pk, favorites)
+            states = feed_cache.viewer_states(
+                votes.keys() | favorites.keys(), request.user
+            )
+            for category_id in set(changed.values()):
+                feed_cache.bump_category(category_id, 'votes')
+            feed_cache.bump_viewer(request.user.pk)
+            for post_id in changed.keys() & states.keys():
+                live_counts.publish_counts(
+                    post_id,
+                    states[post_id]['upvotes_count'],
+                    states[post_id]['downvotes_count'],
+                )
+
+    for result in results:
+        if result['success'] and result['post_id'] not in states:
+            result.update(success=False, error='Пост не найден')
+    return JsonResponse(
+        {
+            'results': results,
+            'posts': {
+                str(post_id): state for post_id, state in states.items()
+            },
+        }
     )
 
-    user_votes: dict[int, str] = {}
-    user_favorites: set[int] = set()
 
-    post_ids: list[int] = list(posts.values_list('id', flat=True))
-    if post_ids:
-        votes = Vote.objects.filter(post_id__in=post_ids, user=request.user)
-        for vote in votes:
-            user_votes[vote.post_id] = vote.vote_type
+@login_required
+@read_from_replica
+async def user_posts(request: HttpRequest) -> HttpResponse:
+    await _resolve_user(request)
+    return await _conditional_response(
+        request,
+        _feed_validators(request, 'my-posts'),
+        lambda: _render_user_posts(request),
+    )
 
-        favorites = Favorite.objects.filter(
-            post_id__in=post_ids,
-            user=request.user,
-        )
-        user_favorites = {fav.post_id for fav in favorites}
 
-    for post in posts:
-        post.user_vote = user_votes.get(post.id)  # type: ignore[attr-defined]
-        post.is_favorite = post.id in user_favorites  # type: ignore[attr-defined]
+async def _render_user_posts(request: HttpRequest) -> HttpResponse:
+    try:
+        cards: feed_cache.RenderedCards = await _load_cards(
+            request, 'my-posts'
+        )
+    except InvalidCursor as error:
+        return HttpResponseBadRequest(str(error))
 
-    return render(request, 'discounts/user_posts.html', {'posts': posts})
+    context: dict[str, Any] = {
+        'cards': cards,
+        'next_page_url': _next_page_url(
+            request, 'my-posts', cards.next_cursor
+        ),
+    }
+    return render(request, 'discounts/user_posts.html', context)
 
 
 @login_required
@@ -251,33 +826,28 @@ def delete_post(request: HttpRequest, post_id: int) -> HttpResponse:
 
 
 @login_required
-def favorites(request: HttpRequest) -> HttpResponse:
-    favorite_posts: QuerySet[Post] = (
-        Post.objects.filter(favorited_by__user=request.user)
-        .annotate(
-            upvotes_count=Count('votes', filter=Q(votes__vote_type='up')),
-            downvotes_count=Count(
-                'votes',
-                filter=Q(votes__vote_type='down'),
-            ),
-        )
-        .order_by('-favorited_by__created_at')
+@read_from_replica
+async def favorites(request: HttpRequest) -> HttpResponse:
+    await _resolve_user(request)
+    return await _conditional_response(
+        request,
+        _feed_validators(request, 'favorites'),
+        lambda: _render_favorites(request),
     )
 
-    user_votes: dict[int, str] = {}
-
-    post_ids: list[int] = list(favorite_posts.values_list('id', flat=True))
-    if post_ids:
-        votes = Vote.objects.filter(post_id__in=post_ids, user=request.user)
-        for vote in votes:
-            user_votes[vote.post_id] = vote.vote_type
 
-    for post in favorite_posts:
-        post.user_vote = user_votes.get(post.id)  # type: ignore[attr-defined]
-        post.is_favorite = True  # type: ignore[attr-defined]
+async def _render_favorites(request: HttpRequest) -> HttpResponse:
+    try:
+        cards: feed_cache.RenderedCards = await _load_cards(
+            request, 'favorites'
+        )
+    except InvalidCursor as error:
+        return HttpResponseBadRequest(str(error))
 
-    return render(
-        request,
-        'discounts/favorites.html',
-        {'posts': favorite_posts},
-    )
+    context: dict[str, Any] = {
+        'cards': cards,
+        'next_page_url': _next_page_url(
+            request, 'favorites', cards.next_cursor
+        ),
+    }
+    return render(request, 'discounts/favorites.html', context)
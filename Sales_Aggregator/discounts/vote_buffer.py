@@ -0,0 +1,153 @@
+"""
+Отложенная запись счётчиков голосов.
+
+Когда за пост голосуют одновременно многие пользователи, каждый голос
+обновляет одну и ту же строку поста, и запросы выстраиваются в очередь
+за её блокировкой. В отложенном режиме (``VOTE_COUNTS_BUFFERED``) голос
+записывается в таблицу Vote сразу, а изменения счётчиков копятся в
+буфере процесса и раз в ``FLUSH_INTERVAL`` секунд или при
+``MAX_PENDING_POSTS`` постах в буфере записываются одним запросом.
+
+Счётчики в базе отстают от голосов не больше чем на интервал сброса.
+При штатной остановке процесса буфер сбрасывается. Если процесс упал,
+изменения из буфера теряются, и расхождение находит и исправляет команда
+``check_vote_counts``.
+"""
+
+import atexit
+import dataclasses
+import logging
+import threading
+
+from django.db import DatabaseError, close_old_connections, transaction
+
+from . import feed_cache
+from .models import Post, Vote, VoteResult
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL: float = 1.0
+MAX_PENDING_POSTS: int = 500
+
+Deltas = dict[int, tuple[int, int]]
+
+
+class VoteCountBuffer:
+    """Изменения счётчиков голосов, ещё не записанные в посты."""
+
+    def __init__(self, max_posts: int = MAX_PENDING_POSTS) -> None:
+        self.max_posts = max_posts
+        self.full = threading.Event()
+        self._lock = threading.Lock()
+        self._pending: Deltas = {}
+
+    def add(self, post_id: int, upvotes: int, downvotes: int) -> None:
+        with self._lock:
+            pending_up, pending_down = self._pending.get(post_id, (0, 0))
+            self._pending[post_id] = (
+                pending_up + upvotes,
+                pending_down + downvotes,
+            )
+            if len(self._pending) >= self.max_posts:
+                self.full.set()
+
+    def pending(self, post_id: int) -> tuple[int, int]:
+        """Изменения лайков и дизлайков поста, ожидающие записи."""
+        with self._lock:
+            return self._pending.get(post_id, (0, 0))
+
+    def flush(self) -> int:
+        """
+        Записывает накопленные изменения одним запросом.
+
+        Если запись не удалась, изменения возвращаются в буфер. Возвращает
+        число постов, изменения которых записаны.
+        """
+        with self._lock:
+            deltas: Deltas = {
+                post_id: delta
+                for post_id, delta in self._pending.items()
+                if delta != (0, 0)
+            }
+            self._pending = {}
+            self.full.clear()
+        if not deltas:
+            return 0
+        try:
+            with transaction.atomic():
+                categories: set[int] = Post.objects.add_vote_deltas(deltas)
+                for category_id in categories:
+                    feed_cache.bump_category(category_id, 'votes')
+        except DatabaseError:
+            for post_id, (upvotes, downvotes) in deltas.items():
+                self.add(post_id, upvotes, downvotes)
+            raise
+        return len(deltas)
+
+
+buffer = VoteCountBuffer()
+
+
+def toggle(post_id: int, user_id: int, vote_type: str) -> VoteResult:
+    """
+    Переключает голос, откладывая обновление счётчиков поста.
+
+    Счётчики в результате учитывают изменения, ожидающие записи в этом
+    процессе, но не в других.
+    """
+    stored, upvotes, downvotes = Vote.objects.toggle_buffered(
+        post_id, user_id, vote_type
+    )
+    pending_up, pending_down = buffer.pending(post_id)
+    transaction.on_commit(lambda: buffer.add(post_id, upvotes, downvotes))
+    start_flusher()
+    return dataclasses.replace(
+        stored,
+        upvotes_count=stored.upvotes_count + pending_up + upvotes,
+        downvotes_count=stored.downvotes_count + pending_down + downvotes,
+    )
+
+
+def _flush_periodically() -> None:
+    while True:
+        buffer.full.wait(FLUSH_INTERVAL)
+        # Соединение потока живёт между сбросами, как соединение запроса.
+        close_old_connections()
+        try:
+            buffer.flush()
+        except DatabaseError:
+            logger.exception('Не удалось записать счётчики голосов')
+
+
+def flush_on_exit() -> None:
+    """Сбрасывает буфер при остановке процесса."""
+    try:
+        flushed: int = buffer.flush()
+    except DatabaseError:
+        logger.exception('Счётчики голосов не записаны при остановке')
+        return
+    if flushed:
+        logger.info('При остановке записаны счётчики %s постов', flushed)
+
+
+_flusher: threading.Thread | None = None
+_flusher_lock = threading.Lock()
+
+
+def start_flusher() -> None:
+    """
+    Запускает в процессе поток, который периодически сбрасывает буфер.
+
+    Поток один на процесс. Вместе с ним регистрируется сброс буфера при
+    выходе из процесса.
+    """
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=_flush_periodically,
+                name='vote-counts-flusher',
+                daemon=True,
+            )
+            _flusher.start()
+            atexit.register(flush_on_exit)
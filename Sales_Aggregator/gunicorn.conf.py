@@ -0,0 +1,56 @@
+"""
+Настройки gunicorn для продакшена.
+
+Gunicorn запускает несколько процессов с воркерами uvicorn, которые
+обслуживают ASGI-приложение: асинхронные представления лент не держат
+поток, пока ждут базу. Запуск из каталога с ``manage.py``:
+
+    gunicorn -c gunicorn.conf.py
+"""
+
+import multiprocessing
+import os
+from typing import Any
+
+wsgi_app = 'Sales_Aggregator.asgi:application'
+worker_class = 'uvicorn_worker.UvicornWorker'
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+# Каждый процесс держит свой пул соединений с базой: WEB_CONCURRENCY,
+# умноженное на DB_POOL_MAX_SIZE, не должно превышать max_connections.
+workers = int(
+    os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count() * 2 + 1))
+)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = 30
+keepalive = 5
+# Процесс перезапускается после стольких запросов, чтобы утечки памяти
+# не копились; разброс не даёт всем воркерам уйти на перезапуск разом.
+max_requests = 1000
+max_requests_jitter = 100
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server: Any) -> None:
+    # Версии лент и кеш HTML гостей должны быть общими для всех
+    # воркеров: с кешем в памяти процесса сброс версий после записи
+    # виден только воркеру, который её обработал.
+    os.environ.setdefault(
+        'DJANGO_SETTINGS_MODULE', 'Sales_Aggregator.settings'
+    )
+    from django.conf import settings
+
+    backend: str = settings.CACHES['default']['BACKEND']
+    if server.cfg.workers > 1 and backend.endswith('.LocMemCache'):
+        raise RuntimeError(
+            'Несколько воркеров требуют общего кеша: задайте REDIS_URL '
+            'или WEB_CONCURRENCY=1'
+        )
+
+
+def worker_exit(server: object, worker: object) -> None:
+    # Отложенные счётчики голосов не должны пропасть при перезапуске
+    # воркера после max_requests или при остановке.
+    from discounts import vote_buffer
+
+    vote_buffer.flush_on_exit()
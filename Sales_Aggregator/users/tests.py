@@ -1 +1,53 @@
-# Create your tests here.
+from django.contrib.auth import get_user
+from django.test import TestCase
+from django.urls import reverse
+from Sales_Aggregator.query_budget import query_budget
+
+from .models import CustomUser
+
+
+class AuthViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = CustomUser.objects.create_user('student', password='pass')
+
+    def test_register_logs_in(self) -> None:
+        response = self.client.post(
+            reverse('users:register'),
+            {
+                'username': 'newcomer',
+                'password1': 'Skidki-2024!',
+                'password2': 'Skidki-2024!',
+            },
+        )
+
+        self.assertRedirects(response, reverse('home'))
+        self.assertEqual(get_user(self.client).username, 'newcomer')
+
+    def test_login_and_logout(self) -> None:
+        with query_budget(9):
+            response = self.client.post(
+                reverse('users:login'),
+                {'username': 'student', 'password': 'pass'},
+            )
+        self.assertRedirects(response, reverse('home'))
+        self.assertTrue(get_user(self.client).is_authenticated)
+
+        self.client.get(reverse('users:logout'))
+        self.assertFalse(get_user(self.client).is_authenticated)
+
+    def test_login_with_wrong_password(self) -> None:
+        response = self.client.post(
+            reverse('users:login'),
+            {'username': 'student', 'password': 'wrong'},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Неверный логин или пароль')
+
+    def test_authenticated_user_is_redirected(self) -> None:
+        self.client.force_login(self.user)
+        for name in ['users:login', 'users:register']:
+            with self.subTest(view=name):
+                response = self.client.get(reverse(name))
+                self.assertRedirects(response, reverse('home'))
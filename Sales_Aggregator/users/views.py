@@ -1,5 +1,5 @@
 from django.contrib import messages
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import login, logout
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import redirect, render
 from django.views import View
@@ -33,13 +33,9 @@ class LoginView(View):
     def post(self, request: HttpRequest) -> HttpResponse:
         form = CustomAuthenticationForm(request, data=request.POST)
         if form.is_valid():
-            username: str = form.cleaned_data.get('username')
-            password: str = form.cleaned_data.get('password')
-            user = authenticate(username=username, password=password)
-            if user is not None:
-                login(request, user)
-                next_url: str = request.GET.get('next', 'home')
-                return redirect(next_url)
+            login(request, form.get_user())
+            next_url: str = request.GET.get('next', 'home')
+            return redirect(next_url)
         messages.error(request, 'Неверный логин или пароль')
         return render(request, 'users/login.html', {'form': form})
 